@@ -12,15 +12,21 @@ from pathlib import Path
 
 import requests
 from dotenv import load_dotenv
-from flask import Flask, jsonify, render_template, request, url_for
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from flask import Flask, Response, jsonify, render_template, request, url_for
 from werkzeug.serving import WSGIRequestHandler
 
 from configuration.config_manager import ConfigManager
 from database.database_manager import DatabaseManager
+from database.engine import SessionLocal
 from database.models import OtpConfiguration, SyncLog, UserSchedule
-from sync.scheduled_sync import reload_scheduler_jobs, scheduler
+from sync import scheduled_sync
+from sync.log_retention import get_daily_summaries
+from sync.metrics import render_metrics
+from sync.scheduled_sync import (
+    load_active_schedules,
+    reload_scheduler_jobs,
+    scheduler,
+)
 from sync.sync_manager import SyncManager
 from utils.api_validator import (
     test_demarches_api,
@@ -48,10 +54,6 @@ DatabaseManager.init_db(DATABASE_URL)
 # Instance de ConfigManager
 config_manager = ConfigManager(DATABASE_URL)
 
-# SQLAlchemy setup (doit être avant les fonctions qui l'utilisent)
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
 # Configuration de l'application Flask
 app = Flask(__name__)
 
@@ -374,6 +376,7 @@ def api_delete_config(otp_config_id):
         # Supprimer la configuration (les FK sont gérées automatiquement)
         db.delete(otp_config)
         db.commit()
+        config_manager.invalidate_config(otp_config_id)
 
         # Recharger les jobs du scheduler
         reload_scheduler_jobs(sync_manager)
@@ -631,6 +634,54 @@ def api_sync_report():
         db.close()
 
 
+@app.route("/api/sync-report/daily", methods=["GET"])
+def api_sync_report_daily():
+    """
+    Route pour récupérer les agrégats journaliers des synchronisations
+    (days derniers jours, 30 par défaut), lus dans la table d'agrégats
+    pour les journées déjà agrégées
+    """
+    try:
+        days = int(request.args.get("days", 30))
+        otp_config_id = request.args.get("otp_config_id")
+        otp_config_id = int(otp_config_id) if otp_config_id else None
+    except ValueError:
+        return jsonify(
+            {"success": False, "message": "days et otp_config_id doivent être des entiers"}
+        ), 400
+
+    if not 1 <= days <= 366:
+        return jsonify(
+            {"success": False, "message": "days doit être compris entre 1 et 366"}
+        ), 400
+
+    db = SessionLocal()
+    try:
+        summaries = get_daily_summaries(db, days, otp_config_id=otp_config_id)
+        return jsonify({"success": True, "days": summaries})
+    except Exception as e:
+        logger.error(f"Erreur récupération agrégats sync: {str(e)}")
+        return jsonify(
+            {
+                "error": "Une erreur interne est survenue lors de la récupération des agrégats de synchronisation."
+            }
+        ), 500
+    finally:
+        db.close()
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Métriques des synchronisations au format texte Prometheus :
+    durées, débits, requêtes HTTP, lignes Grist, file des synchronisations
+    """
+    return Response(
+        render_metrics(scheduled_sync.sync_queue, sync_manager),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
 @app.route("/api/sync-log/latest", methods=["GET"])
 def api_sync_log_latest():
     """Route pour récupérer les dernières synchronisations (auto et manuelle) pour une config"""
@@ -657,69 +708,36 @@ def api_sync_log_latest():
             else None
         )
 
+    def latest_by_mode(**filters):
+        """Dernière sync auto et dernière sync manuelle, en une requête DISTINCT ON"""
+        latest = (
+            db.query(SyncLog)
+            .filter_by(**filters)
+            .distinct(SyncLog.auto)
+            .order_by(SyncLog.auto, SyncLog.timestamp.desc())
+            .all()
+        )
+        by_mode = {sync.auto: sync for sync in latest}
+        return jsonify(
+            {
+                "success": True,
+                "auto": format_sync(by_mode.get(True)),
+                "manual": format_sync(by_mode.get(False)),
+            }
+        )
+
     try:
         if otp_config_id:
             otp_config = db.query(OtpConfiguration).filter_by(id=otp_config_id).first()
             if not otp_config:
                 return jsonify({"success": False, "message": "Config not found"}), 404
 
-            latest_auto = (
-                db.query(SyncLog)
-                .filter_by(
-                    grist_user_id=otp_config.grist_user_id,
-                    grist_doc_id=otp_config.grist_doc_id,
-                    auto=True,
-                )
-                .order_by(SyncLog.timestamp.desc())
-                .first()
+            return latest_by_mode(
+                grist_user_id=otp_config.grist_user_id,
+                grist_doc_id=otp_config.grist_doc_id,
             )
 
-            latest_manual = (
-                db.query(SyncLog)
-                .filter_by(
-                    grist_user_id=otp_config.grist_user_id,
-                    grist_doc_id=otp_config.grist_doc_id,
-                    auto=False,
-                )
-                .order_by(SyncLog.timestamp.desc())
-                .first()
-            )
-
-            return jsonify(
-                {
-                    "success": True,
-                    "auto": format_sync(latest_auto),
-                    "manual": format_sync(latest_manual),
-                }
-            )
-
-        latest_auto = (
-            db.query(SyncLog)
-            .filter_by(
-                grist_doc_id=grist_doc_id,
-                auto=True,
-            )
-            .order_by(SyncLog.timestamp.desc())
-            .first()
-        )
-
-        latest_manual = (
-            db.query(SyncLog)
-            .filter_by(
-                grist_doc_id=grist_doc_id,
-                auto=False,
-            )
-            .order_by(SyncLog.timestamp.desc())
-            .first()
-        )
-
-        return jsonify(
-            {
-                "success": True,
-                "auto": format_sync(latest_auto),
-                "manual": format_sync(latest_manual),
-            }
-        )
+        return latest_by_mode(grist_doc_id=grist_doc_id)
 
     except Exception as e:
         logger.error(f"Erreur récupération dernier sync log: {str(e)}")
@@ -739,33 +757,27 @@ def api_reload_scheduler():
     try:
         reload_scheduler_jobs(sync_manager)
 
-        # Récupérer les détails des jobs
-        jobs = scheduler.get_jobs()
+        # Détails des plannings actifs, en une requête
+        schedules = {
+            schedule.otp_config_id: schedule
+            for schedule in load_active_schedules(db)
+        }
         jobs_details = []
 
-        for job in jobs:
+        for job in scheduler.get_jobs():
             if job.id.startswith("scheduled_sync_"):
                 config_id = job.args[0]
-                # Récupérer les détails de la config
-                config = db.query(OtpConfiguration).filter_by(id=config_id).first()
-                if config:
-                    # Récupérer l'ID du schedule
-                    schedule = (
-                        db.query(UserSchedule)
-                        .filter_by(otp_config_id=config_id)
-                        .first()
-                    )
-                    schedule_id = schedule.id if schedule else None
-
+                schedule = schedules.get(config_id)
+                if schedule:
                     jobs_details.append(
                         {
-                            "schedule_id": schedule_id,
+                            "schedule_id": schedule.schedule_id,
                             "config_id": config_id,
-                            "demarche": config.demarche_number,
+                            "demarche": schedule.demarche_number,
                             "next_run": job.next_run_time.isoformat()
                             if job.next_run_time
                             else None,
-                            "document": config.grist_doc_id,
+                            "document": schedule.grist_doc_id,
                         }
                     )
 
@@ -843,6 +855,25 @@ def api_start_sync():
         return jsonify({"success": False, "message": "Erreur interne du serveur"}), 500
 
 
+@app.route("/api/task/<task_id>/logs", methods=["GET"])
+def api_task_logs(task_id):
+    """Route pour récupérer les logs d'une tâche, y compris ceux déplacés hors mémoire"""
+    try:
+        offset = int(request.args.get("offset", 0))
+        limit = request.args.get("limit")
+        limit = int(limit) if limit else None
+    except ValueError:
+        return jsonify(
+            {"success": False, "message": "offset et limit doivent être des entiers"}
+        ), 400
+
+    logs = sync_manager.get_task_logs(task_id, offset=max(0, offset), limit=limit)
+    if logs is None:
+        return jsonify({"success": False, "message": "Tâche inconnue"}), 404
+
+    return jsonify({"success": True, "offset": offset, "logs": logs})
+
+
 @app.route("/execution")
 def execution():
     """Page d'exécution et de suivi"""
@@ -1,5 +1,8 @@
+import hashlib
 import os
 import logging
+import threading
+import time
 from cryptography.fernet import Fernet
 from database.database_manager import DatabaseManager
 from grist.client import GristClient
@@ -7,15 +10,69 @@ from utils.constants import DEMARCHES_API_URL
 
 logger = logging.getLogger(__name__)
 
+# Durée de validité (secondes) du cache des configurations déchiffrées
+# (0 = désactivé)
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", "60"))
+# Durée de validité (secondes) des emails Grist déjà récupérés via SCIM
+# pour un couple (URL Grist, clé API) (0 = récupération systématique)
+GRIST_EMAIL_CACHE_TTL = float(os.getenv("GRIST_EMAIL_CACHE_TTL", "86400"))
+
 
 class ConfigManager:
     """Gestionnaire de configuration optimisé avec sauvegarde robuste"""
 
     SENSITIVE_KEYS = ["ds_api_token", "grist_api_key"]
 
+    # Configurations déchiffrées, partagées par toutes les instances :
+    # {(database_url, otp_config_id): (expiration, config)}
+    _config_cache: dict[tuple, tuple[float, dict]] = {}
+    _config_cache_lock = threading.Lock()
+
+    # Emails Grist récupérés : {(base_url, empreinte de la clé): (expiration, email)}
+    _grist_email_cache: dict[tuple, tuple[float, str]] = {}
+    # Emails déjà écrits en base : {(database_url, otp_config_id): email}
+    _stored_grist_emails: dict[tuple, str] = {}
+
     def __init__(self, database_url):
         self.database_url = database_url
 
+    def _get_cached_config(self, otp_config_id) -> dict | None:
+        """Copie de la configuration en cache, si encore valide"""
+        key = (self.database_url, int(otp_config_id))
+
+        with ConfigManager._config_cache_lock:
+            entry = ConfigManager._config_cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del ConfigManager._config_cache[key]
+                return None
+            return dict(entry[1])
+
+    def _cache_config(self, config: dict) -> None:
+        if CONFIG_CACHE_TTL <= 0 or not config.get("otp_config_id"):
+            return
+
+        with ConfigManager._config_cache_lock:
+            ConfigManager._config_cache[(self.database_url, config["otp_config_id"])] = (
+                time.monotonic() + CONFIG_CACHE_TTL,
+                dict(config),
+            )
+
+    def invalidate_config(self, otp_config_id=None) -> None:
+        """
+        Retire une configuration du cache (toutes si otp_config_id est None).
+        À appeler après toute modification ou suppression en base.
+        """
+        with ConfigManager._config_cache_lock:
+            if otp_config_id is None:
+                ConfigManager._config_cache.clear()
+                ConfigManager._stored_grist_emails.clear()
+            else:
+                key = (self.database_url, int(otp_config_id))
+                ConfigManager._config_cache.pop(key, None)
+                ConfigManager._stored_grist_emails.pop(key, None)
+
     def get_env_path(self):
         """Retourne le chemin vers le fichier .env"""
         script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -145,22 +202,58 @@ class ConfigManager:
 
         return ConfigManager.normalize_config(raw)
 
+    @staticmethod
+    def _api_key_fingerprint(api_key: str) -> str:
+        """Empreinte de la clé API : la clé elle-même n'est pas gardée en mémoire"""
+        return hashlib.sha256(api_key.encode()).hexdigest()
+
+    @staticmethod
+    def get_grist_user_email(base_url, api_key) -> str | None:
+        """
+        Email Grist associé à la clé API (SCIM /Me), mémorisé
+        GRIST_EMAIL_CACHE_TTL secondes par couple (URL Grist, clé API)
+        """
+        key = (base_url.rstrip("/"), ConfigManager._api_key_fingerprint(api_key))
+
+        with ConfigManager._config_cache_lock:
+            entry = ConfigManager._grist_email_cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        email = GristClient(base_url, api_key).get_grist_user_email()
+
+        if email and GRIST_EMAIL_CACHE_TTL > 0:
+            with ConfigManager._config_cache_lock:
+                ConfigManager._grist_email_cache[key] = (
+                    time.monotonic() + GRIST_EMAIL_CACHE_TTL,
+                    email,
+                )
+
+        return email
+
     def fetch_and_store_grist_user_email(
         self, otp_config_id, base_url, api_key
     ) -> str | None:
         """
         Lignes communes save/sync : récupère l'email Grist via le token et l'écrit en base.
+        L'appel SCIM est mémorisé (voir get_grist_user_email) et l'écriture
+        est omise si cet email a déjà été enregistré pour la configuration.
         Retourne l'email, ou None si indisponible (non-bloquant).
         """
         if not otp_config_id or not base_url or not api_key:
             return None
 
-        email = GristClient(base_url, api_key).get_grist_user_email()
+        email = ConfigManager.get_grist_user_email(base_url, api_key)
 
         if not email:
             return None
 
-        conn = DatabaseManager.get_connection(self.database_url)
+        stored_key = (self.database_url, int(otp_config_id))
+        with ConfigManager._config_cache_lock:
+            if ConfigManager._stored_grist_emails.get(stored_key) == email:
+                return email
+
+        conn = DatabaseManager.get_pooled_connection(self.database_url)
 
         try:
             with conn.cursor() as cursor:
@@ -177,11 +270,14 @@ class ConfigManager:
             if conn:
                 conn.close()
 
+        with ConfigManager._config_cache_lock:
+            ConfigManager._stored_grist_emails[stored_key] = email
+
         return email
 
     def load_config(self, grist_user_id, grist_doc_id):
         """Charge la configuration depuis la base de données - retourne une liste"""
-        conn = DatabaseManager.get_connection(self.database_url)
+        conn = DatabaseManager.get_pooled_connection(self.database_url)
 
         try:
             with conn.cursor() as cursor:
@@ -223,8 +319,16 @@ class ConfigManager:
             conn.close()
 
     def load_config_by_id(self, otp_config_id):
-        """Charge la configuration depuis la base de données par ID"""
-        conn = DatabaseManager.get_connection(self.database_url)
+        """
+        Charge la configuration depuis la base de données par ID.
+        Les configurations déchiffrées sont gardées CONFIG_CACHE_TTL secondes.
+        """
+        if otp_config_id:
+            cached = self._get_cached_config(otp_config_id)
+            if cached is not None:
+                return cached
+
+        conn = DatabaseManager.get_pooled_connection(self.database_url)
 
         try:
             with conn.cursor() as cursor:
@@ -255,7 +359,10 @@ class ConfigManager:
                 if not row:
                     raise Exception("Configuration not found")
 
-                return ConfigManager._build_config_from_row(row)
+                config = ConfigManager._build_config_from_row(row)
+                self._cache_config(config)
+
+                return config
 
         except Exception as e:
             logger.error(f"Erreur lors du chargement depuis la base: {str(e)}")
@@ -266,7 +373,7 @@ class ConfigManager:
 
     def save_config(self, config):
         """Sauvegarde la configuration dans la base de données"""
-        conn = DatabaseManager.get_connection(self.database_url)
+        conn = DatabaseManager.get_pooled_connection(self.database_url)
         config = ConfigManager.normalize_config(config)
 
         try:
@@ -419,6 +526,7 @@ class ConfigManager:
                     )
 
                 conn.commit()
+                self.invalidate_config(otp_config_id)
 
                 if grist_api_key_encrypted:
                     grist_api_key_decrypted = ConfigManager.decrypt_value(
@@ -1,6 +1,8 @@
 import psycopg2
 import logging
 
+from database.engine import get_engine
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +21,18 @@ class DatabaseManager:
             logger.error(f"Erreur de connexion à la base de données: {str(e)}")
             return None
 
+    @staticmethod
+    def get_pooled_connection(database_url):
+        """
+        Emprunte une connexion psycopg2 au pool partagé du processus.
+        close() la rend au pool au lieu de la fermer.
+        """
+        try:
+            return get_engine(database_url).raw_connection()
+        except Exception as e:
+            logger.error(f"Erreur de connexion à la base de données: {str(e)}")
+            return None
+
     @staticmethod
     def create_table_if_not_exists(conn):
         """Crée la table otp_configurations
@@ -132,6 +146,61 @@ class DatabaseManager:
                 ADD COLUMN IF NOT EXISTS error_count INTEGER
             """)
 
+            # Colonne duration (Double, nullable) : durée en secondes
+            cursor.execute("""
+                ALTER TABLE sync_logs
+                ADD COLUMN IF NOT EXISTS duration DOUBLE PRECISION
+            """)
+
+            # Agrégats journaliers de sync_logs (voir sync/log_retention.py)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sync_log_daily_summaries (
+                    id SERIAL PRIMARY KEY,
+                    day DATE NOT NULL,
+                    otp_config_id INTEGER REFERENCES otp_configurations(id) ON DELETE SET NULL,
+                    grist_doc_id TEXT,
+                    grist_user_id TEXT,
+                    demarche_number TEXT,
+                    runs INTEGER NOT NULL,
+                    successes INTEGER NOT NULL,
+                    errors INTEGER NOT NULL,
+                    mean_duration DOUBLE PRECISION,
+                    p95_duration DOUBLE PRECISION,
+                    dossiers_synced INTEGER,
+                    dossiers_errors INTEGER
+                )
+            """)
+
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sync_log_daily_summaries_day_config
+                ON sync_log_daily_summaries (day, otp_config_id)
+            """)
+
+            # Index des routes de suivi des synchronisations :
+            # dernière sync auto/manuelle d'un document (DISTINCT ON auto)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sync_logs_doc_auto_timestamp
+                ON sync_logs (grist_doc_id, auto, timestamp DESC)
+            """)
+
+            # historique d'une configuration
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sync_logs_config_auto_timestamp
+                ON sync_logs (otp_config_id, auto, timestamp DESC)
+            """)
+
+            # rapport des dernières 24h (filtre et tri sur timestamp)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sync_logs_timestamp
+                ON sync_logs (timestamp)
+            """)
+
+            # jointure du rapport avec les planifications
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_user_schedules_otp_config_id
+                ON user_schedules (otp_config_id)
+            """)
+
             # Ajouter les colonnes manquantes aux tables existantes
             # (aucune pour le moment)
 
@@ -0,0 +1,47 @@
+"""
+Moteur SQLAlchemy partagé par le processus.
+
+Routes Flask, scheduler, SyncManager et ConfigManager utilisent le même pool
+de connexions, au lieu de créer un moteur (ou une connexion psycopg2) à chaque
+appel. La taille du pool suit la concurrence des synchronisations planifiées.
+"""
+
+import os
+import threading
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import sessionmaker
+
+from utils.constants import DATABASE_URL
+
+# Synchronisations simultanées (file planifiée) : chacune enregistre son SyncLog
+_SYNC_MAX_CONCURRENCY = int(os.getenv("SYNC_MAX_CONCURRENCY", "4"))
+
+# Connexions permanentes : une par synchronisation simultanée,
+# plus les threads du scheduler APScheduler
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(_SYNC_MAX_CONCURRENCY + 2)))
+# Connexions supplémentaires temporaires (pics de requêtes de l'interface)
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(_SYNC_MAX_CONCURRENCY)))
+# Recyclage (secondes) des connexions, avant leur fermeture côté serveur
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+_engines: dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(database_url: str = DATABASE_URL) -> Engine:
+    """Retourne le moteur (avec pool) associé à une URL, créé au premier appel"""
+    with _engines_lock:
+        if database_url not in _engines:
+            _engines[database_url] = create_engine(
+                database_url,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=True,
+            )
+        return _engines[database_url]
+
+
+engine = get_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
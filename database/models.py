@@ -1,6 +1,6 @@
-from sqlalchemy import Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Integer, String, Boolean, Date, DateTime, Float, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 
 
 class Base(DeclarativeBase):
@@ -54,3 +54,25 @@ class SyncLog(Base):
     auto: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
     success_count: Mapped[int | None] = mapped_column(Integer)
     error_count: Mapped[int | None] = mapped_column(Integer)
+    # Durée de la synchronisation en secondes (estimation du coût des suivantes)
+    duration: Mapped[float | None] = mapped_column(Float)
+
+
+# Agrégat journalier de sync_logs par configuration (voir sync/log_retention.py)
+class SyncLogDailySummary(Base):
+    __tablename__: str = "sync_log_daily_summaries"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    otp_config_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("otp_configurations.id", ondelete="SET NULL")
+    )
+    grist_doc_id: Mapped[str | None] = mapped_column(String)
+    grist_user_id: Mapped[str | None] = mapped_column(String)
+    demarche_number: Mapped[str | None] = mapped_column(String)
+    runs: Mapped[int] = mapped_column(Integer, nullable=False)
+    successes: Mapped[int] = mapped_column(Integer, nullable=False)
+    errors: Mapped[int] = mapped_column(Integer, nullable=False)
+    mean_duration: Mapped[float | None] = mapped_column(Float)
+    p95_duration: Mapped[float | None] = mapped_column(Float)
+    dossiers_synced: Mapped[int | None] = mapped_column(Integer)
+    dossiers_errors: Mapped[int | None] = mapped_column(Integer)
@@ -4,8 +4,13 @@ Détection des dossiers supprimés de Démarches Simplifiées, via le champ
 `deletedDossiers` de l'API DN. Interroge l'API directement (plus de comparaison
 par absence) et met à jour les colonnes dossiers_supprimes_DN, date_suppression
 et raison_suppression dans Grist.
+
+Les lignes déjà marquées avec la même date de suppression ne sont pas réécrites :
+des exécutions successives sans nouvelle suppression n'envoient aucun PATCH.
 """
 
+from datetime import datetime
+
 import requests
 
 from queries_graphql import get_deleted_dossiers
@@ -16,15 +21,25 @@ DATE_COLUMN_ID = "date_suppression"
 REASON_COLUMN_ID = "raison_suppression"
 
 
-def _ensure_deletion_columns(client, table_id, log, log_error):
-    """Crée les colonnes de suppression (Bool/DateTime/Text) si elles n'existent pas."""
+def _ensure_deletion_columns(client, table_id, log, log_error, existing_columns=None):
+    """
+    Crée les colonnes de suppression (Bool/DateTime/Text) si elles n'existent pas.
+    existing_columns (IDs des colonnes déjà connues) évite la lecture de /columns.
+
+    Returns:
+        bool | None: True si les colonnes existaient déjà, False si elles viennent
+        d'être créées, None si leur création a échoué
+    """
     url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_id}/columns"
-    response = requests.get(url, headers=client.headers)
-    existing = (
-        {col["id"] for col in response.json().get("columns", [])}
-        if response.status_code == 200
-        else set()
-    )
+    if existing_columns is not None:
+        existing = set(existing_columns)
+    else:
+        response = requests.get(url, headers=client.headers)
+        existing = (
+            {col["id"] for col in response.json().get("columns", [])}
+            if response.status_code == 200
+            else set()
+        )
 
     needed = [
         {"id": COLUMN_ID, "fields": {"label": COLUMN_LABEL, "type": "Bool"}},
@@ -44,24 +59,75 @@ def _ensure_deletion_columns(client, table_id, log, log_error):
     r = requests.post(url, headers=client.headers, json={"columns": missing})
     if r.status_code == 200:
         log(f"  Colonnes créées : {[c['id'] for c in missing]}")
-        return True
+        return False
 
     log_error(f"  Impossible de créer les colonnes : {r.status_code} - {r.text}")
-    return False
+    return None
+
+
+def _to_timestamp(value):
+    """Date DN (ISO8601) ou Grist (secondes epoch) en secondes epoch"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _fetch_flagged_rows(client, table_id):
+    """
+    Retourne {id Grist: date_suppression} des lignes déjà marquées supprimées,
+    via l'endpoint SQL (seules ces lignes sont lues). {} en cas d'échec.
+    """
+    response = requests.get(
+        f"{client.base_url}/docs/{client.doc_id}/sql",
+        headers=client.headers,
+        params={
+            "q": f'SELECT id, "{DATE_COLUMN_ID}" FROM "{table_id}" '
+            f'WHERE "{COLUMN_ID}"'
+        },
+    )
+    if response.status_code != 200:
+        return {}
+
+    return {
+        record["fields"].get("id"): record["fields"].get(DATE_COLUMN_ID)
+        for record in response.json().get("records", [])
+    }
 
 
 def _mark_deleted_in_grist(
-    client, table_id, grist_dict, deleted_dossiers, log, log_error
+    client, table_id, grist_dict, deleted_dossiers, log, log_error, flagged_rows=None
 ):
-    """PATCH en batch les records à marquer comme supprimés, avec date et raison."""
+    """
+    PATCH en batch les records à marquer comme supprimés, avec date et raison.
+    Les lignes de flagged_rows ({id Grist: date}) déjà marquées à la même date
+    sont ignorées.
+    """
+    flagged_rows = flagged_rows or {}
     records = []
+    already_marked = 0
     for d in deleted_dossiers:
         num_str = str(d["number"])
         if num_str not in grist_dict:
             continue
+        grist_id = grist_dict[num_str]
+        if grist_id in flagged_rows:
+            flagged_at = _to_timestamp(flagged_rows[grist_id])
+            deleted_at = _to_timestamp(d.get("dateSupression"))
+            if flagged_at == deleted_at or (
+                flagged_at is not None
+                and deleted_at is not None
+                and abs(flagged_at - deleted_at) < 1
+            ):
+                already_marked += 1
+                continue
         records.append(
             {
-                "id": grist_dict[num_str],
+                "id": grist_id,
                 "fields": {
                     COLUMN_ID: True,
                     DATE_COLUMN_ID: d.get("dateSupression"),
@@ -70,6 +136,9 @@ def _mark_deleted_in_grist(
             }
         )
 
+    if already_marked:
+        log(f"  {already_marked} dossier(s) déjà marqué(s) à la même date, ignoré(s)")
+
     if not records:
         return 0
 
@@ -85,7 +154,14 @@ def _mark_deleted_in_grist(
 
 
 def check_deleted_dossiers(
-    client, table_id, demarche_number, log, log_error, deleted_since=None
+    client,
+    table_id,
+    demarche_number,
+    log,
+    log_error,
+    deleted_since=None,
+    grist_dict=None,
+    existing_columns=None,
 ):
     """
     Récupère les dossiers supprimés directement depuis l'API DN (deletedDossiers)
@@ -98,6 +174,8 @@ def check_deleted_dossiers(
         log:             Fonction de log du processeur principal
         log_error:       Fonction de log d'erreur
         deleted_since:   ISO8601DateTime optionnel, pour limiter aux suppressions récentes
+        grist_dict:      {numéro: id Grist} déjà chargé (évite de relire la table)
+        existing_columns: IDs des colonnes de la table déjà connus (évite /columns)
 
     Returns:
         dict: {"ds_deleted_total": int, "newly_marked": int, "deleted_numbers": list[int]}
@@ -107,7 +185,10 @@ def check_deleted_dossiers(
         f"  deleted_since utilisé : {deleted_since or '(aucun — récupération complète)'}"
     )
 
-    if not _ensure_deletion_columns(client, table_id, log, log_error):
+    columns_existed = _ensure_deletion_columns(
+        client, table_id, log, log_error, existing_columns=existing_columns
+    )
+    if columns_existed is None:
         return {}
 
     deleted_dossiers = get_deleted_dossiers(
@@ -120,9 +201,18 @@ def check_deleted_dossiers(
         log("--- Fin vérification dossiers supprimés ---\n")
         return {"ds_deleted_total": 0, "newly_marked": 0}
 
-    grist_dict = client.get_existing_dossier_numbers(table_id)
+    if grist_dict is None:
+        grist_dict = client.get_existing_dossier_numbers(table_id)
+    # Colonnes tout juste créées : aucune ligne ne peut être déjà marquée
+    flagged_rows = _fetch_flagged_rows(client, table_id) if columns_existed else {}
     newly_marked = _mark_deleted_in_grist(
-        client, table_id, grist_dict, deleted_dossiers, log, log_error
+        client,
+        table_id,
+        grist_dict,
+        deleted_dossiers,
+        log,
+        log_error,
+        flagged_rows=flagged_rows,
     )
 
     log("--- Fin vérification dossiers supprimés ---\n")
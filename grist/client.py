@@ -1,8 +1,12 @@
 import traceback
 
 import requests
+from utils.events import emit_event
 from utils.log import log, log_verbose, log_error, log_progress
 
+# Nombre maximal d'enregistrements par requête d'écriture
+GRIST_WRITE_CHUNK_SIZE = 500
+
 
 class GristClient:
     def __init__(self, base_url, api_key, doc_id=None):
@@ -13,11 +17,17 @@ class GristClient:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
         }
+        # Colonnes créées par ce client pendant la sync : {table_id: {col_id}}
+        self.created_columns = {}
         log(f"Initialisation du client Grist avec l'URL de base: {self.base_url}")
 
     def set_doc_id(self, doc_id):
         self.doc_id = doc_id
 
+    def record_created_columns(self, table_id, column_ids):
+        """Mémorise des colonnes créées (tables créées comprises) pendant la sync"""
+        self.created_columns.setdefault(table_id, set()).update(column_ids)
+
     def _extract_email_from_scim(self, data: dict) -> str | None:
         """
         Extrait l'email primaire d'une réponse SCIM /Me.
@@ -127,6 +137,36 @@ class GristClient:
 
         return dossier_dict
 
+    def get_existing_records_by_key(self, table_id, key_fields):
+        """
+        Retourne {clé: id Grist} pour une table, la clé étant le premier
+        champ non vide parmi key_fields.
+        """
+        if tuple(key_fields) == ("dossier_number", "number"):
+            return self.get_existing_dossier_numbers(table_id)
+
+        if not self.doc_id:
+            raise ValueError("Document ID is required")
+
+        url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
+        response = requests.get(url, headers=self.headers)
+        if response.status_code != 200:
+            log_error(
+                f"Erreur lors de la récupération des enregistrements existants: {response.status_code} - {response.text}"
+            )
+            return {}
+
+        records_dict = {}
+        for record in response.json().get("records", []):
+            fields = record.get("fields", {})
+            for key_field in key_fields:
+                if fields.get(key_field):
+                    records_dict[str(fields[key_field])] = record.get("id")
+                    break
+
+        log(f"  Table '{table_id}': {len(records_dict)} enregistrements existants")
+        return records_dict
+
     # Fonction upsert par date
     def get_existing_dossier_dates(self, table_id):
         """
@@ -193,6 +233,10 @@ class GristClient:
                     "last_sync_status": fields.get("last_sync_status"),
                     "last_sync_duration": fields.get("last_sync_duration"),
                     "force_full_sync": fields.get("force_full_sync", False),
+                    "checkpoint_key": fields.get("checkpoint_key"),
+                    "checkpoint_page_cursor": fields.get("checkpoint_page_cursor"),
+                    "checkpoint_last_dossier": fields.get("checkpoint_last_dossier"),
+                    "checkpoint_at": fields.get("checkpoint_at"),
                 }
 
         return None  # première sync
@@ -363,6 +407,10 @@ class GristClient:
             response.raise_for_status()
 
         result = response.json()
+        # Grist peut normaliser l'ID de la table créée
+        created_tables = result.get("tables") if isinstance(result, dict) else None
+        created_id = (created_tables or [{}])[0].get("id") or table_id
+        self.record_created_columns(created_id, [col["id"] for col in columns])
         return result
 
     def create_or_clear_grist_tables(self, demarche_number, column_types):
@@ -468,15 +516,84 @@ class GristClient:
             dossiers_list: Liste des enregistrements à traiter
             existing_records: Cache optionnel des enregistrements existants (dict)
         """
+        total_success, total_errors = self.upsert_records_by_key(
+            table_id,
+            dossiers_list,
+            key_fields=("dossier_number", "number"),
+            existing_records=existing_records,
+            column_cache=column_cache,
+        )
+
+        # Retourner le succès global
+        return total_success > 0 and total_errors == 0
+
+    def upsert_avis_in_grist(
+        self, table_id, avis_records, existing_records=None, column_cache=None
+    ):
+        """
+        Insère ou met à jour des avis, identifiés par avis_id.
+
+        Args:
+            table_id: ID de la table Grist des avis
+            avis_records: Liste des avis à traiter
+            existing_records: Cache optionnel {avis_id: id Grist}, complété en place
+
+        Returns:
+            tuple: (nombre de succès, nombre d'échecs)
+        """
+        return self.upsert_records_by_key(
+            table_id,
+            avis_records,
+            key_fields=("avis_id",),
+            existing_records=existing_records,
+            column_cache=column_cache,
+        )
+
+    def upsert_records_by_key(
+        self,
+        table_id,
+        records,
+        key_fields,
+        existing_records=None,
+        column_cache=None,
+        chunk_size=GRIST_WRITE_CHUNK_SIZE,
+    ):
+        """
+        Insère ou met à jour des enregistrements identifiés par une clé métier,
+        par lots de chunk_size enregistrements.
+
+        Args:
+            table_id: ID de la table Grist
+            records: Liste des enregistrements à traiter
+            key_fields: Champs portant la clé, par ordre de priorité
+            existing_records: Cache optionnel {clé: id Grist}, complété en place
+                avec les IDs des enregistrements créés
+            column_cache: Cache optionnel des colonnes (ColumnCache)
+            chunk_size: Nombre maximal d'enregistrements par requête
+
+        Returns:
+            tuple: (nombre de succès, nombre d'échecs)
+        """
         if not self.doc_id:
             raise ValueError("Document ID is required")
 
         # Utiliser le cache si fourni, sinon récupérer
-        if not existing_records:
-            existing_records = self.get_existing_dossier_numbers(table_id)
+        if existing_records is None:
+            existing_records = self.get_existing_records_by_key(table_id, key_fields)
             log_verbose(
                 f"Récupération de {len(existing_records)} enregistrements existants pour traitement par lot"
             )
+        elif not existing_records:
+            # Cache vide : table encore vide, ou lecture initiale en échec
+            # (get_existing_* renvoie {} en cas d'erreur). On relit pour ne pas
+            # recréer en double les lignes existantes, en complétant le cache
+            # en place pour les lots suivants.
+            existing_records.update(
+                self.get_existing_records_by_key(table_id, key_fields)
+            )
+            log_verbose(
+                f"Cache vide, relecture: {len(existing_records)} enregistrements existants"
+            )
         else:
             log_verbose(
                 f"Utilisation du cache: {len(existing_records)} enregistrements existants"
@@ -498,35 +615,34 @@ class GristClient:
         except Exception as e:
             log_error(f"Erreur lors de la récupération des colonnes: {str(e)}")
 
+        def record_key(fields):
+            for key_field in key_fields:
+                if fields.get(key_field):
+                    return str(fields[key_field])
+            return None
+
         # Préparer les listes pour les opérations de création et de mise à jour
         to_create = []
         to_update = []
+        skipped = 0
 
-        for row_dict in dossiers_list:
+        for row_dict in records:
             # Filtrer les colonnes qui existent dans la table
             filtered_row_dict = {}
             for key, value in row_dict.items():
-                if (
-                    not existing_columns
-                    or key in existing_columns
-                    or key == "dossier_number"
-                ):
+                if not existing_columns or key in existing_columns or key in key_fields:
                     filtered_row_dict[key] = value
 
-            # Obtenir le numéro de dossier
-            dossier_number = filtered_row_dict.get(
-                "dossier_number"
-            ) or filtered_row_dict.get("number")
-            if not dossier_number:
-                log_error("dossier_number ou number manquant dans les données")
+            # Obtenir la clé de l'enregistrement
+            key = record_key(filtered_row_dict)
+            if not key:
+                log_error(f"{' ou '.join(key_fields)} manquant dans les données")
+                skipped += 1
                 continue
 
-            dossier_number_str = str(dossier_number)
-
-            if dossier_number_str in existing_records:
+            if key in existing_records:
                 # Mise à jour d'un enregistrement existant
-                record_id = existing_records[dossier_number_str]
-                to_update.append({"id": record_id, "fields": filtered_row_dict})
+                to_update.append({"id": existing_records[key], "fields": filtered_row_dict})
             else:
                 # Création d'un nouvel enregistrement
                 to_create.append({"fields": filtered_row_dict})
@@ -534,16 +650,20 @@ class GristClient:
         # Variables pour suivre les succès
         total_success = 0
         total_errors = 0
+        total_updated = 0
+        records_url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
 
         # Traitement des mises à jour
-        if to_update:
+        for start in range(0, len(to_update), chunk_size):
+            chunk = to_update[start : start + chunk_size]
+
             # Normaliser tous les enregistrements pour qu'ils aient les mêmes champs
             all_update_keys = set()
-            for record in to_update:
+            for record in chunk:
                 all_update_keys.update(record["fields"].keys())
 
             normalized_updates = []
-            for record in to_update:
+            for record in chunk:
                 normalized_fields = {}
                 for key in all_update_keys:
                     normalized_fields[key] = record["fields"].get(key, None)
@@ -552,10 +672,9 @@ class GristClient:
                 )
 
             # Mise à jour par lot pour toutes les tables
-            update_url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
             update_payload = {"records": normalized_updates}
             update_response = requests.patch(
-                update_url, headers=self.headers, json=update_payload
+                records_url, headers=self.headers, json=update_payload
             )
 
             if update_response.status_code in [200, 201]:
@@ -563,6 +682,7 @@ class GristClient:
                     f"Mise à jour par lot: {len(normalized_updates)} enregistrements mis à jour avec succès"
                 )
                 total_success += len(normalized_updates)
+                total_updated += len(normalized_updates)
             else:
                 log_error(
                     f"Erreur lors de la mise à jour par lot: {update_response.status_code} - {update_response.text}"
@@ -574,7 +694,7 @@ class GristClient:
                 for individual_record in normalized_updates:
                     individual_payload = {"records": [individual_record]}
                     individual_response = requests.patch(
-                        update_url, headers=self.headers, json=individual_payload
+                        records_url, headers=self.headers, json=individual_payload
                     )
 
                     if individual_response.status_code in [200, 201]:
@@ -584,28 +704,30 @@ class GristClient:
                         log_error(f"Échec individuel pour {individual_record['id']}")
 
                 total_success += update_success
+                total_updated += update_success
                 log(
                     f"Mise à jour individuelle: {update_success}/{len(normalized_updates)} succès"
                 )
 
         # Traitement des créations
-        if to_create:
+        for start in range(0, len(to_create), chunk_size):
+            chunk = to_create[start : start + chunk_size]
+
             # Normaliser tous les enregistrements de création
             all_create_keys = set()
-            for record in to_create:
+            for record in chunk:
                 all_create_keys.update(record["fields"].keys())
 
             normalized_creations = []
-            for record in to_create:
+            for record in chunk:
                 normalized_fields = {}
                 for key in all_create_keys:
                     normalized_fields[key] = record["fields"].get(key, None)
                 normalized_creations.append({"fields": normalized_fields})
 
-            create_url = f"{self.base_url}/docs/{self.doc_id}/tables/{table_id}/records"
             create_payload = {"records": normalized_creations}
             create_response = requests.post(
-                create_url, headers=self.headers, json=create_payload
+                records_url, headers=self.headers, json=create_payload
             )
             log_progress.log("Écriture dans Grist")
 
@@ -616,26 +738,28 @@ class GristClient:
                 total_success += len(normalized_creations)
                 # Mettre à jour le cache in-place avec les IDs Grist créés
                 created_ids = create_response.json().get("records", [])
-                for i, created in enumerate(created_ids):
-                    if i < len(normalized_creations):
-                        dossier_num = normalized_creations[i]["fields"].get(
-                            "dossier_number"
-                        ) or normalized_creations[i]["fields"].get("number")
-                        if dossier_num and existing_records is not None:
-                            existing_records[str(dossier_num)] = created.get("id")
+                for creation, created in zip(normalized_creations, created_ids):
+                    key = record_key(creation["fields"])
+                    if key:
+                        existing_records[key] = created.get("id")
             else:
                 log_error(
                     f"Erreur lors de la création par lot: {create_response.status_code} - {create_response.text}"
                 )
                 total_errors += len(normalized_creations)
 
-        # Retourner le succès global
-        success = total_success > 0 and total_errors == 0
-
         # Log du résumé
         if total_success > 0 or total_errors > 0:
             log(
                 f"Résumé upsert table {table_id}: {total_success} succès, {total_errors} échecs"
             )
+        emit_event(
+            "rows",
+            table=table_id,
+            created=total_success - total_updated,
+            updated=total_updated,
+            failed=total_errors,
+            skipped=skipped,
+        )
 
-        return success
+        return total_success, total_errors
@@ -1,5 +1,6 @@
 import concurrent.futures
 import hashlib
+import itertools
 import json as json_module
 import os
 import re
@@ -8,6 +9,7 @@ import time
 import traceback
 import unicodedata
 from datetime import datetime, timezone
+from urllib.parse import urlparse
 from zoneinfo import ZoneInfo
 
 import requests
@@ -20,7 +22,7 @@ from deleted_dossiers_checker import check_deleted_dossiers
 from grist.client import GristClient
 from hide_id_columns import IdColumnHider
 from queries import dossier_to_flat_data, get_dossier
-from queries_graphql import get_demarche_dossiers_filtered
+from queries_graphql import iter_demarche_dossiers_filtered
 from queries_util import get_timings
 from schema_utils import (
     create_columns_from_schema,
@@ -30,11 +32,21 @@ from schema_utils import (
 )
 from utils.api_validator import verify_api_connections
 from utils.constants import DEMARCHES_API_URL, EXIT_CODE_EXTERNAL_API_ERROR
+from utils.events import emit_event
+from utils.http_metrics import install_http_instrumentation
 from utils.log import log, log_verbose, log_error, log_progress
 
 API_TOKEN = os.getenv("DEMARCHES_API_TOKEN")
 API_URL = DEMARCHES_API_URL
 
+# Champs Sync_metadata remis à zéro quand une sync se termine
+CLEARED_CHECKPOINT = {
+    "checkpoint_key": "",
+    "checkpoint_page_cursor": "",
+    "checkpoint_last_dossier": 0,
+    "checkpoint_at": "",
+}
+
 
 def print_api_timings():
     timings = get_timings()
@@ -730,6 +742,9 @@ class ColumnCache:
             log(
                 f"  {len(columns_to_add)} colonnes ajoutées avec succès à la table {table_id}"
             )
+            self.client.record_created_columns(
+                table_id, [col["id"] for col in columns_to_add]
+            )
 
             # Mettre à jour le cache
             if table_id in self.columns_cache:
@@ -905,6 +920,9 @@ def add_missing_columns_to_table(client, table_id, missing_columns, column_types
             log(
                 f"  {len(columns_to_add)} colonnes ajoutées avec succès à la table {table_id}"
             )
+            client.record_created_columns(
+                table_id, [col["id"] for col in columns_to_add]
+            )
 
             # Vérifier que les colonnes ont bien été ajoutées
             verify_url = (
@@ -992,6 +1010,9 @@ def add_id_columns_based_on_annotations(client, table_id, annotations):
                 log_error(f"Erreur lors de l'ajout des colonnes d'ID: {response.text}")
             else:
                 log("Colonnes d'ID ajoutées avec succès")
+                client.record_created_columns(
+                    table_id, [col["id"] for col in columns_to_add]
+                )
 
                 return [col["id"] for col in columns_to_add]
 
@@ -1004,18 +1025,24 @@ def run_demarche_level_tasks(
     force_full_sync=False,
     deleted_since_cursor=None,
     schema_method_successful=False,
+    dossier_row_ids=None,
+    column_cache=None,
 ):
     """
     Opérations de niveau démarche, indépendantes des dossiers effectivement traités.
 
     À appeler depuis les deux `return` de `process_demarche_for_grist_optimized` :
-    celui de fin de fonction et celui du cas `total_dossiers == 0`. Poser une
+    celui de fin de fonction et celui du cas sans dossier à traiter. Poser une
     étiquette, ajouter un instructeur ou supprimer un dossier ne met à jour aucun
     dossier au sens d'`updatedSince` : sans le second appel, ces changements ne
     remonteraient dans Grist que si un dossier avait bougé par ailleurs.
 
     Chaque tâche est isolée dans son propre try/except : un échec n'empêche pas
     les suivantes.
+
+    dossier_row_ids ({numéro: id Grist} de la table dossiers) et column_cache,
+    déjà chargés par la boucle principale, évitent de relire la table dossiers
+    et ses colonnes lors de la vérification des suppressions.
     """
     # 1. Instructeurs (niveau démarche, à chaque sync)
     if table_ids.get("instructeurs"):
@@ -1048,23 +1075,101 @@ def run_demarche_level_tasks(
             log=log,
             log_error=log_error,
             deleted_since=deleted_since_cursor,
+            grist_dict=dossier_row_ids,
+            existing_columns=(
+                column_cache.get_columns(table_ids["dossier_table_id"])
+                if column_cache
+                else None
+            ),
         )
         nb_deleted = (deletion_result or {}).get("newly_marked", 0)
         log(f"Nombre de dossiers marqués supprimés dans Grist : {nb_deleted}")
+        emit_event("deleted", count=nb_deleted)
     except Exception as e:
         log_error(f"Erreur vérification dossiers supprimés : {e}")
 
-    # 4. Masquage des colonnes _id (toujours en dernier)
+    # 4. Masquage des colonnes _id (toujours en dernier), limité aux colonnes
+    #    créées pendant cette sync : rien à faire en régime établi
     if schema_method_successful:
         try:
             current_table_ids = set()
             _flatten_table_ids(table_ids, current_table_ids)
-            hider = IdColumnHider(client.base_url, client.api_key, client.doc_id)
-            hider.hide_id_columns(table_ids=current_table_ids)
+            created_columns = {
+                table_id: col_ids
+                for table_id, col_ids in client.created_columns.items()
+                if table_id in current_table_ids
+                and any(col_id.endswith("_id") for col_id in col_ids)
+            }
+            if created_columns:
+                hider = IdColumnHider(client.base_url, client.api_key, client.doc_id)
+                hider.hide_id_columns(columns=created_columns)
+            else:
+                log_verbose("Aucune nouvelle colonne _id à masquer")
         except Exception as e:
             log_error(f"Erreur lors du masquage des colonnes _id: {e}")
 
 
+def build_checkpoint_key(updated_since_cursor, api_filters):
+    """
+    Identifie le périmètre d'une sync (curseur updatedSince et filtres).
+    Un checkpoint n'est repris que par une sync de même périmètre.
+    """
+    scope = {
+        "updated_since": updated_since_cursor,
+        "api_filters": api_filters or {},
+        "env_filters": [
+            os.getenv(name, "")
+            for name in (
+                "DATE_DEPOT_DEBUT",
+                "DATE_DEPOT_FIN",
+                "STATUTS_DOSSIERS",
+                "GROUPES_INSTRUCTEURS",
+            )
+        ],
+    }
+    return hashlib.sha256(
+        json_module.dumps(scope, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+def skip_until_checkpoint(pages, last_dossier):
+    """
+    Écarte, dans la première page reprise, les dossiers jusqu'au dernier
+    dossier traité par la sync interrompue (inclus).
+    Si ce dossier n'y figure plus (modifié entre-temps), toute la page est retraitée.
+    """
+    for page_index, (page_cursor, dossiers) in enumerate(pages):
+        if page_index == 0:
+            for i, dossier in enumerate(dossiers):
+                if str(dossier["number"]) == str(last_dossier):
+                    dossiers = dossiers[i + 1 :]
+                    break
+        yield page_cursor, dossiers
+
+
+def batch_dossier_pages(pages, batch_size, stats=None):
+    """
+    Regroupe en lots de `batch_size` numéros les dossiers produits page par page.
+    Produit (numéros du lot, curseur de la page du dernier dossier du lot),
+    le curseur servant de point de reprise au checkpoint.
+    """
+    batch = []
+    batch_page_cursor = None
+
+    for page_cursor, dossiers in pages:
+        if stats is not None:
+            stats["kept"] += len(dossiers)
+        for dossier in dossiers:
+            batch.append(dossier["number"])
+            batch_page_cursor = page_cursor
+            if len(batch) == batch_size:
+                yield batch, batch_page_cursor
+                batch = []
+
+    if batch:
+        yield batch, batch_page_cursor
+
+
 # Fonction optimisée pour le traitement d'une démarche pour Grist (Possibilité d'augmenter ou de diminuer batch_size et max_workers)
 # Cette fonction est conçue pour être plus rapide et plus efficace, en utilisant le traitement par lots et le traitement parallèle.
 # Fonction optimisée complète et corrigée
@@ -1076,6 +1181,7 @@ def process_demarche_for_grist_optimized(
     batch_size=100,
     max_workers=3,
     api_filters=None,
+    repetable_write_mode="upsert",
 ):
     """
     Version optimisée du traitement d'une démarche pour Grist avec filtrage côté serveur.
@@ -1087,6 +1193,8 @@ def process_demarche_for_grist_optimized(
         batch_size: Taille des lots pour le traitement par lot
         max_workers: Nombre maximum de workers pour le traitement parallèle
         api_filters: Filtres optimisés à appliquer côté serveur
+        repetable_write_mode: "upsert" ou "replace" (lignes des blocs répétables
+            de chaque dossier supprimées puis réinsérées)
 
     Returns:
         bool: Succès ou échec global
@@ -1098,6 +1206,8 @@ def process_demarche_for_grist_optimized(
         # Initialiser des ensembles pour suivre les dossiers traités
         successful_dossiers = set()
         failed_dossiers = set()
+        # Aucun dossier modifié depuis la dernière sync incrémentale
+        already_up_to_date = False
 
         # Initialiser le cache de colonnes
         column_cache = ColumnCache(client)
@@ -1304,14 +1414,36 @@ def process_demarche_for_grist_optimized(
         else:
             log("Pas de cursor updatedSince → sync complète")
 
+        # Point de reprise d'une sync interrompue sur le même périmètre.
+        # updated_since_cursor n'avance qu'en fin de sync : le checkpoint ne sert
+        # qu'à éviter de retraiter les lots déjà écrits dans Grist.
+        checkpoint_key = build_checkpoint_key(updated_since_cursor, api_filters)
+        checkpoint_page_cursor = None
+        checkpoint_last_dossier = None
+        if (
+            sync_meta
+            and not force_full_sync
+            and sync_meta.get("checkpoint_key") == checkpoint_key
+            and sync_meta.get("checkpoint_last_dossier")
+        ):
+            checkpoint_page_cursor = sync_meta.get("checkpoint_page_cursor") or None
+            checkpoint_last_dossier = sync_meta.get("checkpoint_last_dossier")
+            log(
+                f"Reprise de la sync interrompue après le dossier {checkpoint_last_dossier}"
+                f" (checkpoint du {sync_meta.get('checkpoint_at')})"
+            )
+        checkpoint_used = checkpoint_last_dossier is not None
+
         # Log des table IDs
         log("Tables utilisées pour l'importation:")
         log(f"  Table dossiers: {table_ids['dossier_table_id']}")
         log(f"  Table champs: {table_ids['champ_table_id']}")
         log(f"  Table annotations: {table_ids['annotation_table_id']}")
 
-        # Récupération des dossiers
-        if api_filters and api_filters:
+        # Récupération des dossiers, page par page : le premier lot est traité
+        # dès la première page reçue, sans attendre la fin de la pagination
+        listing_stats = {"listed": 0, "kept": 0}
+        if api_filters:
             log(
                 "[FILTRAGE] Récupération optimisée des dossiers avec filtres côté serveur..."
             )
@@ -1326,19 +1458,16 @@ def process_demarche_for_grist_optimized(
             if api_filters.get("date_fin"):
                 log(f"Filtre par date de fin: {api_filters['date_fin']}")
 
-            all_dossiers = get_demarche_dossiers_filtered(
+            dossier_pages = iter_demarche_dossiers_filtered(
                 demarche_number,
                 date_debut=api_filters.get("date_debut"),
                 date_fin=api_filters.get("date_fin"),
                 groupes_instructeurs=api_filters.get("groupes_instructeurs"),
                 statuts=api_filters.get("statuts"),
                 updated_since=updated_since_cursor,
+                after_cursor=checkpoint_page_cursor,
             )
 
-            total_dossiers = len(all_dossiers)
-            log(f"[OK] Dossiers récupérés avec filtres optimisés: {total_dossiers}")
-            filtered_dossiers = all_dossiers
-
         else:
             log(
                 "[ATTENTION] Récupération classique de tous les dossiers (pas de filtres optimisés)"
@@ -1388,27 +1517,15 @@ def process_demarche_for_grist_optimized(
             if groupes_filter:
                 log(f"Filtre par groupes instructeurs: {', '.join(groupes_filter)}")
 
-            # Récupérer tous les dossiers puis filtrer côté client
-            from queries_graphql import get_demarche_dossiers
-
+            # Récupérer les dossiers page par page et filtrer côté client
             log("Récupération de tous les dossiers avec pagination...")
             if updated_since_cursor:
                 log(f"Récupération filtrée avec updatedSince: {updated_since_cursor}")
-                all_dossiers = get_demarche_dossiers_filtered(
-                    demarche_number, updated_since=updated_since_cursor
-                )
-            else:
-                all_dossiers = get_demarche_dossiers(demarche_number)
-
-            total_dossiers_brut = len(all_dossiers)
-            log(f"Nombre total de dossiers trouvés: {total_dossiers_brut}")
 
-            # Appliquer les filtres côté client
-            filtered_dossiers = []
-            for dossier in all_dossiers:
+            def matches_env_filters(dossier):
                 # Filtre par statut
                 if statuts_filter and dossier["state"] not in statuts_filter:
-                    continue
+                    return False
 
                 # Filtre par groupe instructeur
                 if groupes_filter and (
@@ -1416,13 +1533,13 @@ def process_demarche_for_grist_optimized(
                     or str(dossier["groupeInstructeur"].get("number", ""))
                     not in groupes_filter
                 ):
-                    continue
+                    return False
 
                 # Filtre par date de dépôt
                 if date_debut or date_fin:
                     date_depot_str = dossier.get("dateDepot")
                     if not date_depot_str:
-                        continue
+                        return False
 
                     try:
                         date_depot = datetime.strptime(
@@ -1430,21 +1547,35 @@ def process_demarche_for_grist_optimized(
                         )
 
                         if date_debut and date_depot < date_debut:
-                            continue
+                            return False
                         if date_fin and date_depot > date_fin:
-                            continue
+                            return False
                     except (ValueError, AttributeError, TypeError):
-                        continue
+                        return False
 
-                filtered_dossiers.append(dossier)
+                return True
 
-            total_dossiers = len(filtered_dossiers)
-            log(
-                f"Après filtrage: {total_dossiers} dossiers ({(total_dossiers / total_dossiers_brut * 100) if total_dossiers_brut > 0 else 0:.1f}%)"
+            def filter_pages(pages):
+                for page_cursor, dossiers in pages:
+                    listing_stats["listed"] += len(dossiers)
+                    yield page_cursor, [d for d in dossiers if matches_env_filters(d)]
+
+            dossier_pages = filter_pages(
+                iter_demarche_dossiers_filtered(
+                    demarche_number,
+                    updated_since=updated_since_cursor,
+                    after_cursor=checkpoint_page_cursor,
+                )
             )
 
+        if checkpoint_used:
+            dossier_pages = skip_until_checkpoint(dossier_pages, checkpoint_last_dossier)
+
+        dossier_batches = batch_dossier_pages(dossier_pages, batch_size, listing_stats)
+        first_batch = next(dossier_batches, None)
+
         # Si aucun dossier ne correspond aux critères
-        if total_dossiers == 0:
+        if first_batch is None:
             if updated_since_cursor:
                 cursor_dt = datetime.strptime(
                     updated_since_cursor, "%Y-%m-%dT%H:%M:%SZ"
@@ -1455,6 +1586,7 @@ def process_demarche_for_grist_optimized(
                 log(
                     f"Aucun dossier modifié ou ajouté depuis la dernière sync ({cursor_fr}) — Grist déjà à jour"
                 )
+                already_up_to_date = True
             else:
                 log("Aucun dossier ne correspond aux critères de filtrage")
             elapsed_time = time.time() - start_time
@@ -1474,6 +1606,7 @@ def process_demarche_for_grist_optimized(
                         "last_sync_status": "success",
                         "last_sync_duration": round(elapsed_time, 1),
                         "force_full_sync": False,
+                        **(CLEARED_CHECKPOINT if checkpoint_used else {}),
                     },
                 )
             except Exception as e:
@@ -1487,22 +1620,13 @@ def process_demarche_for_grist_optimized(
                 force_full_sync=force_full_sync,
                 deleted_since_cursor=deleted_since_cursor,
                 schema_method_successful=schema_method_successful,
+                column_cache=column_cache,
             )
 
             return True
 
-        # Organiser les dossiers en lots
-        dossier_batches = []
-        batch_count = (total_dossiers + batch_size - 1) // batch_size
-
-        for i in range(0, total_dossiers, batch_size):
-            batch_dossier_numbers = [
-                filtered_dossiers[j]["number"]
-                for j in range(i, min(i + batch_size, total_dossiers))
-            ]
-            dossier_batches.append(batch_dossier_numbers)
-
-        log(f"Dossiers organisés en {batch_count} lots de {batch_size} maximum")
+        dossier_batches = itertools.chain([first_batch], dossier_batches)
+        log(f"Dossiers traités par lots de {batch_size} maximum, au fil de la pagination")
 
         # Fonction pour préparer un seul dossier (DÉFINIE AVANT LA BOUCLE)
         def prepare_single_dossier(
@@ -1656,17 +1780,44 @@ def process_demarche_for_grist_optimized(
                 table_ids.get("annotations")
             )
         cache_demandeurs = client.get_existing_dossier_numbers(table_ids["demandeurs"])
+        # Lignes des tables répétables : chargées à la première utilisation
+        # de chaque table, puis complétées au fil des créations
+        cache_repetables = {}
+        # Avis : {avis_id: id Grist}, chargé au premier lot contenant des avis
+        cache_avis = None
         log(f"Cache global préchargé en {time.time() - start_cache:.1f}s")
 
+        def save_checkpoint(batch_idx, batch, page_cursor):
+            """Enregistre le point de reprise après un lot écrit dans Grist"""
+            nonlocal checkpoint_used
+            last_dossier = batch[-1]
+            try:
+                client.save_sync_metadata(
+                    demarche_number,
+                    {
+                        "checkpoint_key": checkpoint_key,
+                        "checkpoint_page_cursor": page_cursor or "",
+                        "checkpoint_last_dossier": int(last_dossier),
+                        "checkpoint_at": datetime.now(timezone.utc).strftime(
+                            "%Y-%m-%dT%H:%M:%SZ"
+                        ),
+                    },
+                    existing_grist_id=sync_meta_grist_id,
+                )
+                checkpoint_used = True
+                log_verbose(
+                    f"  Checkpoint lot {batch_idx + 1}: dossier {last_dossier}"
+                )
+            except Exception as e:
+                log_error(f"Erreur sauvegarde du checkpoint: {e}")
+
         # Construire les sets de dossiers à skipper par table
         skip_dossiers = set()
         skip_champs = set()
         skip_annotations = set()
 
-        for batch_idx, batch in enumerate(dossier_batches):
-            log(
-                f"Traitement du lot {batch_idx + 1}/{batch_count} ({len(batch)} dossiers)..."
-            )
+        for batch_idx, (batch, batch_page_cursor) in enumerate(dossier_batches):
+            log(f"Traitement du lot {batch_idx + 1} ({len(batch)} dossiers)...")
             batch_start = time.time()
 
             # Filtrer les dossiers à fetcher (skip si inchangé sur toutes les tables)
@@ -1674,6 +1825,9 @@ def process_demarche_for_grist_optimized(
             skipped_count = len(batch) - len(batch_to_fetch)
             if skipped_count:
                 log(f"  {skipped_count} dossier(s) inchangés → fetch DS skippé")
+                emit_event(
+                    "rows", table=table_ids["dossier_table_id"], skipped=skipped_count
+                )
 
             # Récupérer les dossiers complets
             if batch_to_fetch:
@@ -1702,6 +1856,7 @@ def process_demarche_for_grist_optimized(
                     log(
                         f"  Lot {batch_idx + 1} entièrement skippé (tous les dossiers sont à jour)"
                     )
+                    save_checkpoint(batch_idx, batch, batch_page_cursor)
                 else:
                     log_error(
                         f"Aucun dossier n'a pu être récupéré pour le lot {batch_idx + 1}"
@@ -1875,7 +2030,33 @@ def process_demarche_for_grist_optimized(
                 log_progress.log("Mise à jour des demandeurs")
 
             # Traiter les blocs répétables si nécessaire (tables séparées par bloc)
-            if column_types.get("has_repetable_blocks", False) and table_ids.get(
+            if (
+                column_types.get("has_repetable_blocks", False)
+                and table_ids.get("repetable_blocks")
+                and repetable_write_mode == "replace"
+            ):
+                # Remplacement par dossier : une requête /apply par bloc,
+                # y compris pour les blocs vidés depuis la dernière sync.
+                # Les dossiers dont les lignes n'ont pas changé sont ignorés
+                # (empreintes, voir process_repetables_batch)
+                from repetable_processor import process_repetables_batch
+
+                try:
+                    success_count, error_count = process_repetables_batch(
+                        client,
+                        list(batch_dossiers_dict.values()),
+                        table_ids["repetable_blocks"],
+                        column_types["repetable_blocks"],
+                        problematic_ids=problematic_descriptor_ids,
+                        existing_rows_cache=cache_repetables,
+                        write_mode="replace",
+                    )
+                    log(
+                        f"  Blocs répétables (remplacement): {success_count} lignes insérées, {error_count} échecs"
+                    )
+                except Exception as e:
+                    log_error(f"  Erreur remplacement blocs répétables: {str(e)}")
+            elif column_types.get("has_repetable_blocks", False) and table_ids.get(
                 "repetable_blocks"
             ):
                 # Collecter toutes les lignes répétables
@@ -1925,6 +2106,7 @@ def process_demarche_for_grist_optimized(
                                 },
                                 problematic_ids=problematic_descriptor_ids,
                                 batch_size=50,
+                                existing_rows_cache=cache_repetables,
                             )
                             log(
                                 f"  Bloc '{block_label}': {success_count} réussis, {error_count} échecs"
@@ -1956,45 +2138,51 @@ def process_demarche_for_grist_optimized(
                     result = client.create_table(avis_table_id, create_avis_columns())
                     table_ids["avis"] = result["tables"][0].get("id")
                     log(f"  Table avis créée: {table_ids['avis']}")
+                    cache_avis = {}
 
-                log(f"  Upsert de {len(all_avis_records)} avis...")
-                url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_ids['avis']}/records"
-
-                # Récupérer existants pour upsert par avis_id
-                existing_avis = {}
-                response = requests.get(url, headers=client.headers)
-                if response.status_code == 200:
-                    for record in response.json().get("records", []):
-                        avis_id = record.get("fields", {}).get("avis_id")
-                        if avis_id:
-                            existing_avis[avis_id] = record.get("id")
-
-                to_create = []
-                to_update = []
-                for avis in all_avis_records:
-                    avis_id = avis.get("avis_id")
-                    if avis_id in existing_avis:
-                        to_update.append({"id": existing_avis[avis_id], "fields": avis})
-                    else:
-                        to_create.append(avis)
-
-                if to_create:
-                    requests.post(
-                        url,
-                        headers=client.headers,
-                        json={"records": [{"fields": r} for r in to_create]},
+                if cache_avis is None:
+                    cache_avis = client.get_existing_records_by_key(
+                        table_ids["avis"], ("avis_id",)
                     )
-                    log(f"   {len(to_create)} avis créé(s)")
-                if to_update:
-                    requests.patch(
-                        url, headers=client.headers, json={"records": to_update}
+
+                log(f"  Upsert de {len(all_avis_records)} avis...")
+                avis_success, avis_errors = client.upsert_avis_in_grist(
+                    table_ids["avis"],
+                    all_avis_records,
+                    existing_records=cache_avis,
+                    column_cache=column_cache,
+                )
+                if avis_errors:
+                    log_error(
+                        f"   Avis: {avis_success} traités, {avis_errors} en échec"
                     )
-                    log(f"   {len(to_update)} avis mis à jour")
+                else:
+                    log(f"   {avis_success} avis traités avec succès")
 
             if all_avis_records:
                 log(f"[TIMING] Après avis: {time.time() - batch_start:.1f}s")
                 log_progress.log("Traitement de la table Avis")
 
+            save_checkpoint(batch_idx, batch, batch_page_cursor)
+            emit_event(
+                "batch",
+                batch=batch_idx + 1,
+                dossiers=len(batch),
+                success_count=len(successful_dossiers),
+                error_count=len(failed_dossiers),
+                duration=time.time() - batch_start,
+            )
+
+        if api_filters:
+            log(
+                f"[OK] Dossiers récupérés avec filtres optimisés: {listing_stats['kept']}"
+            )
+        else:
+            log(f"Nombre total de dossiers trouvés: {listing_stats['listed']}")
+            log(
+                f"Après filtrage: {listing_stats['kept']} dossiers ({(listing_stats['kept'] / listing_stats['listed'] * 100) if listing_stats['listed'] > 0 else 0:.1f}%)"
+            )
+
         # Calculer les statistiques finales
         elapsed_time = time.time() - start_time
         minutes = int(elapsed_time // 60)
@@ -2009,6 +2197,13 @@ def process_demarche_for_grist_optimized(
         log(f"Dossiers traités avec succès: {total_success}")
         if total_errors > 0:
             log(f"Dossiers en échec: {total_errors}")
+        emit_event(
+            "summary",
+            success_count=total_success,
+            error_count=total_errors,
+            duration=elapsed_time,
+            already_up_to_date=already_up_to_date,
+        )
 
         # Sauvegarder le curseur de sync
         sync_end_time = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -2022,6 +2217,7 @@ def process_demarche_for_grist_optimized(
                     "last_sync_status": "success" if total_errors == 0 else "partial",
                     "last_sync_duration": round(elapsed_time, 1),
                     "force_full_sync": False,
+                    **(CLEARED_CHECKPOINT if checkpoint_used else {}),
                 },
                 existing_grist_id=sync_meta_grist_id,
             )
@@ -2036,6 +2232,8 @@ def process_demarche_for_grist_optimized(
             force_full_sync=force_full_sync,
             deleted_since_cursor=deleted_since_cursor,
             schema_method_successful=schema_method_successful,
+            dossier_row_ids=cache_dossiers,
+            column_cache=column_cache,
         )
         return total_success > 0 or schema_method_successful
 
@@ -2126,6 +2324,12 @@ def main():
     parallel = os.getenv("PARALLEL", "true").lower() == "true"
     batch_size = int(os.getenv("BATCH_SIZE", "50"))
     max_workers = int(os.getenv("MAX_WORKERS", "3"))
+    repetable_write_mode = os.getenv("REPETABLE_WRITE_MODE", "upsert").lower()
+    if repetable_write_mode not in ("upsert", "replace"):
+        log_error(
+            f"REPETABLE_WRITE_MODE inconnu ({repetable_write_mode}), utilisation de upsert"
+        )
+        repetable_write_mode = "upsert"
 
     # Traiter la démarche avec la fonction optimisée
     if process_demarche_for_grist_optimized(
@@ -2135,6 +2339,7 @@ def main():
         batch_size=batch_size,
         max_workers=max_workers,
         api_filters=api_filters,  # Passer les filtres optimisés
+        repetable_write_mode=repetable_write_mode,
     ):
         log(f"Traitement de la démarche {demarche_number} terminé avec succès")
         print_api_timings()
@@ -2145,5 +2350,20 @@ def main():
         return 1
 
 
+def run_with_http_metrics():
+    """Exécute main() en mesurant les requêtes HTTP, transmises en fin de script"""
+    load_dotenv()
+    http_stats = install_http_instrumentation(
+        {
+            urlparse(DEMARCHES_API_URL).netloc: "ds",
+            urlparse(os.getenv("GRIST_BASE_URL", "")).netloc: "grist",
+        }
+    )
+    try:
+        return main()
+    finally:
+        emit_event("http_stats", services=http_stats.snapshot())
+
+
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(run_with_http_metrics())
@@ -3,6 +3,9 @@
 Scanne toutes les tables du doc Grist et cache, dans la première section
 de chaque table, toutes les colonnes dont le colId se termine par _id.
 
+Les tables de métadonnées sont lues filtrées sur les tables concernées, et
+tous les champs à cacher sont retirés en un seul appel /apply.
+
 Utilise les mêmes variables d'environnement que le reste du projet OTP :
 GRIST_BASE_URL, GRIST_API_KEY, GRIST_DOC_ID (chargées via .env).
 
@@ -10,6 +13,7 @@ Usage :
     python hide_id_columns.py
 """
 
+import json
 import os
 import sys
 
@@ -40,40 +44,61 @@ class IdColumnHider:
     def _api_url(self, path):
         return f"{self.base_url}/api/docs/{self.doc_id}/{path}"
 
-    def _fetch(self, path):
-        resp = requests.get(self._api_url(path), headers=self.headers)
+    def _fetch(self, path, filters=None):
+        """Lit une table ; filters = {colonne: [valeurs]} (filtre côté Grist)"""
+        params = {"filter": json.dumps(filters)} if filters else None
+        resp = requests.get(self._api_url(path), headers=self.headers, params=params)
         resp.raise_for_status()
         return resp.json()["records"]
 
-    def _hide_field(self, field_id):
-        resp = requests.delete(
-            self._api_url("tables/_grist_Views_section_field/records"),
+    def _hide_fields(self, field_ids):
+        """Retire les champs des sections en un seul appel /apply"""
+        resp = requests.post(
+            self._api_url("apply"),
             headers=self.headers,
-            json={"records": [{"id": field_id}]},
+            json=[
+                ["RemoveRecord", "_grist_Views_section_field", field_id]
+                for field_id in field_ids
+            ],
         )
-        if resp.status_code in (404, 405):
-            resp = requests.post(
-                self._api_url("apply"),
-                headers=self.headers,
-                json=[["RemoveRecord", "_grist_Views_section_field", field_id]],
-            )
         resp.raise_for_status()
 
-    def hide_id_columns(self, suffix="_id", table_ids=None):
+    def hide_id_columns(self, suffix="_id", table_ids=None, columns=None):
         """
         Cache dans la première section de chaque table toutes les colonnes
         dont le colId se termine par `suffix`. Retourne (nb_ok, nb_skip).
 
         table_ids : ensemble optionnel de tableId (ex: {"Demarche_149930_dossiers", ...})
         à traiter. Si None, traite tout le document.
+        columns : dict optionnel {tableId: {colId}} limitant le traitement à ces
+        colonnes (ex: colonnes créées pendant la sync).
         """
+        if columns is not None:
+            columns = {
+                table_id: {c for c in col_ids if c.endswith(suffix)}
+                for table_id, col_ids in columns.items()
+            }
+            columns = {t: col_ids for t, col_ids in columns.items() if col_ids}
+            table_ids = set(columns) & set(table_ids) if table_ids else set(columns)
+            if not table_ids:
+                return 0, 0
+
         tables = {
             r["id"]: r["fields"]["tableId"]
-            for r in self._fetch("tables/_grist_Tables/records")
+            for r in self._fetch(
+                "tables/_grist_Tables/records",
+                {"tableId": sorted(table_ids)} if table_ids is not None else None,
+            )
         }
-        columns = self._fetch("tables/_grist_Tables_column/records")
-        sections = self._fetch("tables/_grist_Views_section/records")
-        fields = self._fetch("tables/_grist_Views_section_field/records")
+        if not tables:
+            return 0, 0
+
+        table_refs = {"parentId": sorted(tables)} if table_ids is not None else None
+        all_columns = self._fetch("tables/_grist_Tables_column/records", table_refs)
+        sections = self._fetch(
+            "tables/_grist_Views_section/records",
+            {"tableRef": sorted(tables)} if table_ids is not None else None,
+        )
 
         # Index : tableRef -> première section
         first_section = {}
@@ -82,6 +107,13 @@ class IdColumnHider:
             if t and t not in first_section:
                 first_section[t] = r["id"]
 
+        fields = self._fetch(
+            "tables/_grist_Views_section_field/records",
+            {"parentId": sorted(first_section.values())}
+            if table_ids is not None
+            else None,
+        )
+
         # Index : (section_id, col_ref) -> field_id
         field_index = {}
         for r in fields:
@@ -92,8 +124,9 @@ class IdColumnHider:
         nb_skip = 0
         hidden = []
         skipped = []
+        field_ids = []
 
-        for col in columns:
+        for col in all_columns:
             col_id = col["fields"].get("colId", "")
             if not col_id.endswith(suffix):
                 continue
@@ -103,6 +136,8 @@ class IdColumnHider:
 
             if table_ids is not None and table_name not in table_ids:
                 continue
+            if columns is not None and col_id not in columns.get(table_name, ()):
+                continue
 
             col_ref = col["id"]
             section_id = first_section.get(table_ref)
@@ -118,10 +153,13 @@ class IdColumnHider:
                 nb_skip += 1
                 continue
 
-            self._hide_field(field_id)
+            field_ids.append(field_id)
             hidden.append(f"{table_name}.{col_id}")
             nb_ok += 1
 
+        if field_ids:
+            self._hide_fields(field_ids)
+
         if hidden:
             hidden_tables = sorted({h.split(".")[0] for h in hidden})
             log(f"[OK] {len(hidden)} colonne(s) cachée(s) sur : {', '.join(hidden_tables)}")
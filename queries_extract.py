@@ -1,16 +1,10 @@
 import base64
 import json
-import os
 from typing import Any, Dict, List
 
-import requests
-
-from utils.constants import DEMARCHES_API_URL
+from queries_graphql import get_demarche_groupes_instructeurs
 from utils.formatter import unwrap_json_list
 
-API_TOKEN = os.getenv("DEMARCHES_API_TOKEN")
-API_URL = DEMARCHES_API_URL
-
 
 def decode_base64_id(base64_id: str) -> str:
     """
@@ -802,43 +796,8 @@ def extract_instructeurs_from_demarche(demarche_number: int) -> List[Dict[str, A
     Returns:
         Liste de dictionnaires, 1 par instructeur
     """
-
-    query = """
-    query getDemarche($demarcheNumber: Int!) {
-      demarche(number: $demarcheNumber) {
-        groupeInstructeurs {
-          id
-          number
-          label
-          instructeurs {
-            id
-            email
-          }
-        }
-      }
-    }
-    """
-
-    headers = {
-        "Authorization": f"Bearer {API_TOKEN}",
-        "Content-Type": "application/json",
-    }
-
-    response = requests.post(
-        API_URL,
-        json={"query": query, "variables": {"demarcheNumber": demarche_number}},
-        headers=headers,
-    )
-
-    if response.status_code != 200:
-        return []
-
-    result = response.json()
-    demarche = result.get("data", {}).get("demarche", {})
-    groupes = demarche.get("groupeInstructeurs", [])
-
     instructeurs_list = []
-    for groupe in groupes:
+    for groupe in get_demarche_groupes_instructeurs(demarche_number):
         for instructeur in groupe.get("instructeurs", []):
             instructeurs_list.append(
                 {
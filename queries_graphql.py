@@ -1,6 +1,7 @@
+import concurrent.futures
 import os
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import requests
 from dotenv import load_dotenv
@@ -9,11 +10,22 @@ from urllib3.util.retry import Retry
 
 from queries_util import timed
 from utils.constants import DEMARCHES_API_URL
+from utils.state_store import get_state_store
 
 load_dotenv()
 API_TOKEN = os.getenv("DEMARCHES_API_TOKEN") or ""
 API_URL = DEMARCHES_API_URL
 
+# Cache local de pendingDeletedDossiers (liste complète, rarement modifiée)
+PENDING_DELETED_CACHE_NAMESPACE = "pending_deleted_dossiers"
+PENDING_DELETED_CACHE_TTL = int(os.getenv("PENDING_DELETED_CACHE_TTL", "900"))
+
+# Nombre de groupes instructeurs interrogés par requête
+INSTRUCTEURS_GROUPS_PER_REQUEST = 50
+
+# Délai maximal (secondes) d'une requête vers l'API DS
+DS_REQUEST_TIMEOUT = int(os.getenv("DS_REQUEST_TIMEOUT", "60"))
+
 # Requêtes GraphQL (fragmentées en quelques constantes)
 # Pour les fragments communs
 COMMON_FRAGMENTS = """
@@ -631,6 +643,48 @@ def get_session_with_retries():
     return _session
 
 
+def iter_connection_pages(
+    fetch_page: Callable[[Optional[str]], Optional[Dict[str, Any]]],
+    after_cursor: str = None,
+) -> Iterator[Tuple[Optional[str], Dict[str, Any]]]:
+    """
+    Parcourt une connexion GraphQL paginée par curseur
+    en anticipant la requête de la page suivante.
+
+    fetch_page(cursor) envoie la requête d'une page et retourne la connexion
+    ({"pageInfo": {"hasNextPage", "endCursor"}, "nodes": [...]}),
+    ou None pour arrêter le parcours.
+    Dès que l'endCursor d'une page est connu, la page suivante est demandée
+    en arrière-plan, pendant que l'appelant consomme la page courante.
+
+    Produit (curseur `after` de la page, connexion).
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="graphql-prefetch"
+    )
+    try:
+        cursor = after_cursor
+        future = executor.submit(fetch_page, cursor)
+
+        while future is not None:
+            connection = future.result()
+            if connection is None:
+                return
+
+            page_info = connection.get("pageInfo") or {}
+            next_cursor = page_info.get("endCursor")
+            future = (
+                executor.submit(fetch_page, next_cursor)
+                if page_info.get("hasNextPage")
+                else None
+            )
+
+            yield cursor, connection
+            cursor = next_cursor
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
 # Fonctions d'API
 @timed("get_dossier", "ds")
 def get_dossier(dossier_number: int) -> Dict[str, Any]:
@@ -852,26 +906,69 @@ def get_demarche(demarche_number: int) -> Dict[str, Any]:
     return demarche
 
 
-@timed("get_demarche_dossiers_filtered", "ds")
-def get_demarche_dossiers_filtered(
+def _matches_client_filters(dossier: Dict[str, Any], client_filters: Dict[str, Any]) -> bool:
+    """Applique les filtres non supportés côté serveur à un dossier"""
+    # Filtre par date de fin
+    if client_filters.get("date_fin"):
+        date_fin_str = client_filters["date_fin"]
+        if "T" not in date_fin_str:
+            date_fin_str += "T23:59:59Z"
+
+        try:
+            date_depot = datetime.fromisoformat(
+                dossier["dateDepot"].replace("Z", "+00:00")
+            )
+            date_limite_fin = datetime.fromisoformat(
+                date_fin_str.replace("Z", "+00:00")
+            )
+
+            if date_depot > date_limite_fin:
+                return False
+        except (ValueError, AttributeError, TypeError):
+            return False
+
+    # Filtre par groupe instructeur
+    if client_filters.get("groupes_instructeurs"):
+        groupes_cibles = client_filters["groupes_instructeurs"]
+        groupe_instructeur = dossier.get("groupeInstructeur")
+
+        if not groupe_instructeur:
+            return False
+
+        groupe_number = str(groupe_instructeur.get("number", ""))
+        groupe_id = groupe_instructeur.get("id", "")
+
+        # Vérifier si le groupe correspond
+        if not (groupe_number in groupes_cibles or groupe_id in groupes_cibles):
+            return False
+
+    # Filtre par statut
+    if client_filters.get("statuts"):
+        statuts_cibles = client_filters["statuts"]
+        if dossier.get("state") not in statuts_cibles:
+            return False
+
+    return True
+
+
+def iter_demarche_dossiers_filtered(
     demarche_number: int,
     date_debut: str = None,
     date_fin: str = None,
     groupes_instructeurs: List[str] = None,
     statuts: List[str] = None,
     updated_since: str = None,
-) -> List[Dict[str, Any]]:
+    after_cursor: str = None,
+) -> Iterator[Tuple[Optional[str], List[Dict[str, Any]]]]:
     """
-    Récupère les dossiers avec filtrage côté serveur RÉEL.
-    Utilise SEULEMENT les paramètres qui fonctionnent vraiment selon les tests.
-
-    PARAMÈTRES RÉELLEMENT SUPPORTÉS :
-    [OK]createdSince: ISO8601DateTime (date de début)
-    ❌ createdUntil: Non supporté
-    ❌ groupeInstructeurNumber: Non supporté
-    ❌ states: Non supporté
-
-    Les autres filtres seront appliqués côté client sur le résultat réduit.
+    Variante en flux de get_demarche_dossiers_filtered : produit les dossiers
+    page par page, filtres côté client déjà appliqués, sous la forme
+    (curseur `after` de la page, dossiers retenus de la page).
+    La page suivante n'est demandée que lorsque l'appelant a consommé la précédente.
+
+    PARAMÈTRES RÉELLEMENT SUPPORTÉS CÔTÉ SERVEUR :
+    [OK]createdSince / updatedSince
+    ❌ createdUntil, groupeInstructeurNumber, states : filtrés côté client
     """
     if not API_TOKEN:
         raise ValueError("Le token d'API n'est pas configuré.")
@@ -915,10 +1012,13 @@ def get_demarche_dossiers_filtered(
     # Variables pour la requête (SIMPLIFIÉES)
     variables = {
         "demarcheNumber": demarche_number,
-        "afterCursor": None,
+        "afterCursor": after_cursor,
         **server_filters,  # Seulement createdSince
     }
 
+    if after_cursor:
+        print(f"Reprise de la pagination après le curseur {after_cursor}")
+
     headers = {
         "Authorization": f"Bearer {API_TOKEN}",
         "Content-Type": "application/json",
@@ -1005,139 +1105,109 @@ def get_demarche_dossiers_filtered(
     # Exécution de la requête
     print("[RECHERCHE] Exécution requête avec filtres serveur supportés...")
 
-    # Exécution de la requête avec retry automatique
-    session = get_session_with_retries()  # ✅ AJOUTE CETTE LIGNE
-    response = session.post(
-        API_URL,
-        json={"query": query_get_demarche, "variables": variables},
-        headers=headers,
-    )
-
-    response.raise_for_status()
-    result = response.json()
-
-    if "errors" in result:
-        error_messages = [
-            error.get("message", "Unknown error") for error in result["errors"]
-        ]
-        print(f"Erreurs GraphQL: {error_messages}")
-        raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
-
-    # Récupération avec pagination
-    demarche_data = result["data"]["demarche"]
-    dossiers = []
-
-    if "dossiers" in demarche_data and "nodes" in demarche_data["dossiers"]:
-        dossiers = demarche_data["dossiers"]["nodes"]
-        total_dossiers = len(dossiers)
-        print(f"[OK]Première page récupérée: {total_dossiers} dossiers")
-
-        # Pagination
-        has_next_page = demarche_data["dossiers"]["pageInfo"]["hasNextPage"]
-        cursor = demarche_data["dossiers"]["pageInfo"]["endCursor"]
-        page_num = 1
+    session = get_session_with_retries()
+    page_num = 0
+    total_dossiers = 0
+    total_kept = 0
 
-        while has_next_page:
-            page_num += 1
+    def fetch_page(cursor):
+        nonlocal page_num
+        page_num += 1
+        if page_num > 1:
             print(f"Page {page_num}...")
 
-            variables["afterCursor"] = cursor
-
-            session = get_session_with_retries()  # ✅ AJOUTE
-            next_response = session.post(  # ✅ CHANGE requests → session
-                API_URL,
-                json={"query": query_get_demarche, "variables": variables},
-                headers=headers,
-            )
-
-            next_response.raise_for_status()
-            next_result = next_response.json()
-
-            if "errors" in next_result:
-                print(f"Erreurs page {page_num}: {next_result['errors']}")
-                break
-
-            next_demarche = next_result["data"]["demarche"]
+        response = session.post(
+            API_URL,
+            json={
+                "query": query_get_demarche,
+                "variables": {**variables, "afterCursor": cursor},
+            },
+            headers=headers,
+        )
 
-            if "dossiers" in next_demarche and "nodes" in next_demarche["dossiers"]:
-                new_dossiers = next_demarche["dossiers"]["nodes"]
-                dossiers.extend(new_dossiers)
-                total_dossiers += len(new_dossiers)
-                print(
-                    f"[OK]Page {page_num}: +{len(new_dossiers)} (total: {total_dossiers})"
-                )
+        response.raise_for_status()
+        result = response.json()
 
-                has_next_page = next_demarche["dossiers"]["pageInfo"]["hasNextPage"]
-                cursor = next_demarche["dossiers"]["pageInfo"]["endCursor"]
-            else:
-                has_next_page = False
+        if "errors" in result:
+            error_messages = [
+                error.get("message", "Unknown error") for error in result["errors"]
+            ]
+            # Première page : erreur bloquante ; pages suivantes : on s'arrête là
+            if page_num == 1:
+                print(f"Erreurs GraphQL: {error_messages}")
+                raise Exception(f"GraphQL errors: {', '.join(error_messages)}")
+            print(f"Erreurs page {page_num}: {result['errors']}")
+            return None
+
+        demarche_data = result["data"]["demarche"]
+        if "dossiers" not in demarche_data or "nodes" not in demarche_data["dossiers"]:
+            return None
+        return demarche_data["dossiers"]
+
+    for page_index, (cursor, connection) in enumerate(
+        iter_connection_pages(fetch_page, after_cursor)
+    ):
+        nodes = connection["nodes"]
+        total_dossiers += len(nodes)
+        if page_index == 0:
+            print(f"[OK]Première page récupérée: {total_dossiers} dossiers")
+        else:
+            print(
+                f"[OK]Page {page_index + 1}: +{len(nodes)} (total: {total_dossiers})"
+            )
 
-    print(f"[SUCCES] Récupération côté serveur: {len(dossiers)} dossiers")
+        if client_filters:
+            kept = [d for d in nodes if _matches_client_filters(d, client_filters)]
+        else:
+            kept = nodes
+        total_kept += len(kept)
 
-    # ===========================================
-    # FILTRAGE CÔTÉ CLIENT pour les autres critères
-    # ===========================================
+        yield cursor, kept
 
-    if not client_filters:
+    print(f"[SUCCES] Récupération côté serveur: {total_dossiers} dossiers")
+    if client_filters:
         print(
-            f"[OK]Aucun filtre côté client - résultat final: {len(dossiers)} dossiers"
+            f"[OK]Filtrage côté client terminé: {total_kept}/{total_dossiers} dossiers conservés"
         )
-        return dossiers
 
-    print("[FILTRAGE] Application des filtres côté client...")
-    dossiers_avant = len(dossiers)
-    filtered_dossiers = []
 
-    for dossier in dossiers:
-        # Filtre par date de fin
-        if client_filters.get("date_fin"):
-            date_fin_str = client_filters["date_fin"]
-            if "T" not in date_fin_str:
-                date_fin_str += "T23:59:59Z"
-
-            try:
-                date_depot = datetime.fromisoformat(
-                    dossier["dateDepot"].replace("Z", "+00:00")
-                )
-                date_limite_fin = datetime.fromisoformat(
-                    date_fin_str.replace("Z", "+00:00")
-                )
-
-                if date_depot > date_limite_fin:
-                    continue
-            except (ValueError, AttributeError, TypeError):
-                continue
-
-        # Filtre par groupe instructeur
-        if client_filters.get("groupes_instructeurs"):
-            groupes_cibles = client_filters["groupes_instructeurs"]
-            groupe_instructeur = dossier.get("groupeInstructeur")
-
-            if not groupe_instructeur:
-                continue
-
-            groupe_number = str(groupe_instructeur.get("number", ""))
-            groupe_id = groupe_instructeur.get("id", "")
-
-            # Vérifier si le groupe correspond
-            if not (groupe_number in groupes_cibles or groupe_id in groupes_cibles):
-                continue
-
-        # Filtre par statut
-        if client_filters.get("statuts"):
-            statuts_cibles = client_filters["statuts"]
-            if dossier.get("state") not in statuts_cibles:
-                continue
-
-        # Si tous les filtres passent, garder le dossier
-        filtered_dossiers.append(dossier)
+@timed("get_demarche_dossiers_filtered", "ds")
+def get_demarche_dossiers_filtered(
+    demarche_number: int,
+    date_debut: str = None,
+    date_fin: str = None,
+    groupes_instructeurs: List[str] = None,
+    statuts: List[str] = None,
+    updated_since: str = None,
+    after_cursor: str = None,
+    page_cursors: Dict[int, str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Récupère les dossiers avec filtrage côté serveur RÉEL
+    (voir iter_demarche_dossiers_filtered pour la version en flux).
 
-    print(
-        f"[OK]Filtrage côté client terminé: {len(filtered_dossiers)}/{dossiers_avant} dossiers conservés"
-    )
+    after_cursor permet de reprendre la pagination après une page donnée.
+    Si page_cursors est fourni, il est complété avec, pour chaque numéro de
+    dossier, le curseur `after` de sa page (point de reprise d'un checkpoint).
+    """
+    filtered_dossiers = []
+
+    for page_cursor, dossiers in iter_demarche_dossiers_filtered(
+        demarche_number,
+        date_debut=date_debut,
+        date_fin=date_fin,
+        groupes_instructeurs=groupes_instructeurs,
+        statuts=statuts,
+        updated_since=updated_since,
+        after_cursor=after_cursor,
+    ):
+        filtered_dossiers.extend(dossiers)
+        if page_cursors is not None:
+            for dossier in dossiers:
+                page_cursors[dossier["number"]] = page_cursor
 
     # Debug : Afficher quelques exemples
-    if filtered_dossiers:
+    if filtered_dossiers and (date_fin or groupes_instructeurs or statuts):
         print("Exemples de résultats finaux:")
         for i, dossier in enumerate(filtered_dossiers[:3]):
             groupe = dossier.get("groupeInstructeur", {})
@@ -1202,17 +1272,7 @@ def get_demarche_dossiers_labels_only(demarche_number: int) -> List[Dict[str, An
     }
     """
 
-    dossiers = []
-    cursor = None
-    page_num = 0
-
-    dossiers = []
-    cursor = None
-    page_num = 0
-    has_next_page = True
-
-    while has_next_page:
-        page_num += 1
+    def fetch_page(cursor):
         response = session.post(
             API_URL,
             json={
@@ -1228,16 +1288,104 @@ def get_demarche_dossiers_labels_only(demarche_number: int) -> List[Dict[str, An
             messages = [e.get("message", "Unknown error") for e in result["errors"]]
             raise Exception(f"GraphQL errors: {', '.join(messages)}")
 
-        connection = result["data"]["demarche"]["dossiers"]
+        return result["data"]["demarche"]["dossiers"]
+
+    dossiers = []
+    page_num = 0
+
+    for _, connection in iter_connection_pages(fetch_page):
+        page_num += 1
         dossiers.extend(connection["nodes"])
-        has_next_page = connection["pageInfo"]["hasNextPage"]
-        cursor = connection["pageInfo"]["endCursor"]
 
     print(f"[LABELS] {len(dossiers)} dossiers récupérés en {page_num} page(s)")
 
     return dossiers
 
 
+def get_demarche_groupes_instructeurs(demarche_number: int) -> List[Dict[str, Any]]:
+    """
+    Récupère les groupes instructeurs d'une démarche avec leurs instructeurs.
+
+    La liste des groupes (id, number, label) est lue en une requête légère, puis
+    les instructeurs sont demandés par paquets de INSTRUCTEURS_GROUPS_PER_REQUEST
+    groupes (requêtes `groupeInstructeur` aliasées), interrogés en parallèle.
+    Sur une démarche à plusieurs centaines de groupes, chaque requête reste
+    ainsi de taille bornée.
+
+    Returns:
+        list[dict]: [{"id", "number", "label", "instructeurs": [{"id", "email"}]}]
+    """
+    if not API_TOKEN:
+        raise ValueError("Le token d'API n'est pas configuré.")
+
+    headers = {
+        "Authorization": f"Bearer {API_TOKEN}",
+        "Content-Type": "application/json",
+    }
+    session = get_session_with_retries()
+
+    def execute(query, variables=None):
+        response = session.post(
+            API_URL,
+            json={"query": query, "variables": variables or {}},
+            headers=headers,
+            timeout=DS_REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        result = response.json()
+        if "errors" in result:
+            messages = [e.get("message", "Unknown error") for e in result["errors"]]
+            raise Exception(f"GraphQL errors: {', '.join(messages)}")
+        return result["data"]
+
+    query_groupes = """
+    query getGroupesInstructeurs($demarcheNumber: Int!) {
+        demarche(number: $demarcheNumber) {
+            groupeInstructeurs {
+                id
+                number
+                label
+            }
+        }
+    }
+    """
+    data = execute(query_groupes, {"demarcheNumber": demarche_number})
+    groupes = (data.get("demarche") or {}).get("groupeInstructeurs") or []
+
+    def fetch_instructeurs(chunk):
+        aliases = "\n".join(
+            f"g{i}: groupeInstructeur(number: {int(groupe['number'])}) "
+            "{ instructeurs { id email } }"
+            for i, groupe in enumerate(chunk)
+        )
+        result = execute(f"query getInstructeurs {{\n{aliases}\n}}")
+        return [
+            (result.get(f"g{i}") or {}).get("instructeurs") or []
+            for i in range(len(chunk))
+        ]
+
+    chunks = [
+        groupes[i : i + INSTRUCTEURS_GROUPS_PER_REQUEST]
+        for i in range(0, len(groupes), INSTRUCTEURS_GROUPS_PER_REQUEST)
+    ]
+    if chunks:
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(4, len(chunks))
+        ) as executor:
+            for chunk, instructeurs in zip(
+                chunks, executor.map(fetch_instructeurs, chunks)
+            ):
+                for groupe, groupe_instructeurs in zip(chunk, instructeurs):
+                    groupe["instructeurs"] = groupe_instructeurs
+
+    print(
+        f"[INSTRUCTEURS] {len(groupes)} groupe(s) récupéré(s) "
+        f"en {len(chunks) + 1} requête(s)"
+    )
+
+    return groupes
+
+
 def get_dossier_geojson(dossier_number: int) -> Dict[str, Any]:
     """
     Récupère les données géométriques d'un dossier au format GeoJSON.
@@ -1267,12 +1415,15 @@ def get_deleted_dossiers(
     demarche_number: int, deleted_since: str = None
 ) -> List[Dict[str, Any]]:
     """
-    Récupère les dossiers supprimés d'une démarche, en fusionnant :
+    Récupère les dossiers supprimés d'une démarche, en fusionnant par numéro :
     - deletedDossiers : suppression confirmée par DN
     - pendingDeletedDossiers : suppression en attente (période de grâce), mais déjà
     invisible pour les instructeurs dans DN — traité ici comme supprimé.
-    Pagination complète sur les deux connexions.
+    Les deux connexions, indépendantes, sont parcourues en parallèle.
     deleted_since (ISO8601) limite deletedDossiers aux suppressions récentes.
+    pendingDeletedDossiers n'a pas de filtre `since` : la liste complète est mise
+    en cache dans le stockage local pendant PENDING_DELETED_CACHE_TTL secondes.
+    En cas de doublon, l'entrée confirmée (deletedDossiers) est conservée.
     """
     if not API_TOKEN:
         raise ValueError("Le token d'API n'est pas configuré.")
@@ -1285,7 +1436,6 @@ def get_deleted_dossiers(
         "Content-Type": "application/json",
     }
     session = get_session_with_retries()
-    all_deleted = []
 
     # --- deletedDossiers (suppression confirmée) ---
     query_deleted = """
@@ -1298,9 +1448,8 @@ def get_deleted_dossiers(
         }
     }
     """
-    cursor = None
-    has_next_page = True
-    while has_next_page:
+
+    def fetch_deleted_page(cursor):
         variables = {
             "demarcheNumber": demarche_number,
             "first": 100,
@@ -1316,10 +1465,7 @@ def get_deleted_dossiers(
         result = response.json()
         if "errors" in result:
             raise Exception(f"GraphQL errors: {result['errors']}")
-        connection = result["data"]["demarche"]["deletedDossiers"]
-        all_deleted.extend(connection["nodes"])
-        has_next_page = connection["pageInfo"]["hasNextPage"]
-        cursor = connection["pageInfo"]["endCursor"]
+        return result["data"]["demarche"]["deletedDossiers"]
 
     # --- pendingDeletedDossiers (en attente, mais déjà invisible pour les instructeurs) ---
     query_pending = """
@@ -1332,9 +1478,8 @@ def get_deleted_dossiers(
         }
     }
     """
-    cursor = None
-    has_next_page = True
-    while has_next_page:
+
+    def fetch_pending_page(cursor):
         variables = {"demarcheNumber": demarche_number, "first": 100, "after": cursor}
         response = session.post(
             API_URL,
@@ -1345,9 +1490,47 @@ def get_deleted_dossiers(
         result = response.json()
         if "errors" in result:
             raise Exception(f"GraphQL errors: {result['errors']}")
-        connection = result["data"]["demarche"]["pendingDeletedDossiers"]
-        all_deleted.extend(connection["nodes"])
-        has_next_page = connection["pageInfo"]["hasNextPage"]
-        cursor = connection["pageInfo"]["endCursor"]
+        return result["data"]["demarche"]["pendingDeletedDossiers"]
+
+    def walk(fetch_page):
+        nodes = []
+        for _, connection in iter_connection_pages(fetch_page):
+            nodes.extend(connection["nodes"])
+        return nodes
+
+    state_store = get_state_store()
+    pending_cache_key = str(demarche_number)
+    pending_deleted = state_store.get(
+        PENDING_DELETED_CACHE_NAMESPACE,
+        pending_cache_key,
+        max_age=PENDING_DELETED_CACHE_TTL,
+    )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        deleted_future = executor.submit(walk, fetch_deleted_page)
+        pending_future = (
+            executor.submit(walk, fetch_pending_page)
+            if pending_deleted is None
+            else None
+        )
+
+        confirmed_deleted = deleted_future.result()
+        if pending_future is not None:
+            pending_deleted = pending_future.result()
+            state_store.set(
+                PENDING_DELETED_CACHE_NAMESPACE, pending_cache_key, pending_deleted
+            )
+        else:
+            print(
+                f"[SUPPRESSIONS] pendingDeletedDossiers lus depuis le cache "
+                f"({len(pending_deleted)} dossiers)"
+            )
+
+    # Fusion par numéro : l'entrée confirmée prime sur l'entrée en attente
+    merged = {}
+    for dossier in pending_deleted:
+        merged[dossier["number"]] = dossier
+    for dossier in confirmed_deleted:
+        merged[dossier["number"]] = dossier
 
-    return all_deleted
+    return list(merged.values())
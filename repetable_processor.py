@@ -12,6 +12,17 @@ import requests
 from datetime import datetime
 from typing import Dict, Any, Tuple, Optional
 
+from utils.geometry import (
+    GEOMETRY_FIELDS,
+    GEOMETRY_WRITTEN_NAMESPACE,
+    encode_geometry_cached,
+    geometry_hash,
+)
+from utils.state_store import get_state_store
+
+# Empreintes des lignes répétables par dossier (mode remplacement)
+REPETABLE_FINGERPRINTS_NAMESPACE = "repetable_fingerprints"
+
 try:
     from utils.log import log, log_verbose, log_error
 except ImportError:
@@ -89,6 +100,7 @@ def ensure_repetable_columns_exist(client, table_id, repetable_data):
 
             if add_response.status_code == 200:
                 log(f"  [CORRECTION] ✅ {len(missing_columns)} colonnes ajoutées avec succès")
+                client.record_created_columns(table_id, missing_columns)
                 return True
             else:
                 log_error(f"  [CORRECTION] ❌ Erreur lors de l'ajout des colonnes: {add_response.status_code} - {add_response.text}")
@@ -216,6 +228,7 @@ def auto_fix_missing_columns_optimized(client, table_id, records_payload):
                 return False, add_response
 
             log(f"    [AUTO-FIX] SUCCES: {len(missing_columns)} colonnes ajoutees")
+            client.record_created_columns(table_id, missing_columns)
 
         # 5. Tenter l'insertion des données
         records_url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_id}/records"
@@ -618,6 +631,21 @@ def extract_geo_data(geo_area: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         dict: Données géographiques extraites
     """
+    return extract_geo_data_with_hash(geo_area)[0]
+
+
+def extract_geo_data_with_hash(
+    geo_area: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Comme extract_geo_data, en retournant aussi l'empreinte de la géométrie.
+
+    Les encodages JSON/WKT sont repris du cache local quand la zone
+    (même ID, même géométrie) a déjà été encodée lors d'une sync précédente.
+
+    Returns:
+        tuple: (données géographiques, empreinte de la géométrie ou None)
+    """
     geo_data = {
         "geo_id": geo_area.get("id"),
         "geo_source": geo_area.get("source"),
@@ -630,196 +658,199 @@ def extract_geo_data(geo_area: Dict[str, Any]) -> Dict[str, Any]:
     }
 
     # Traiter les données géométriques
-    geometry = geo_area.get("geometry", {})
+    geometry = geo_area.get("geometry") or {}
     geo_type = geometry.get("type")
     coordinates = geometry.get("coordinates")
 
     geo_data["geo_type"] = geo_type
+    geo_hash = None
 
-    # Stocker les coordonnées brutes sous forme de chaîne JSON
+    # Coordonnées brutes (JSON) et géométrie WKT, encodées en un seul parcours
     if coordinates:
         try:
-            geo_data["geo_coordinates"] = json.dumps(coordinates)
-        except (TypeError, ValueError):
-            geo_data["geo_coordinates"] = str(coordinates)
-
-    # Créer la géométrie WKT (Well-Known Text) si possible
-    if geo_type and coordinates:
-        wkt = None
-        try:
-            if geo_type == "Point":
-                # Point: POINT(X Y)
-                wkt = f"POINT({coordinates[0]} {coordinates[1]})"
-
-            elif geo_type == "LineString":
-                # LineString: LINESTRING(X1 Y1, X2 Y2, ...)
-                points = ", ".join([f"{p[0]} {p[1]}" for p in coordinates])
-                wkt = f"LINESTRING({points})"
-
-            elif geo_type == "Polygon":
-                # Polygon: POLYGON((X1 Y1, X2 Y2, ..., X1 Y1), (hole1), (hole2), ...)
-                rings = []
-                for ring in coordinates:
-                    # S'assurer que le premier et le dernier point sont identiques (fermer l'anneau)
-                    if ring[0] != ring[-1]:
-                        ring = ring + [ring[0]]
-
-                    points = ", ".join([f"{p[0]} {p[1]}" for p in ring])
-                    rings.append(f"({points})")
-
-                wkt = f"POLYGON({', '.join(rings)})"
-
-            elif geo_type == "MultiPoint":
-                # MultiPoint: MULTIPOINT((X1 Y1), (X2 Y2), ...)
-                points = ", ".join([f"({p[0]} {p[1]})" for p in coordinates])
-                wkt = f"MULTIPOINT({points})"
-
-            elif geo_type == "MultiLineString":
-                # MultiLineString: MULTILINESTRING((X1 Y1, X2 Y2, ...), (X1 Y1, X2 Y2, ...), ...)
-                linestrings = []
-                for line in coordinates:
-                    points = ", ".join([f"{p[0]} {p[1]}" for p in line])
-                    linestrings.append(f"({points})")
-
-                wkt = f"MULTILINESTRING({', '.join(linestrings)})"
-
-            elif geo_type == "MultiPolygon":
-                # MultiPolygon: MULTIPOLYGON(((X1 Y1, X2 Y2, ..., X1 Y1), (hole1), ...), (...), ...)
-                polygons = []
-                for polygon in coordinates:
-                    rings = []
-                    for ring in polygon:
-                        # S'assurer que le premier et le dernier point sont identiques
-                        if ring[0] != ring[-1]:
-                            ring = ring + [ring[0]]
-
-                        points = ", ".join([f"{p[0]} {p[1]}" for p in ring])
-                        rings.append(f"({points})")
-
-                    polygons.append(f"({', '.join(rings)})")
-
-                wkt = f"MULTIPOLYGON({', '.join(polygons)})"
-
-            elif geo_type == "GeometryCollection":
-                # Non pris en charge pour l'instant
-                wkt = None
+            geo_hash = geometry_hash(geometry)
+            geo_data.update(
+                encode_geometry_cached(
+                    geo_type,
+                    coordinates,
+                    f"{geo_area.get('id')}:{geo_hash}",
+                    reference=geo_area.get("id"),
+                )
+            )
+            if geo_type and geo_data["geo_wkt"] is None:
                 print(f"  Type de géométrie non pris en charge: {geo_type}")
-
-            geo_data["geo_wkt"] = wkt
-
         except Exception as e:
             print(f"  Erreur lors de la création du WKT pour le type {geo_type}: {str(e)}")
+            try:
+                geo_data["geo_coordinates"] = json.dumps(coordinates)
+            except (TypeError, ValueError):
+                geo_data["geo_coordinates"] = str(coordinates)
             geo_data["geo_wkt"] = None
 
-    return geo_data
+    return geo_data, geo_hash
 
 
-def get_existing_repetable_rows_improved_no_filter(
-    client,
-    table_id,
-    dossier_number=None
-):
+# Colonnes nécessaires à l'identification des lignes existantes
+REPETABLE_INDEX_COLUMNS = (
+    "dossier_number",
+    "block_row_id",
+    "block_row_index",
+    "field_name",
+    "geo_id",
+)
+
+
+class RepetableRowIndex:
     """
-    Version améliorée qui évite d'utiliser le filtre côté serveur,
-    récupère toutes les lignes et filtre côté client.
+    Index des lignes existantes d'une table de bloc répétable.
+
+    Clé canonique (dossier_number, block_row_id) ; les lignes anciennes sans
+    block_row_id sont indexées par (dossier_number, "index_<block_row_index>").
+    Un index secondaire (dossier_number, field_name, geo_id) retrouve les
+    géométries dont la position dans le champ carte a changé, et by_dossier
+    liste les lignes de chaque dossier (mode remplacement).
     """
-    if not client.doc_id:
-        raise ValueError("Document ID is required")
 
-    # Récupérer tous les enregistrements sans filtre
-    url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_id}/records"
-    log_verbose(f"Récupération de tous les enregistrements de la table {table_id}")
+    def __init__(self):
+        self.by_key = {}
+        self.by_geo = {}
+        self.by_dossier = {}  # {dossier_number: {record_id: (clé, clé géo)}}
+
+    def __len__(self):
+        return len(self.by_key)
+
+    def add(self, record_id, fields):
+        """Indexe une ligne à partir de ses champs Grist"""
+        dossier_number = fields.get("dossier_number")
+        if dossier_number in (None, ""):
+            return
+
+        dossier_key = str(dossier_number)
+        row_key = None
+        geo_key = None
+
+        if fields.get("block_row_id"):
+            row_key = (dossier_key, str(fields["block_row_id"]))
+        elif fields.get("block_row_index") is not None:
+            row_key = (dossier_key, f"index_{fields['block_row_index']}")
+
+        if row_key:
+            self.by_key[row_key] = record_id
+            if fields.get("field_name") and fields.get("geo_id"):
+                geo_key = (dossier_key, str(fields["field_name"]), str(fields["geo_id"]))
+                self.by_geo[geo_key] = record_id
+
+        self.by_dossier.setdefault(dossier_key, {})[record_id] = (row_key, geo_key)
+
+    def remove_dossier(self, dossier_number):
+        """Retire les lignes d'un dossier de l'index et retourne leurs IDs"""
+        rows = self.by_dossier.pop(str(dossier_number), {})
+
+        for record_id, (row_key, geo_key) in rows.items():
+            if row_key and self.by_key.get(row_key) == record_id:
+                del self.by_key[row_key]
+            if geo_key and self.by_geo.get(geo_key) == record_id:
+                del self.by_geo[geo_key]
+
+        return list(rows)
+
+    def find(
+        self,
+        dossier_number,
+        block_row_id,
+        block_row_index=None,
+        field_name=None,
+        geo_id=None,
+    ):
+        """Retourne l'ID Grist de la ligne correspondante, ou None"""
+        dossier_key = str(dossier_number)
+
+        record_id = self.by_key.get((dossier_key, str(block_row_id)))
+        if record_id is None and block_row_index is not None:
+            record_id = self.by_key.get((dossier_key, f"index_{block_row_index}"))
+        if record_id is None and field_name and geo_id:
+            record_id = self.by_geo.get((dossier_key, str(field_name), str(geo_id)))
+
+        return record_id
+
+
+def fetch_repetable_index_records(client, table_id):
+    """
+    Récupère uniquement les colonnes d'identification d'une table répétable.
 
-    response = requests.get(url, headers=client.headers)
+    Passe par l'endpoint SQL de Grist pour ne pas télécharger toutes les
+    colonnes ; repli sur /records si l'endpoint SQL est indisponible.
 
+    Returns:
+        list: Enregistrements au format {"id": ..., "fields": {...}}, None en cas d'erreur
+    """
+    table_url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_id}"
+
+    columns_response = requests.get(f"{table_url}/columns", headers=client.headers)
+    if columns_response.status_code == 200:
+        existing_columns = {
+            col.get("id") for col in columns_response.json().get("columns", [])
+        }
+        selected = [col for col in REPETABLE_INDEX_COLUMNS if col in existing_columns]
+
+        if "dossier_number" in selected:
+            select_list = ", ".join(f'"{col}"' for col in ["id", *selected])
+            sql_response = requests.get(
+                f"{client.base_url}/docs/{client.doc_id}/sql",
+                headers=client.headers,
+                params={"q": f'SELECT {select_list} FROM "{table_id}"'},
+            )
+            if sql_response.status_code == 200:
+                return [
+                    {"id": record["fields"].get("id"), "fields": record["fields"]}
+                    for record in sql_response.json().get("records", [])
+                ]
+            log_verbose(
+                f"Endpoint SQL indisponible pour {table_id} ({sql_response.status_code}), repli sur /records"
+            )
+
+    response = requests.get(f"{table_url}/records", headers=client.headers)
     if response.status_code != 200:
         log_error(f"Erreur lors de la récupération des enregistrements: {response.status_code} - {response.text}")
-        return {}
+        return None
 
-    data = response.json()
+    return response.json().get("records", [])
 
-    # Dictionnaire pour stocker les enregistrements par différentes clés composites
-    records_dict = {}
 
-    if 'records' in data and isinstance(data['records'], list):
-        for record in data['records']:
-            if 'id' in record and 'fields' in record:
-                fields = record['fields']
-                record_id = record['id']
+def get_existing_repetable_rows_index(client, table_id, dossier_number=None):
+    """
+    Construit en une passe l'index des lignes existantes d'une table répétable.
 
-                # Vérifier que les champs requis sont présents
-                if 'dossier_number' in fields:
-                    # Filtrer par dossier si un dossier_number est spécifié
-                    if dossier_number is not None and str(fields['dossier_number']) != str(dossier_number):
-                        continue
+    Args:
+        client: Instance de GristClient
+        table_id: ID de la table Grist du bloc
+        dossier_number: Si fourni, n'indexe que les lignes de ce dossier
 
-                    current_dossier_number = str(fields['dossier_number'])
-                    block_label = fields.get('block_label', '')  # ✅ Optionnel
+    Returns:
+        RepetableRowIndex: Index des lignes existantes (vide en cas d'erreur)
+    """
+    if not client.doc_id:
+        raise ValueError("Document ID is required")
 
-                    # Utiliser block_row_id s'il est disponible, sinon block_row_index
-                    if 'block_row_id' in fields and fields['block_row_id']:
-                        row_identifier = fields['block_row_id']
-                    elif 'block_row_index' in fields:
-                        row_identifier = f"index_{fields['block_row_index']}"
-                    else:
-                        # Sans identifiant de ligne, passer à l'enregistrement suivant
-                        continue
+    log_verbose(f"Récupération des lignes existantes de la table {table_id}")
 
-                    # Créer plusieurs formats de clés composites pour augmenter les chances de correspondance
-
-                    # Format 1: dossier_number_block_label_row_id
-                    key1 = f"{current_dossier_number}_{block_label}_{row_identifier}"
-                    records_dict[key1] = record_id
-
-                    # Format 2: dossier_number_block_label_row_id (tout en minuscules)
-                    key2 = key1.lower()
-                    records_dict[key2] = record_id
-
-                    # Format 3: dossier_number_block_label_index (si block_row_index est disponible)
-                    if 'block_row_index' in fields:
-                        key3 = f"{current_dossier_number}_{block_label}_index_{fields['block_row_index']}"
-                        records_dict[key3] = record_id
-
-                    # Format 4: avec espaces remplacés par des underscores dans block_label
-                    clean_label = block_label.replace(' ', '_')
-                    key4 = f"{current_dossier_number}_{clean_label}_{row_identifier}"
-                    records_dict[key4] = record_id
-
-                    # Format 5: avec tous les caractères non alphanumériques supprimés
-                    clean_label = re.sub(r'[^\w]', '', block_label)
-                    key5 = f"{current_dossier_number}_{clean_label}_{row_identifier}"
-                    records_dict[key5] = record_id
-
-                    # Enregistrer le record_id par l'ID seul pour vérification directe
-                    if 'block_row_id' in fields and fields['block_row_id']:
-                        records_dict[fields['block_row_id']] = record_id
-
-                    # Gestion spéciale des géométries
-                    if 'field_name' in fields and 'geo_id' in fields and fields['geo_id']:
-                        field_name = fields['field_name']
-                        geo_id = fields['geo_id']
-
-                        # Clé pour les géométries
-                        geo_key = f"{current_dossier_number}_{block_label}_{field_name}_{geo_id}"
-                        records_dict[geo_key.lower()] = record_id
-
-                        # Autre format avec position de la géométrie si disponible
-                        if row_identifier and '_geo' in row_identifier:
-                            # Extraire l'index de la géométrie depuis row_identifier
-                            match = re.search(r'_geo(\d+)$', row_identifier)
-                            if match:
-                                geo_index = match.group(1)
-                                base_id = row_identifier.split('_geo')[0]
-                                geo_key_alt = f"{current_dossier_number}_{block_label}_{base_id}_geo{geo_index}"
-                                records_dict[geo_key_alt.lower()] = record_id
-
-        # Afficher des statistiques détaillées sur les lignes trouvées
-        if dossier_number is not None:
-            filtered_count = sum(1 for key in records_dict.keys() if key.startswith(f"{dossier_number}_"))
-            log(f"  {filtered_count} clés d'identification trouvées pour les lignes de blocs répétables du dossier {dossier_number}")
-        else:
-            log(f"  {len(records_dict)} clés d'identification trouvées pour tous les blocs répétables")
-            return records_dict
+    index = RepetableRowIndex()
+    records = fetch_repetable_index_records(client, table_id)
+    if not records:
+        return index
+
+    for record in records:
+        fields = record.get("fields") or {}
+        if dossier_number is not None and str(fields.get("dossier_number")) != str(dossier_number):
+            continue
+        index.add(record.get("id"), fields)
+
+    if dossier_number is not None:
+        log(f"  {len(index)} lignes de blocs répétables existantes pour le dossier {dossier_number}")
+    else:
+        log(f"  {len(index)} lignes de blocs répétables existantes dans {table_id}")
+
+    return index
 
 
 def process_repetables_for_grist(
@@ -909,6 +940,7 @@ def process_repetables_for_grist(
                     log_error(f"  Erreur lors de l'ajout des colonnes: {add_response.text}")
                 else:
                     log(f"  Colonnes ajoutées avec succès")
+                    client.record_created_columns(table_id, [col["id"] for col in missing_columns])
                     valid_columns = set(repetable_columns.keys())
         else:
             log_error(f"  Erreur lors de la récupération des colonnes: {response.text}")
@@ -918,8 +950,7 @@ def process_repetables_for_grist(
         valid_columns = set(repetable_columns.keys())
 
     # Récupérer tous les enregistrements sans filtrage qui cause l'erreur 500
-    existing_rows = get_existing_repetable_rows_improved_no_filter(client, table_id, dossier_number)
-    log(f"  {len(existing_rows)} clés d'identification trouvées pour les lignes de blocs répétables du dossier {dossier_number}")
+    existing_rows = get_existing_repetable_rows_index(client, table_id, dossier_number)
 
     # Fonction récursive pour explorer les champs et traiter les blocs répétables
     def explore_and_store_repetables(champs):
@@ -999,30 +1030,13 @@ def process_repetables_for_grist(
                                     if key in repetable_columns and key in valid_columns:
                                         geo_record[key] = format_value_for_grist(value, repetable_columns[key])
 
-                                # Créer différentes clés de recherche pour trouver des correspondances
-                                search_keys = []
-
-                                # Format 1: dossier_number_block_label_geo_identifier
-                                search_keys.append(f"{dossier_number}_{block_label}_{geo_identifier}")
-
-                                # Format 2: dossier_number_block_label_row_id_geo_index
-                                search_keys.append(f"{dossier_number}_{block_label}_{row_id}_geo{geo_index+1}")
-
-                                # Format 3: dossier_number_block_label_field_name_geo_id
-                                field_name = geo_data.get("field_name", "")
-                                geo_id = geo_data.get("geo_id", "")
-                                if field_name and geo_id:
-                                    search_keys.append(f"{dossier_number}_{block_label}_{field_name}_{geo_id}")
-
-                                # Chercher dans les enregistrements existants avec toutes les clés
-                                found_id = None
-                                for key in search_keys:
-                                    # Normaliser la clé pour la recherche
-                                    normalized_key = key.lower()
-                                    if normalized_key in existing_rows:
-                                        found_id = existing_rows[normalized_key]
-                                        log_verbose(f"    Ligne trouvée avec la clé: {normalized_key}")
-                                        break
+                                # Chercher la ligne existante (identifiant puis géométrie)
+                                found_id = existing_rows.find(
+                                    dossier_number,
+                                    geo_identifier,
+                                    field_name=geo_data.get("field_name"),
+                                    geo_id=geo_data.get("geo_id"),
+                                )
 
                                 # Si on a trouvé un enregistrement existant, le mettre à jour
                                 if found_id:
@@ -1048,13 +1062,12 @@ def process_repetables_for_grist(
                                         repetable_success += 1
                                         log_verbose(f"    Géométrie {geo_index+1} du bloc {block_label}, ligne {row_index+1} créée avec succès")
 
-                                        # Ajouter l'ID à existing_rows pour éviter les doublons futurs
+                                        # Indexer la nouvelle ligne pour éviter les doublons futurs
                                         result = response.json()
                                         if 'records' in result and result['records']:
                                             new_id = result['records'][0].get('id')
                                             if new_id:
-                                                for key in search_keys:
-                                                    existing_rows[key.lower()] = new_id
+                                                existing_rows.add(new_id, geo_record)
                                     else:
                                         repetable_errors += 1
                                         log_error(f"    Erreur lors de la création: {response.text}")
@@ -1063,26 +1076,10 @@ def process_repetables_for_grist(
                             record = base_record.copy()
                             record.update(row_data)
 
-                            # Créer différentes clés de recherche
-                            search_keys = []
-
-                            # Format 1: dossier_number_block_label_row_id
-                            search_keys.append(f"{dossier_number}_{block_label}_{row_id}")
-
-                            # Format 2: dossier_number_block_label_index
-                            search_keys.append(f"{dossier_number}_{block_label}_index_{row_index+1}")
-
-                            # Format 3: Utilisation directe de row_id
-                            search_keys.append(row_id)
-
-                            # Chercher dans les enregistrements existants
-                            found_id = None
-                            for key in search_keys:
-                                normalized_key = key.lower()
-                                if normalized_key in existing_rows:
-                                    found_id = existing_rows[normalized_key]
-                                    log_verbose(f"    Ligne trouvée avec la clé: {normalized_key}")
-                                    break
+                            # Chercher la ligne existante (identifiant puis position)
+                            found_id = existing_rows.find(
+                                dossier_number, row_id, block_row_index=row_index + 1
+                            )
 
                             # Si on a trouvé un enregistrement existant, le mettre à jour
                             if found_id:
@@ -1108,13 +1105,12 @@ def process_repetables_for_grist(
                                     repetable_success += 1
                                     log_verbose(f"    Ligne {row_index+1} du bloc {block_label} créée avec succès")
 
-                                    # Ajouter l'ID à existing_rows pour éviter les doublons futurs
+                                    # Indexer la nouvelle ligne pour éviter les doublons futurs
                                     result = response.json()
                                     if 'records' in result and result['records']:
                                         new_id = result['records'][0].get('id')
                                         if new_id:
-                                            for key in search_keys:
-                                                existing_rows[key.lower()] = new_id
+                                            existing_rows.add(new_id, record)
                                 else:
                                     repetable_errors += 1
                                     log_error(f"    Erreur lors de la création: {response.text}")
@@ -1180,7 +1176,7 @@ def process_repetable_data_batch(
             repetable_columns = column_types
 
         # Récupérer les enregistrements existants
-        existing_rows = get_existing_repetable_rows_improved_no_filter(client, table_id, dossier_number)
+        existing_rows = get_existing_repetable_rows_index(client, table_id, dossier_number)
 
         success_count = 0
         error_count = 0
@@ -1192,8 +1188,6 @@ def process_repetable_data_batch(
             if champ["__typename"] != "RepetitionChamp":
                 return
 
-            block_label = champ["label"]
-
             for row_index, row in enumerate(champ.get("rows", [])):
                 try:
                     # Collecter les données de la ligne
@@ -1253,30 +1247,25 @@ def process_repetable_data_batch(
                                 column_type = repetable_columns.get(key, "Text")
                                 geo_record[key] = format_value_for_grist(value, column_type)
 
-                            records_to_process.append((geo_record, [
-                                f"{dossier_number}_{block_label}_{geo_identifier}",
-                                f"{dossier_number}_{block_label}_{row_id}_geo{geo_index+1}"
-                            ]))
+                            records_to_process.append((geo_record, {
+                                "field_name": geo_data.get("field_name"),
+                                "geo_id": geo_data.get("geo_id"),
+                            }))
                     else:
                         # Ligne simple sans géométrie
                         record = base_record.copy()
                         record.update(row_data)
 
-                        records_to_process.append((record, [
-                            f"{dossier_number}_{block_label}_{row_id}",
-                            f"{dossier_number}_{block_label}_index_{row_index+1}",
-                            row_id
-                        ]))
+                        records_to_process.append((record, {
+                            "block_row_index": row_index + 1,
+                        }))
 
                     # Traiter chaque enregistrement
-                    for record, search_keys in records_to_process:
+                    for record, lookup in records_to_process:
                         # Chercher si existe déjà
-                        found_id = None
-                        for key in search_keys:
-                            normalized_key = key.lower()
-                            if normalized_key in existing_rows:
-                                found_id = existing_rows[normalized_key]
-                                break
+                        found_id = existing_rows.find(
+                            dossier_number, record["block_row_id"], **lookup
+                        )
 
                         # Upsert
                         url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_id}/records"
@@ -1318,13 +1307,98 @@ def process_repetable_data_batch(
         return 0, 0
 
 
+def replace_repetable_rows(client, table_id, existing_rows, dossier_numbers, records):
+    """
+    Remplace les lignes de plusieurs dossiers dans une table de bloc répétable.
+
+    Une seule requête /apply : suppression groupée des lignes existantes de ces
+    dossiers (IDs tirés de l'index) puis insertion groupée des lignes fraîches.
+    Les lignes supprimées dans DS disparaissent ainsi de Grist.
+
+    Args:
+        client: Instance de GristClient
+        table_id: ID de la table Grist du bloc
+        existing_rows: RepetableRowIndex de la table, mis à jour en place
+        dossier_numbers: Numéros des dossiers à remplacer
+        records: Champs des lignes à insérer
+
+    Returns:
+        tuple: (success_count, error_count)
+    """
+    ids_to_remove = [
+        record_id
+        for dossier_number in dossier_numbers
+        for record_id in existing_rows.by_dossier.get(str(dossier_number), {})
+    ]
+
+    actions = []
+    if ids_to_remove:
+        actions.append(["BulkRemoveRecord", table_id, ids_to_remove])
+    if records:
+        columns = sorted({key for record in records for key in record})
+        actions.append([
+            "BulkAddRecord",
+            table_id,
+            [None] * len(records),
+            {col: [record.get(col) for record in records] for col in columns},
+        ])
+
+    if not actions:
+        return 0, 0
+
+    url = f"{client.base_url}/docs/{client.doc_id}/apply"
+    response = requests.post(url, headers=client.headers, json=actions)
+
+    # AUTO-FIX pour colonnes manquantes, puis un seul nouvel essai
+    if (
+        response.status_code == 400
+        and records
+        and ensure_repetable_columns_exist(client, table_id, records)
+    ):
+        response = requests.post(url, headers=client.headers, json=actions)
+
+    if response.status_code != 200:
+        log_error(f"Erreur remplacement lignes {table_id}: {response.status_code} - {response.text}")
+        return 0, len(records)
+
+    for dossier_number in dossier_numbers:
+        existing_rows.remove_dossier(dossier_number)
+
+    new_ids = response.json().get("retValues", [])[-1] if records else []
+    for record_id, fields in zip(new_ids or [], records):
+        existing_rows.add(record_id, fields)
+
+    log(f"Table {table_id}: {len(ids_to_remove)} lignes supprimées, {len(records)} insérées")
+    return len(records), 0
+
+
+def repetable_fingerprint(records_by_block):
+    """Empreinte des lignes répétables d'un dossier, tous blocs confondus"""
+    payload = json.dumps(records_by_block, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def _rows_match_index(records_by_block, existing_rows_by_block, dossier_number):
+    """
+    Vrai si chaque table contient autant de lignes du dossier que de lignes
+    attendues : une table vidée ou recréée dans Grist force le remplacement
+    """
+    return all(
+        len(existing_rows_by_block[block_key].by_dossier.get(str(dossier_number), {}))
+        == len(records)
+        for block_key, records in records_by_block.items()
+    )
+
+
 def process_repetables_batch(
     client,
     dossiers_data,
     table_ids_dict,
     column_types_dict,
     problematic_ids=None,
-    batch_size=50
+    batch_size=50,
+    existing_rows_cache=None,
+    write_mode="upsert"
 ):
     """
     Traite les blocs répétables par lot pour plusieurs dossiers.
@@ -1337,26 +1411,41 @@ def process_repetables_batch(
         column_types_dict: Dict {block_label_normalized: {"columns": [...]}}
         problematic_ids: IDs à filtrer
         batch_size: Taille du lot
+        existing_rows_cache: Cache optionnel {table_id: RepetableRowIndex} détenu
+            par la synchronisation : chaque table n'est chargée qu'une fois,
+            puis l'index est complété avec les lignes créées
+        write_mode: "upsert" (rapprochement ligne à ligne) ou "replace"
+            (lignes de chaque dossier supprimées puis réinsérées, voir
+            replace_repetable_rows ; un dossier dont l'empreinte des lignes
+            n'a pas changé depuis le dernier remplacement est laissé tel quel)
 
     Returns:
         tuple: (success_count, error_count)
     """
     total_success = 0
     total_errors = 0
+    # Dossiers extraits sans erreur : seuls ceux-là sont remplacés
+    replaced_dossiers = set()
+
+    if existing_rows_cache is None:
+        existing_rows_cache = {}
 
-    # ✅ NOUVEAU : Récupérer TOUTES les lignes existantes AVANT la boucle
+    # Charger les lignes existantes des tables pas encore en cache
     existing_rows_by_block = {}
     for block_key, table_id in table_ids_dict.items():
-        existing_rows_by_block[block_key] = get_existing_repetable_rows_improved_no_filter(
-            client,
-            table_id,
-            None  # ✅ None = récupérer TOUTES les lignes de tous les dossiers
-        )
+        if table_id not in existing_rows_cache:
+            existing_rows_cache[table_id] = get_existing_repetable_rows_index(
+                client,
+                table_id,
+                None  # ✅ None = récupérer TOUTES les lignes de tous les dossiers
+            )
+        existing_rows_by_block[block_key] = existing_rows_cache[table_id]
 
     # Grouper les dossiers et extraire les lignes par bloc
-    rows_by_block = {}  # {block_label_normalized: {"to_update": [], "to_create": [], "existing_rows": {}}}
+    rows_by_block = {}  # {block_label_normalized: {"to_update": [], "to_create": [], "records": [], "existing_rows": RepetableRowIndex}}
 
     for dossier_data in dossiers_data:
+        errors_before = total_errors
         try:
             dossier_number = dossier_data["number"]
 
@@ -1388,7 +1477,8 @@ def process_repetables_batch(
                     rows_by_block[normalized_block] = {
                         "to_update": [],
                         "to_create": [],
-                        "existing_rows": existing_rows_by_block.get(normalized_block, {})  # ✅ Utiliser le cache
+                        "records": [],  # mode remplacement : lignes fraîches, sans rapprochement
+                        "existing_rows": existing_rows_by_block.get(normalized_block, RepetableRowIndex())  # ✅ Utiliser le cache
                     }
 
                 # Obtenir les types de colonnes pour ce bloc
@@ -1423,9 +1513,9 @@ def process_repetables_batch(
                                 # Traitement des champs cartographiques
                                 if field["__typename"] == "CarteChamp" and field.get("geoAreas"):
                                     for geo_area in field.get("geoAreas", []):
-                                        geo_data = extract_geo_data(geo_area)
+                                        geo_data, geo_hash = extract_geo_data_with_hash(geo_area)
                                         geo_data["field_name"] = normalized_label
-                                        geo_data_list.append(geo_data)
+                                        geo_data_list.append((geo_data, geo_hash))
 
                         # ID de la ligne
                         row_id = row.get("id", f"row_{row_index}")
@@ -1441,7 +1531,7 @@ def process_repetables_batch(
                         # Traiter les géométries ou la ligne simple
                         if geo_data_list:
                             # Créer un enregistrement par géométrie
-                            for geo_index, geo_data in enumerate(geo_data_list):
+                            for geo_index, (geo_data, geo_hash) in enumerate(geo_data_list):
                                 geo_record = base_record.copy()
                                 geo_record.update(row_data)
 
@@ -1453,46 +1543,35 @@ def process_repetables_batch(
                                     column_type = block_column_types.get(key, "Text")
                                     geo_record[key] = format_value_for_grist(value, column_type)
 
-                                # Clés de recherche
-                                search_keys = [
-                                    f"{dossier_number}_{block_label}_{geo_identifier}".lower(),
-                                    f"{dossier_number}_{block_label}_{row_id}_geo{geo_index+1}".lower()
-                                ]
-
-                                field_name = geo_data.get("field_name", "")
-                                geo_id = geo_data.get("geo_id", "")
-                                if field_name and geo_id:
-                                    search_keys.append(f"{dossier_number}_{block_label}_{field_name}_{geo_id}".lower())
+                                if write_mode == "replace":
+                                    rows_by_block[normalized_block]["records"].append(geo_record)
+                                    continue
 
-                                # Chercher si existe
-                                found_id = None
-                                for key in search_keys:
-                                    if key in rows_by_block[normalized_block]["existing_rows"]:
-                                        found_id = rows_by_block[normalized_block]["existing_rows"][key]
-                                        break
+                                # Chercher si existe (identifiant puis géométrie)
+                                found_id = rows_by_block[normalized_block]["existing_rows"].find(
+                                    dossier_number,
+                                    geo_identifier,
+                                    field_name=geo_data.get("field_name"),
+                                    geo_id=geo_data.get("geo_id"),
+                                )
 
                                 if found_id:
-                                    rows_by_block[normalized_block]["to_update"].append({"id": found_id, "fields": geo_record})
+                                    rows_by_block[normalized_block]["to_update"].append({"id": found_id, "fields": geo_record, "geo_hash": geo_hash})
                                 else:
-                                    rows_by_block[normalized_block]["to_create"].append({"fields": geo_record})
+                                    rows_by_block[normalized_block]["to_create"].append({"fields": geo_record, "geo_hash": geo_hash})
                         else:
                             # Ligne simple sans géométrie
                             record = base_record.copy()
                             record.update(row_data)
 
-                            # Clés de recherche
-                            search_keys = [
-                                f"{dossier_number}_{block_label}_{row_id}".lower(),
-                                f"{dossier_number}_{block_label}_index_{row_index+1}".lower(),
-                                row_id
-                            ]
+                            if write_mode == "replace":
+                                rows_by_block[normalized_block]["records"].append(record)
+                                continue
 
-                            # Chercher si existe
-                            found_id = None
-                            for key in search_keys:
-                                if key in rows_by_block[normalized_block]["existing_rows"]:
-                                    found_id = rows_by_block[normalized_block]["existing_rows"][key]
-                                    break
+                            # Chercher si existe (identifiant puis position)
+                            found_id = rows_by_block[normalized_block]["existing_rows"].find(
+                                dossier_number, row_id, block_row_index=row_index + 1
+                            )
 
                             if found_id:
                                 rows_by_block[normalized_block]["to_update"].append({"id": found_id, "fields": record})
@@ -1503,69 +1582,191 @@ def process_repetables_batch(
                         log_error(f"Erreur extraction ligne {row_index+1} du bloc '{block_label}': {str(e)}")
                         total_errors += 1
 
+            if total_errors == errors_before:
+                replaced_dossiers.add(str(dossier_number))
+
         except Exception as e:
             log_error(f"Erreur extraction dossier {dossier_data.get('number')}: {str(e)}")
             total_errors += 1
 
+    if write_mode == "replace":
+        # Lignes fraîches par dossier et par bloc, y compris les blocs vides :
+        # un dossier dont le bloc est désormais vide doit perdre ses anciennes lignes
+        records_by_dossier = {
+            dossier_number: {block_key: [] for block_key in table_ids_dict}
+            for dossier_number in replaced_dossiers
+        }
+        for block_key, data in rows_by_block.items():
+            for fields in data["records"]:
+                dossier_key = str(fields["dossier_number"])
+                if dossier_key in records_by_dossier:
+                    records_by_dossier[dossier_key][block_key].append(fields)
+
+        # Dossiers inchangés depuis le dernier remplacement réussi : ni
+        # suppression ni réinsertion (les IDs des lignes restent stables)
+        store = get_state_store()
+        fingerprint_prefix = f"{client.base_url}/{client.doc_id}"
+        fingerprints = {
+            dossier_key: repetable_fingerprint(blocks)
+            for dossier_key, blocks in records_by_dossier.items()
+        }
+        previous = store.get_many(
+            REPETABLE_FINGERPRINTS_NAMESPACE,
+            [f"{fingerprint_prefix}:{dossier_key}" for dossier_key in fingerprints],
+        )
+        unchanged = {
+            dossier_key
+            for dossier_key, fingerprint in fingerprints.items()
+            if previous.get(f"{fingerprint_prefix}:{dossier_key}") == fingerprint
+            and _rows_match_index(
+                records_by_dossier[dossier_key], existing_rows_by_block, dossier_key
+            )
+        }
+        if unchanged:
+            log(f"Blocs répétables inchangés : {len(unchanged)} dossier(s) non remplacés")
+
+        to_replace = replaced_dossiers - unchanged
+        if not to_replace:
+            return total_success, total_errors
+
+        replace_errors = 0
+        for block_key, table_id in table_ids_dict.items():
+            records = [
+                fields
+                for dossier_key in to_replace
+                for fields in records_by_dossier[dossier_key][block_key]
+            ]
+            success, errors = replace_repetable_rows(
+                client,
+                table_id,
+                existing_rows_by_block[block_key],
+                to_replace,
+                records,
+            )
+            total_success += success
+            replace_errors += errors
+
+        total_errors += replace_errors
+        if not replace_errors:
+            store.set_many(
+                REPETABLE_FINGERPRINTS_NAMESPACE,
+                {
+                    f"{fingerprint_prefix}:{dossier_key}": fingerprints[dossier_key]
+                    for dossier_key in to_replace
+                    if _rows_match_index(
+                        records_by_dossier[dossier_key], existing_rows_by_block, dossier_key
+                    )
+                },
+            )
+
+        return total_success, total_errors
+
     # Traiter chaque bloc séparément
     for block_key, data in rows_by_block.items():
         table_id = table_ids_dict[block_key]
 
         log(f"Traitement du bloc '{block_key}': {len(data['to_update'])} MAJ, {len(data['to_create'])} créations")
 
+        # Empreintes des géométries écrites, par ligne Grist ; la clé inclut
+        # le document : deux configurations d'une même démarche vers des
+        # documents différents ont les mêmes tables et des ID de ligne communs
+        store = get_state_store()
+        written_hashes = {}
+        written_prefix = f"{client.base_url}/{client.doc_id}:{table_id}"
+
         # Traiter les mises à jour par lot
         if data["to_update"]:
-            # Normaliser tous les enregistrements
-            all_keys = set()
-            for record in data["to_update"]:
-                all_keys.update(record["fields"].keys())
+            geo_hashes = {
+                record["id"]: record["geo_hash"]
+                for record in data["to_update"]
+                if record.get("geo_hash")
+            }
+            previous_hashes = store.get_many(
+                GEOMETRY_WRITTEN_NAMESPACE,
+                [f"{written_prefix}:{record_id}" for record_id in geo_hashes],
+            )
 
-            normalized_updates = []
+            # Géométrie identique à la dernière écriture : ne pas la renvoyer
+            update_groups = {"full": [], "without_geometry": []}
             for record in data["to_update"]:
-                normalized_fields = {}
-                for key in all_keys:
-                    normalized_fields[key] = record["fields"].get(key, None)
-                normalized_updates.append({
-                    "id": record["id"],
-                    "fields": normalized_fields
-                })
+                if (
+                    record["id"] in geo_hashes
+                    and previous_hashes.get(f"{written_prefix}:{record['id']}") == geo_hashes[record["id"]]
+                ):
+                    fields = {
+                        key: value
+                        for key, value in record["fields"].items()
+                        if key not in GEOMETRY_FIELDS
+                    }
+                    update_groups["without_geometry"].append({"id": record["id"], "fields": fields})
+                else:
+                    update_groups["full"].append(record)
 
-            # Traiter par lots
-            for i in range(0, len(normalized_updates), batch_size):
-                batch = normalized_updates[i:i+batch_size]
+            if update_groups["without_geometry"]:
+                log_verbose(f"  {len(update_groups['without_geometry'])} géométries inchangées non réécrites")
 
-                update_payload = {"records": batch}
-                url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_id}/records"
-                response = requests.patch(
-                    url,
-                    headers=client.headers,
-                    json=update_payload
-                )
+            for updates in update_groups.values():
+                if not updates:
+                    continue
 
-                if response.status_code in [200, 201]:
-                    total_success += len(batch)
-                else:
-                    log_error(f"Erreur MAJ lot: {response.status_code}")
-                    # Fallback individuel
-                    for individual in batch:
-                        individual_payload = {"records": [individual]}
-                        individual_response = requests.patch(
-                            url,
-                            headers=client.headers,
-                            json=individual_payload
-                        )
+                # Normaliser tous les enregistrements
+                all_keys = set()
+                for record in updates:
+                    all_keys.update(record["fields"].keys())
+
+                normalized_updates = []
+                for record in updates:
+                    normalized_fields = {}
+                    for key in all_keys:
+                        normalized_fields[key] = record["fields"].get(key, None)
+                    normalized_updates.append({
+                        "id": record["id"],
+                        "fields": normalized_fields
+                    })
+
+                # Traiter par lots
+                for i in range(0, len(normalized_updates), batch_size):
+                    batch = normalized_updates[i:i+batch_size]
+
+                    update_payload = {"records": batch}
+                    url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_id}/records"
+                    response = requests.patch(
+                        url,
+                        headers=client.headers,
+                        json=update_payload
+                    )
+
+                    if response.status_code in [200, 201]:
+                        total_success += len(batch)
+                        updated = batch
+                    else:
+                        log_error(f"Erreur MAJ lot: {response.status_code}")
+                        updated = []
+                        # Fallback individuel
+                        for individual in batch:
+                            individual_payload = {"records": [individual]}
+                            individual_response = requests.patch(
+                                url,
+                                headers=client.headers,
+                                json=individual_payload
+                            )
+
+                            if individual_response.status_code in [200, 201]:
+                                total_success += 1
+                                updated.append(individual)
+                            else:
+                                total_errors += 1
 
-                        if individual_response.status_code in [200, 201]:
-                            total_success += 1
-                        else:
-                            total_errors += 1
+                    for record in updated:
+                        if record["id"] in geo_hashes:
+                            written_hashes[f"{written_prefix}:{record['id']}"] = geo_hashes[record["id"]]
 
         # Traiter les créations par lot
         if data["to_create"]:
             for i in range(0, len(data["to_create"]), batch_size):
                 batch = data["to_create"][i:i+batch_size]
 
-                create_payload = {"records": batch}
+                create_payload = {"records": [{"fields": record["fields"]} for record in batch]}
                 url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_id}/records"
                 response = requests.post(
                     url,
@@ -1573,27 +1774,36 @@ def process_repetables_batch(
                     json=create_payload
                 )
 
-                if response.status_code in [200, 201]:
-                    total_success += len(batch)
-                else:
+                if response.status_code not in [200, 201]:
                     # AUTO-FIX pour colonnes manquantes
                     if (
                         response.status_code == 400
                         and "Invalid column" in response.text
                     ):
                         log("[AUTO-FIX] Correction colonnes manquantes...")
-                        success, _ = auto_fix_missing_columns_optimized(
+                        success, response = auto_fix_missing_columns_optimized(
                             client,
                             table_id,
                             create_payload
                         )
-
-                        if success:
-                            total_success += len(batch)
-                        else:
+                        if not success:
                             total_errors += len(batch)
+                            continue
                     else:
                         total_errors += len(batch)
+                        continue
+
+                total_success += len(batch)
+
+                # Indexer les lignes créées pour les lots suivants
+                created = response.json().get("records", [])
+                for record, created_record in zip(batch, created):
+                    if created_record.get("id"):
+                        data["existing_rows"].add(created_record["id"], record["fields"])
+                        if record.get("geo_hash"):
+                            written_hashes[f"{written_prefix}:{created_record['id']}"] = record["geo_hash"]
+
+        store.set_many(GEOMETRY_WRITTEN_NAMESPACE, written_hashes)
 
     return total_success, total_errors
 
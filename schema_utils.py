@@ -1030,6 +1030,9 @@ def update_grist_tables_from_schema(
 
                 if add_response.status_code == 200:
                     log("Colonnes ajoutées avec succès")
+                    client.record_created_columns(
+                        table_id, [col["id"] for col in missing_columns]
+                    )
                 else:
                     log_error(
                         f"Erreur lors de l'ajout des colonnes: {add_response.status_code}"
@@ -1206,6 +1209,11 @@ def update_grist_tables_from_schema(
                 "type": "Bool",
                 "fields": {"type": "Bool", "isFormula": False, "formula": ""},
             },
+            # Point de reprise d'une sync interrompue
+            {"id": "checkpoint_key", "type": "Text"},
+            {"id": "checkpoint_page_cursor", "type": "Text"},
+            {"id": "checkpoint_last_dossier", "type": "Int"},
+            {"id": "checkpoint_at", "type": "Text"},
         ]
 
         # Recharger la liste des tables pour les inclure celles créées pendant cette exécution
@@ -1236,6 +1244,11 @@ def update_grist_tables_from_schema(
                 "type": "Bool",
                 "fields": {"type": "Bool", "isFormula": False, "formula": ""},
             },
+            # Point de reprise d'une sync interrompue
+            {"id": "checkpoint_key", "type": "Text"},
+            {"id": "checkpoint_page_cursor", "type": "Text"},
+            {"id": "checkpoint_last_dossier", "type": "Int"},
+            {"id": "checkpoint_at", "type": "Text"},
         ]
 
         # Recharger la liste des tables pour les inclure celles créées pendant cette exécution
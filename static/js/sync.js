@@ -136,6 +136,13 @@ const updateTaskProgress = (task) => {
   document.getElementById('progress_percentage').textContent = `${progress}%`
   document.getElementById('sync-progress-text').textContent = `${task.message}`
 
+  // Compteurs structurés envoyés par le serveur, plus fiables que les logs
+  if (task.stats) {
+    successCount = task.stats.success_count
+    errorCount = task.stats.error_count
+    document.getElementById('processed_count').textContent = successCount
+  }
+
   // Mettre à jour le temps écoulé
   if (startTime) {
     const elapsed = (Date.now() - startTime) / 1000
@@ -175,8 +182,11 @@ const updateTaskProgress = (task) => {
   }
 
   // Ajouter les nouveaux logs
-  if (task.logs && task.logs.length > logsCount) {
-    const newLogs = task.logs.slice(logsCount)
+  // logs_offset : lignes les plus anciennes, retirées de task.logs côté serveur
+  const logsOffset = task.logs_offset || 0
+  const totalLogs = logsOffset + (task.logs ? task.logs.length : 0)
+  if (task.logs && totalLogs > logsCount) {
+    const newLogs = task.logs.slice(Math.max(0, logsCount - logsOffset))
     const logsContent = document.getElementById('logs_content')
 
     newLogs.forEach((log) => {
@@ -196,11 +206,11 @@ const updateTaskProgress = (task) => {
         [${logTime}]</div><div style="margin-bottom: 0.5rem; ${logStyle}">${escapeHtml(message)}
       </div>`
 
-      // Extraire les statistiques depuis les logs
-      updateStatsFromLog(message)
+      // Extraire les statistiques depuis les logs (à défaut de compteurs structurés)
+      if (!task.stats) updateStatsFromLog(message)
     })
 
-    logsCount = task.logs.length
+    logsCount = totalLogs
     document.getElementById('logs_count').textContent = logsCount
 
     // Afficher le bouton de copie si des logs existent
@@ -0,0 +1,200 @@
+"""
+Rétention de l'historique des synchronisations (sync_logs).
+
+Chaque nuit, les journées terminées sont agrégées par configuration dans
+sync_log_daily_summaries (exécutions, succès, erreurs, durée moyenne et p95,
+dossiers synchronisés), puis les lignes brutes plus anciennes que
+SYNC_LOGS_RETENTION_DAYS sont supprimées. Seules les journées déjà agrégées
+sont purgées : agrégation et purge sont validées dans la même transaction.
+"""
+
+import logging
+import os
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.engine import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Nombre de jours de lignes brutes conservées dans sync_logs
+SYNC_LOGS_RETENTION_DAYS = int(os.getenv("SYNC_LOGS_RETENTION_DAYS", "90"))
+# Heure (UTC) de l'agrégation et de la purge quotidiennes
+SYNC_LOGS_ROLLUP_HOUR = int(os.getenv("SYNC_LOGS_ROLLUP_HOUR", "3"))
+SYNC_LOGS_ROLLUP_MINUTE = int(os.getenv("SYNC_LOGS_ROLLUP_MINUTE", "0"))
+
+SUMMARY_COLUMNS = (
+    "day",
+    "otp_config_id",
+    "grist_doc_id",
+    "grist_user_id",
+    "demarche_number",
+    "runs",
+    "successes",
+    "errors",
+    "mean_duration",
+    "p95_duration",
+    "dossiers_synced",
+    "dossiers_errors",
+)
+
+# Agrégation journalière des lignes brutes, par configuration et document
+DAILY_SELECT = """
+    SELECT
+        CAST(timestamp AS DATE) AS day,
+        otp_config_id,
+        grist_doc_id,
+        MAX(grist_user_id) AS grist_user_id,
+        MAX(demarche_number) AS demarche_number,
+        COUNT(*) AS runs,
+        COUNT(*) FILTER (WHERE status = 'success') AS successes,
+        COUNT(*) FILTER (WHERE status IS DISTINCT FROM 'success') AS errors,
+        AVG(duration) AS mean_duration,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY duration) AS p95_duration,
+        COALESCE(SUM(success_count), 0) AS dossiers_synced,
+        COALESCE(SUM(error_count), 0) AS dossiers_errors
+    FROM sync_logs
+    WHERE timestamp >= :start AND timestamp < :end {extra_filter}
+    GROUP BY CAST(timestamp AS DATE), otp_config_id, grist_doc_id
+"""
+
+
+def _day_start(day: date) -> datetime:
+    """Début (UTC, sans fuseau comme sync_logs.timestamp) d'une journée"""
+    return datetime.combine(day, time.min)
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def get_rolled_up_until(db: Session) -> date | None:
+    """Premier jour non encore agrégé, ou None si aucun agrégat n'existe"""
+    last_day = db.execute(
+        text("SELECT MAX(day) FROM sync_log_daily_summaries")
+    ).scalar()
+    return last_day + timedelta(days=1) if last_day else None
+
+
+def rollup_sync_logs(db: Session, until: date) -> int:
+    """
+    Agrège les journées terminées (strictement avant until) pas encore agrégées.
+
+    Returns:
+        int: Nombre de lignes d'agrégat créées
+    """
+    start = get_rolled_up_until(db)
+    if start is None:
+        start = db.execute(
+            text("SELECT MIN(CAST(timestamp AS DATE)) FROM sync_logs")
+        ).scalar()
+    if start is None or start >= until:
+        return 0
+
+    columns = ", ".join(SUMMARY_COLUMNS)
+    result = db.execute(
+        text(
+            f"INSERT INTO sync_log_daily_summaries ({columns}) "
+            f"SELECT {columns} FROM ({DAILY_SELECT.format(extra_filter='')}) AS daily"
+        ),
+        {"start": _day_start(start), "end": _day_start(until)},
+    )
+    return result.rowcount
+
+
+def prune_sync_logs(db: Session, before: date) -> int:
+    """
+    Supprime les lignes brutes antérieures à before, sans jamais dépasser
+    la dernière journée agrégée.
+
+    Returns:
+        int: Nombre de lignes supprimées
+    """
+    rolled_up_until = get_rolled_up_until(db)
+    if rolled_up_until is None:
+        return 0
+
+    cutoff = min(before, rolled_up_until)
+    result = db.execute(
+        text("DELETE FROM sync_logs WHERE timestamp < :cutoff"),
+        {"cutoff": _day_start(cutoff)},
+    )
+    return result.rowcount
+
+
+def run_sync_logs_retention() -> None:
+    """
+    Job APScheduler : agrège les journées terminées puis purge les lignes
+    brutes au-delà de la fenêtre de rétention.
+    """
+    today = _today()
+    db = SessionLocal()
+
+    try:
+        summaries = rollup_sync_logs(db, until=today)
+        pruned = prune_sync_logs(
+            db, before=today - timedelta(days=SYNC_LOGS_RETENTION_DAYS)
+        )
+        db.commit()
+        logger.info(
+            f"Historique des synchronisations : {summaries} agrégat(s) journalier(s) "
+            f"créé(s), {pruned} ligne(s) brute(s) supprimée(s)"
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erreur lors de l'agrégation des sync_logs: {str(e)}")
+    finally:
+        db.close()
+
+
+def get_daily_summaries(
+    db: Session, days: int, otp_config_id: int | None = None
+) -> list[dict]:
+    """
+    Agrégats journaliers des days derniers jours (aujourd'hui inclus).
+
+    Les journées déjà agrégées sont lues dans sync_log_daily_summaries ;
+    les suivantes (dont aujourd'hui) sont calculées depuis sync_logs.
+    """
+    today = _today()
+    start = today - timedelta(days=days - 1)
+    end = today + timedelta(days=1)
+    rolled_up_until = get_rolled_up_until(db)
+
+    params = {}
+    extra_filter = ""
+    if otp_config_id is not None:
+        params["otp_config_id"] = otp_config_id
+        extra_filter = "AND otp_config_id = :otp_config_id"
+
+    rows = []
+    if rolled_up_until is not None and start < rolled_up_until:
+        rows.extend(
+            db.execute(
+                text(
+                    f"SELECT {', '.join(SUMMARY_COLUMNS)} "
+                    f"FROM sync_log_daily_summaries "
+                    f"WHERE day >= :start AND day < :end {extra_filter}"
+                ),
+                {**params, "start": start, "end": rolled_up_until},
+            ).all()
+        )
+        start = rolled_up_until
+
+    rows.extend(
+        db.execute(
+            text(DAILY_SELECT.format(extra_filter=extra_filter)),
+            {**params, "start": _day_start(start), "end": _day_start(end)},
+        ).all()
+    )
+
+    summaries = []
+    for row in rows:
+        summary = dict(zip(SUMMARY_COLUMNS, row))
+        summary["day"] = summary["day"].isoformat()
+        summaries.append(summary)
+
+    summaries.sort(key=lambda s: (s["day"], s["otp_config_id"] or 0))
+    return summaries
@@ -0,0 +1,181 @@
+"""
+Métriques des synchronisations exposées par /metrics (format texte Prometheus).
+
+record_sync() est appelé par SyncManager à la fin de chaque synchronisation,
+avec le bilan et les événements structurés du script (voir utils/events.py) :
+requêtes HTTP par service (http_stats) et lignes écrites par table (rows).
+L'état de la file des synchronisations planifiées est lu à chaque rendu.
+
+Les valeurs sont propres au processus web : elles repartent de zéro
+à chaque redémarrage, comme tout compteur Prometheus.
+"""
+
+from typing import Any, Iterable
+
+from utils.metrics import Counter, Gauge, Histogram, Registry
+
+SYNC_LABELS = ("otp_config_id", "demarche")
+
+registry = Registry()
+
+sync_runs = registry.register(
+    Counter(
+        "otp_sync_runs_total",
+        "Synchronisations terminées, par statut",
+        (*SYNC_LABELS, "status", "auto"),
+    )
+)
+sync_last_duration = registry.register(
+    Gauge(
+        "otp_sync_last_duration_seconds",
+        "Durée de la dernière synchronisation",
+        SYNC_LABELS,
+    )
+)
+sync_dossiers_per_second = registry.register(
+    Gauge(
+        "otp_sync_dossiers_per_second",
+        "Débit de la dernière synchronisation (dossiers traités par seconde)",
+        SYNC_LABELS,
+    )
+)
+sync_dossiers = registry.register(
+    Counter(
+        "otp_sync_dossiers_total",
+        "Dossiers traités, par résultat",
+        (*SYNC_LABELS, "result"),
+    )
+)
+http_requests = registry.register(
+    Counter(
+        "otp_http_requests_total",
+        "Requêtes HTTP envoyées par le script de synchronisation",
+        (*SYNC_LABELS, "service"),
+    )
+)
+http_duration = registry.register(
+    Histogram(
+        "otp_http_request_duration_seconds",
+        "Durée des requêtes HTTP du script de synchronisation",
+        (*SYNC_LABELS, "service"),
+    )
+)
+http_retries = registry.register(
+    Counter(
+        "otp_http_retries_total",
+        "Nouvelles tentatives des requêtes HTTP",
+        (*SYNC_LABELS, "service"),
+    )
+)
+grist_rows = registry.register(
+    Counter(
+        "otp_grist_rows_total",
+        "Lignes écrites dans Grist, par table et opération",
+        (*SYNC_LABELS, "table", "operation"),
+    )
+)
+queue_pending = registry.register(
+    Gauge(
+        "otp_sync_queue_pending",
+        "Synchronisations planifiées en attente dans la file",
+    )
+)
+queue_running = registry.register(
+    Gauge(
+        "otp_sync_queue_running",
+        "Synchronisations planifiées en cours d'exécution",
+    )
+)
+queue_max_concurrency = registry.register(
+    Gauge(
+        "otp_sync_queue_max_concurrency",
+        "Nombre maximal de synchronisations planifiées simultanées",
+    )
+)
+queue_utilisation = registry.register(
+    Gauge(
+        "otp_sync_queue_utilisation_ratio",
+        "Occupation des emplacements de la file (en cours / maximum)",
+    )
+)
+tasks_running = registry.register(
+    Gauge(
+        "otp_sync_tasks_running",
+        "Tâches de synchronisation en cours (manuelles et planifiées)",
+    )
+)
+
+ROW_OPERATIONS = ("created", "updated", "failed", "skipped")
+
+
+def _sync_labels(config: dict[str, Any]) -> dict[str, str]:
+    return {
+        "otp_config_id": config.get("otp_config_id") or "",
+        "demarche": config.get("demarche_number") or "",
+    }
+
+
+def record_sync(
+    config: dict[str, Any],
+    result: dict[str, Any],
+    duration: float,
+    events: Iterable[dict[str, Any]] = (),
+    auto: bool = False,
+) -> None:
+    """Enregistre le bilan d'une synchronisation terminée"""
+    labels = _sync_labels(config)
+    success_count = result.get("success_count", 0) or 0
+    error_count = result.get("error_count", 0) or 0
+
+    sync_runs.inc(
+        status="success" if result.get("success") else "error",
+        auto=str(bool(auto)).lower(),
+        **labels,
+    )
+    sync_last_duration.set(round(duration, 3), **labels)
+    sync_dossiers_per_second.set(
+        round((success_count + error_count) / duration, 3) if duration > 0 else 0,
+        **labels,
+    )
+    sync_dossiers.inc(success_count, result="success", **labels)
+    sync_dossiers.inc(error_count, result="error", **labels)
+
+    for event in events:
+        if event.get("type") == "http_stats":
+            for service, stats in (event.get("services") or {}).items():
+                http_requests.inc(stats.get("count", 0), service=service, **labels)
+                http_retries.inc(stats.get("retries", 0), service=service, **labels)
+                http_duration.merge(
+                    stats.get("buckets") or [],
+                    stats.get("sum", 0.0),
+                    service=service,
+                    **labels,
+                )
+        elif event.get("type") == "rows":
+            for operation in ROW_OPERATIONS:
+                if event.get(operation):
+                    grist_rows.inc(
+                        event[operation],
+                        table=event.get("table", ""),
+                        operation=operation,
+                        **labels,
+                    )
+
+
+def render_metrics(sync_queue=None, sync_manager=None) -> str:
+    """Texte exposé par /metrics, avec l'état courant de la file et des tâches"""
+    if sync_queue is not None:
+        pending = len(sync_queue.pending())
+        running = len(sync_queue.running())
+        queue_pending.set(pending)
+        queue_running.set(running)
+        queue_max_concurrency.set(sync_queue.max_concurrency)
+        queue_utilisation.set(round(running / sync_queue.max_concurrency, 3))
+    else:
+        queue_pending.set(0)
+        queue_running.set(0)
+
+    if sync_manager is not None:
+        tasks_running.set(sync_manager.count_running_tasks())
+
+    return registry.render()
@@ -4,21 +4,27 @@ Contient le scheduler APScheduler et les jobs de synchronisation automatique.
 """
 
 import os
+import threading
 from dotenv import load_dotenv
 import logging
 from datetime import datetime, timezone, timedelta
+from urllib.parse import urlparse
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.executors.pool import ThreadPoolExecutor
 from zoneinfo import ZoneInfo
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-
-from database.models import OtpConfiguration, UserSchedule
+from database.engine import SessionLocal
+from database.models import OtpConfiguration, SyncLog, UserSchedule
 from configuration.config_manager import ConfigManager
+from sync.log_retention import (
+    SYNC_LOGS_ROLLUP_HOUR,
+    SYNC_LOGS_ROLLUP_MINUTE,
+    run_sync_logs_retention,
+)
 from sync.sync_manager import SyncManager
-from utils.constants import EXIT_CODE_EXTERNAL_API_ERROR
+from sync.sync_queue import SyncQueue
+from utils.constants import DEMARCHES_API_URL, EXIT_CODE_EXTERNAL_API_ERROR
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +35,11 @@ from utils.constants import DATABASE_URL
 SYNC_HOUR = int(os.getenv("SYNC_HOUR", "0"))
 SYNC_MINUTE = int(os.getenv("SYNC_MINUTE", "0"))
 SYNC_TZ = os.getenv("SYNC_TZ", "Europe/Paris")
+# File des synchronisations planifiées : concurrence globale
+# et budgets de démarrages par minute (API DS partagée, chaque hôte Grist)
+SYNC_MAX_CONCURRENCY = int(os.getenv("SYNC_MAX_CONCURRENCY", "4"))
+SYNC_DS_STARTS_PER_MINUTE = float(os.getenv("SYNC_DS_STARTS_PER_MINUTE", "6"))
+SYNC_GRIST_STARTS_PER_MINUTE = float(os.getenv("SYNC_GRIST_STARTS_PER_MINUTE", "4"))
 
 scheduler = BackgroundScheduler(
     executors={"default": ThreadPoolExecutor(max_workers=2)}
@@ -36,6 +47,11 @@ scheduler = BackgroundScheduler(
 
 config_manager = ConfigManager(DATABASE_URL)
 
+sync_queue: SyncQueue | None = None
+
+# Sérialise les rechargements (routes Flask concurrentes)
+_reload_lock = threading.Lock()
+
 
 def scheduled_sync_job(otp_config_id: int, sync_manager: SyncManager) -> None:
     """
@@ -46,7 +62,7 @@ def scheduled_sync_job(otp_config_id: int, sync_manager: SyncManager) -> None:
     - Fréquence :
       - Quotidienne, à l'heure configurée (SYNC_HOUR:SYNC_MINUTE)
         dans la timezone SYNC_TZ (défaut Europe/Paris),
-        ou décalée de 5 mn pour chaque config supplémentaire
+        via la file des synchronisations (voir enqueue_scheduled_sync)
       - Au démarrage de l'app
       - Lors de l'activation/désactivation d'un planning via les endpoints API
     - Condition : Uniquement pour les synchronisations activées
@@ -64,8 +80,6 @@ def scheduled_sync_job(otp_config_id: int, sync_manager: SyncManager) -> None:
         f"Scheduler running: {scheduler.running}, jobs count: {len(scheduler.get_jobs())}"
     )
 
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db = SessionLocal()
 
     try:
@@ -143,70 +157,198 @@ def scheduled_sync_job(otp_config_id: int, sync_manager: SyncManager) -> None:
         db.close()
 
 
-def reload_scheduler_jobs(sync_manager: SyncManager) -> None:
+def get_sync_queue(sync_manager: SyncManager) -> SyncQueue:
+    """Retourne la file des synchronisations planifiées, créée au premier appel"""
+    global sync_queue
+
+    if sync_queue is None:
+        sync_queue = SyncQueue(
+            run_sync=lambda otp_config_id: scheduled_sync_job(
+                otp_config_id, sync_manager
+            ),
+            max_concurrency=SYNC_MAX_CONCURRENCY,
+            ds_starts_per_minute=SYNC_DS_STARTS_PER_MINUTE,
+            grist_starts_per_minute=SYNC_GRIST_STARTS_PER_MINUTE,
+        )
+
+    return sync_queue
+
+
+def get_host(url: str | None) -> str:
+    """Hôte d'une URL, utilisé comme clé de budget"""
+    return urlparse(url or "").netloc.lower()
+
+
+def enqueue_scheduled_sync(otp_config_id: int, sync_manager: SyncManager) -> None:
     """
-    Recharge tous les jobs actifs du scheduler selon les plannings activés.
-    Exécutée au démarrage et après activation/désactivation de plannings,
-    pour éviter des jobs persistant pour des configs modifiées ou supprimées
+    Job APScheduler : place la synchronisation d'une configuration
+    dans la file des synchronisations planifiées.
+    Le coût estimé est la durée de la dernière synchronisation de la configuration ;
+    une configuration sans historique passe en premier, ce qui fournit
+    rapidement une estimation pour les nuits suivantes.
     """
-    logger.info("Rechargement des jobs du scheduler...")
+    db = SessionLocal()
 
     try:
-        scheduler.remove_all_jobs()
+        otp_config = db.query(OtpConfiguration).filter_by(id=otp_config_id).first()
 
-        engine = create_engine(DATABASE_URL)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        db = SessionLocal()
-        tz = ZoneInfo(SYNC_TZ) if SYNC_TZ != "UTC" else None
+        if not otp_config:
+            logger.error(f"Configuration OTP non trouvée: {otp_config_id}")
+            return
 
-        try:
-            active_schedules = (
-                db.query(UserSchedule)
-                .filter_by(enabled=True)
-                .filter(UserSchedule.otp_config_id.isnot(None))
-                .all()
-            )
+        last_duration = (
+            db.query(SyncLog.duration)
+            .filter(SyncLog.otp_config_id == otp_config_id)
+            .filter(SyncLog.duration.isnot(None))
+            .order_by(SyncLog.timestamp.desc())
+            .limit(1)
+            .scalar()
+        )
+        grist_host = get_host(otp_config.grist_base_url)
+    finally:
+        db.close()
 
-            sorted_schedules = sorted(active_schedules, key=lambda s: s.otp_config_id)
+    cost = float(last_duration) if last_duration is not None else 0.0
 
-            for i, schedule in enumerate(sorted_schedules):
-                otp_config = (
-                    db.query(OtpConfiguration)
-                    .filter_by(id=schedule.otp_config_id)
-                    .first()
-                )
-                if not otp_config:
-                    logger.warning(
-                        f"Configuration manquante pour schedule {schedule.id}, skipping"
-                    )
-                    continue
+    if get_sync_queue(sync_manager).submit(
+        otp_config_id,
+        cost=cost,
+        ds_host=get_host(DEMARCHES_API_URL),
+        grist_host=grist_host,
+    ):
+        logger.info(
+            f"Synchronisation en file pour config {otp_config_id} "
+            f"(coût estimé {cost:.0f}s, hôte Grist {grist_host})"
+        )
 
-                total_offset = SYNC_MINUTE + i * 5
-                minute = total_offset % 60
-                hour_offset = total_offset // 60
-                hour = (SYNC_HOUR + hour_offset) % 24
+
+def add_sync_logs_retention_job() -> None:
+    """
+    Job quotidien d'agrégation et de purge de l'historique des synchronisations,
+    à SYNC_LOGS_ROLLUP_HOUR:SYNC_LOGS_ROLLUP_MINUTE (UTC)
+    """
+    scheduler.add_job(
+        func=run_sync_logs_retention,
+        trigger=CronTrigger(
+            hour=SYNC_LOGS_ROLLUP_HOUR,
+            minute=SYNC_LOGS_ROLLUP_MINUTE,
+            timezone=timezone.utc,
+        ),
+        id="sync_logs_retention",
+        name="Agrégation et purge des sync_logs",
+        replace_existing=True,
+        max_instances=1,
+    )
+
+
+def load_active_schedules(db) -> list:
+    """
+    Plannings activés et leur configuration, en une requête :
+    lignes (schedule_id, otp_config_id, demarche_number, grist_doc_id)
+    triées par configuration. Les plannings sans configuration sont exclus.
+    """
+    return (
+        db.query(
+            UserSchedule.id.label("schedule_id"),
+            UserSchedule.otp_config_id,
+            OtpConfiguration.demarche_number,
+            OtpConfiguration.grist_doc_id,
+        )
+        .join(OtpConfiguration, OtpConfiguration.id == UserSchedule.otp_config_id)
+        .filter(UserSchedule.enabled.is_(True))
+        .order_by(UserSchedule.otp_config_id)
+        .all()
+    )
+
+
+def _job_signature(trigger, args) -> tuple:
+    """Éléments d'un job dont le changement impose de le recréer"""
+    return str(trigger), str(getattr(trigger, "timezone", None)), tuple(args)
+
+
+def reload_scheduler_jobs(sync_manager: SyncManager) -> None:
+    """
+    Recharge les jobs du scheduler selon les plannings activés.
+    Exécutée au démarrage et après activation/désactivation de plannings,
+    pour éviter des jobs persistant pour des configs modifiées ou supprimées.
+    Tous les jobs se déclenchent à SYNC_HOUR:SYNC_MINUTE et alimentent
+    la file des synchronisations, qui gère concurrence, budgets et ordre.
+    Seuls les jobs ajoutés, supprimés ou modifiés sont touchés ; le job
+    de rétention des sync_logs est créé s'il est absent.
+    """
+    logger.info("Rechargement des jobs du scheduler...")
+
+    try:
+        with _reload_lock:
+            if scheduler.get_job("sync_logs_retention") is None:
+                add_sync_logs_retention_job()
+
+            tz = ZoneInfo(SYNC_TZ) if SYNC_TZ != "UTC" else None
+            hour, minute = SYNC_HOUR, SYNC_MINUTE
+
+            db = SessionLocal()
+            try:
+                active_schedules = load_active_schedules(db)
+            finally:
+                db.close()
+
+            current_jobs = {
+                job.id: job
+                for job in scheduler.get_jobs()
+                if job.id.startswith("scheduled_sync_")
+            }
+            desired_job_ids = set()
+            added = changed = 0
+
+            for schedule in active_schedules:
                 job_id = f"scheduled_sync_{schedule.otp_config_id}"
+                desired_job_ids.add(job_id)
+
+                trigger = CronTrigger(hour=hour, minute=minute, timezone=tz)
+                args = [schedule.otp_config_id, sync_manager]
+                current = current_jobs.get(job_id)
+
+                if current is not None and _job_signature(
+                    current.trigger, current.args
+                ) == _job_signature(trigger, args):
+                    continue
 
                 scheduler.add_job(
-                    func=scheduled_sync_job,
-                    trigger=CronTrigger(hour=hour, minute=minute, timezone=tz),
-                    args=[schedule.otp_config_id, sync_manager],
+                    func=enqueue_scheduled_sync,
+                    trigger=trigger,
+                    args=args,
                     id=job_id,
                     name=f"Sync planifiée pour config {schedule.otp_config_id}",
                     replace_existing=True,
                     max_instances=1,
+                    # Tous les jobs partent à la même minute sur 2 workers :
+                    # un démarrage en retard ne doit pas être abandonné
+                    misfire_grace_time=None,
+                    coalesce=True,
                 )
 
+                if current is None:
+                    added += 1
+                    action = "ajouté"
+                else:
+                    changed += 1
+                    action = "modifié"
+
                 logger.info(
-                    f"Job ajouté pour schedule {schedule.id} "
-                    f"(config {schedule.otp_config_id}, démarche {otp_config.demarche_number}) "
-                    f"à {hour:02d}:{minute:02d} (document {otp_config.grist_doc_id})"
+                    f"Job {action} pour schedule {schedule.schedule_id} "
+                    f"(config {schedule.otp_config_id}, démarche {schedule.demarche_number}) "
+                    f"à {hour:02d}:{minute:02d} (document {schedule.grist_doc_id})"
                 )
 
-        finally:
-            db.close()
+            removed = current_jobs.keys() - desired_job_ids
+            for job_id in removed:
+                scheduler.remove_job(job_id)
+                logger.info(f"Job supprimé: {job_id}")
 
-        logger.info(f"Scheduler rechargé avec {len(scheduler.get_jobs())} jobs actifs")
+        logger.info(
+            f"Scheduler rechargé avec {len(scheduler.get_jobs())} jobs actifs "
+            f"({added} ajoutés, {changed} modifiés, {len(removed)} supprimés)"
+        )
 
     except Exception as e:
         logger.error(f"Erreur lors du rechargement des jobs scheduler: {str(e)}")
@@ -1,3 +1,6 @@
+import gzip
+import json
+import tempfile
 import time
 import threading
 import os
@@ -7,18 +10,39 @@ import sys
 import traceback
 from typing import Callable, Any
 from datetime import datetime, timezone
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sync.sync_result_parser import parse_output
+from sync.sync_result_parser import parse_events, parse_output
 from sync.environment_config import build_environment
 from sync.error_parser import extract_error_parts
+from sync.metrics import record_sync
+from database.engine import SessionLocal
 from database.models import SyncLog
 from configuration.config_manager import ConfigManager
+from utils.events import EVENTS_FD_ENV, read_events, read_fd_lines
 
 load_dotenv()
 
 from utils.constants import DATABASE_URL
 
+# Nombre maximal de lignes de log gardées en mémoire par tâche ;
+# les plus anciennes sont déplacées dans un fichier compressé
+SYNC_TASK_LOG_LINES = int(os.getenv("SYNC_TASK_LOG_LINES", "1000"))
+# Tâches terminées conservées : au plus SYNC_TASKS_MAX_FINISHED,
+# et au plus SYNC_TASK_TTL secondes après leur fin
+SYNC_TASKS_MAX_FINISHED = int(os.getenv("SYNC_TASKS_MAX_FINISHED", "50"))
+SYNC_TASK_TTL = int(os.getenv("SYNC_TASK_TTL", "3600"))
+# Répertoire des logs déplacés hors mémoire
+SYNC_TASK_LOGS_DIR = os.getenv(
+    "SYNC_TASK_LOGS_DIR",
+    os.path.join(tempfile.gettempdir(), "otp_ds_to_grist_task_logs"),
+)
+# Script de synchronisation exécuté dans un sous-processus
+SYNC_SCRIPT_PATH = os.path.join(
+    os.path.dirname(__file__), "../grist_processor_working_all.py"
+)
+# Intervalle (secondes) de regroupement des mises à jour envoyées au navigateur
+# (0 = envoi immédiat de chaque mise à jour)
+SYNC_TASK_EMIT_INTERVAL = float(os.getenv("SYNC_TASK_EMIT_INTERVAL", "0.2"))
+
 
 class SyncManager:
     """
@@ -26,10 +50,22 @@ class SyncManager:
     pour les mises à jour en temps réel
     """
 
-    def __init__(self, notify_callback: Callable[..., Any] | None = None):
+    def __init__(
+        self,
+        notify_callback: Callable[..., Any] | None = None,
+        emit_interval: float = SYNC_TASK_EMIT_INTERVAL,
+    ):
         self.tasks = {}
         self.task_counter = 0
         self.notify_callback = notify_callback
+        self.emit_interval = emit_interval
+        self._tasks_lock = threading.Lock()
+        # Mises à jour en attente d'envoi, et index du prochain log à envoyer
+        self._pending_updates: set[str] = set()
+        self._emitted_logs: dict[str, int] = {}
+        self._flush_timer: threading.Timer | None = None
+        self._pending_lock = threading.Lock()
+        self._emit_lock = threading.Lock()
 
     def notify(self, event_type: str, data: dict[str, Any]) -> None:
         """Méthode publique pour les notifications"""
@@ -46,12 +82,17 @@ class SyncManager:
         progress_callback: Callable[[float, str], None] | None = None,
         log_callback: Callable[[str], None] | None = None,
         auto: bool = False,
+        event_callback: Callable[[dict[str, Any]], None] | None = None,
     ) -> dict[str, Any]:
         """
-        Exécute la synchronisation avec callbacks pour le suivi en temps réel
+        Exécute la synchronisation avec callbacks pour le suivi en temps réel.
+        Progression et bilan arrivent par le canal d'événements structurés
+        (voir utils/events.py) ; event_callback reçoit chacun de ces événements.
         """
 
         output_lines = []
+        events = []
+        started_at = time.monotonic()
 
         # Pré-définition en cas d'erreur
         result = {"success": False, "message": "", "success_count": 0, "error_count": 0}
@@ -66,9 +107,6 @@ class SyncManager:
             if progress_callback:
                 progress_callback(10, "Configuration des variables d'environnement...")
 
-            # Appliquer les variables d'environnement pour ce thread
-            os.environ.update(env_copy)
-
             if progress_callback:
                 progress_callback(
                     15, "Chargement des données depuis Démarches Simplifiées..."
@@ -109,29 +147,42 @@ class SyncManager:
             if progress_callback:
                 progress_callback(20, "Configuration des variables d'environnement...")
 
-            # Appliquer les variables d'environnement pour ce thread
-            os.environ.update(env_copy)
-
             if progress_callback:
                 progress_callback(25, "Lancement du script de synchronisation...")
 
             # Lancer le script de synchronisation principal
-            script_path = os.path.join(
-                os.path.dirname(__file__), "../grist_processor_working_all.py"
-            )
+            script_path = SYNC_SCRIPT_PATH
 
             if log_callback:
                 log_callback(f"Lancement du script: {script_path}")
 
+            # Canal d'événements structurés : pipe dédié, hérité par le script
+            events_read_fd, events_write_fd = os.pipe()
+            env_copy[EVENTS_FD_ENV] = str(events_write_fd)
+
             # Exécuter le script de synchronisation
-            process = subprocess.Popen(
-                [sys.executable, script_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=env_copy,
-                cwd=os.path.dirname(__file__),
+            try:
+                process = subprocess.Popen(
+                    [sys.executable, script_path],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    env=env_copy,
+                    cwd=os.path.dirname(__file__),
+                    pass_fds=(events_write_fd,),
+                )
+            except Exception:
+                os.close(events_read_fd)
+                raise
+            finally:
+                os.close(events_write_fd)
+
+            events_reader = threading.Thread(
+                target=self._read_events,
+                args=(events_read_fd, events, progress_callback, event_callback),
+                daemon=True,
             )
+            events_reader.start()
 
             for line in iter(process.stdout.readline, ""):
                 if not line.strip():
@@ -157,6 +208,7 @@ class SyncManager:
                         log_callback(f"ERREUR: {line.strip()}")
 
             process.wait()
+            events_reader.join(timeout=10)
 
             # Traiter les erreurs
             if process.returncode != 0:
@@ -164,7 +216,8 @@ class SyncManager:
                     process.returncode, process.args, stderr=stderr_output
                 )
 
-            result = parse_output(output_lines)
+            # Bilan structuré, ou à défaut extrait des logs texte
+            result = parse_events(events) or parse_output(output_lines)
 
             if progress_callback:
                 progress_callback(99, "Finalisation...")
@@ -208,8 +261,9 @@ class SyncManager:
 
             return result
         finally:
-            engine = create_engine(DATABASE_URL)
-            SessionLocal = sessionmaker(bind=engine)
+            duration = time.monotonic() - started_at
+            record_sync(config, result, duration, events, auto=auto)
+
             db_session = SessionLocal()
 
             sync_log = SyncLog(
@@ -222,35 +276,69 @@ class SyncManager:
                 auto=auto,
                 success_count=result.get("success_count", 0),
                 error_count=result.get("error_count", 0),
+                duration=duration,
             )
             db_session.add(sync_log)
             db_session.commit()
             db_session.close()
 
-            try:
-                ConfigManager(DATABASE_URL).fetch_and_store_grist_user_email(
-                    config.get("otp_config_id"),
-                    config.get("grist_base_url"),
-                    config.get("grist_api_key"),
-                )
-            except Exception as e:
-                if log_callback:
-                    log_callback(f"Enregistrement de l'email Grist ignoré: {e}")
+            # Hors du chemin critique : le résultat est retourné sans attendre
+            threading.Thread(
+                target=self._store_grist_user_email,
+                args=(config, log_callback),
+                daemon=True,
+            ).start()
+
+    @staticmethod
+    def _store_grist_user_email(
+        config: dict[str, Any], log_callback: Callable[[str], None] | None
+    ) -> None:
+        """Enregistre l'email Grist de la configuration (non bloquant)"""
+        try:
+            ConfigManager(DATABASE_URL).fetch_and_store_grist_user_email(
+                config.get("otp_config_id"),
+                config.get("grist_base_url"),
+                config.get("grist_api_key"),
+            )
+        except Exception as e:
+            if log_callback:
+                log_callback(f"Enregistrement de l'email Grist ignoré: {e}")
+
+    @staticmethod
+    def _read_events(
+        fd: int,
+        events: list[dict[str, Any]],
+        progress_callback: Callable[[float, str], None] | None,
+        event_callback: Callable[[dict[str, Any]], None] | None,
+    ) -> None:
+        """Lit le canal d'événements du script jusqu'à sa fermeture"""
+        for event in read_events(read_fd_lines(fd)):
+            events.append(event)
+            if event["type"] == "progress" and progress_callback:
+                progress_callback(event.get("progress", 0), event.get("phase", ""))
+            if event_callback:
+                event_callback(event)
 
     def start_task(
         self, task_function: Callable[..., Any], *args: Any, **kwargs: Any
     ) -> str:
         """Démarre une nouvelle tâche asynchrone"""
-        self.task_counter += 1
-        task_id = f"task_{self.task_counter}"
-
-        self.tasks[task_id] = {
-            "status": "running",
-            "progress": 0,
-            "message": "Initialisation...",
-            "start_time": time.time(),
-            "logs": [],
-        }
+        with self._tasks_lock:
+            self._evict_finished_tasks()
+            self.task_counter += 1
+            task_id = f"task_{self.task_counter}"
+
+            # Fichier éventuel d'une tâche de même ID d'un processus précédent
+            self._remove_spilled_logs(task_id)
+            self.tasks[task_id] = {
+                "status": "running",
+                "progress": 0,
+                "message": "Initialisation...",
+                "start_time": time.time(),
+                "logs": [],
+                # Nombre de lignes déplacées hors mémoire (index de logs[0])
+                "logs_offset": 0,
+            }
 
         # Démarrer la tâche dans un thread séparé
         thread = threading.Thread(
@@ -270,6 +358,9 @@ class SyncManager:
                 self._update_progress(task_id, progress, message)
             )
             kwargs["log_callback"] = lambda message: self._add_log(task_id, message)
+            kwargs["event_callback"] = lambda event: self._record_event(
+                task_id, event
+            )
 
             result = task_function(*args, **kwargs)
 
@@ -287,7 +378,7 @@ class SyncManager:
                 }
             )
 
-            self._emit_update(task_id)
+            self._emit_update(task_id, immediate=True)
 
         except Exception as e:
             self.tasks[task_id].update(
@@ -299,7 +390,7 @@ class SyncManager:
                 }
             )
 
-            self._emit_update(task_id)
+            self._emit_update(task_id, immediate=True)
 
     def _update_progress(self, task_id: str, progress: float, message: str) -> None:
         """Met à jour la progression d'une tâche"""
@@ -308,19 +399,161 @@ class SyncManager:
             self.tasks[task_id]["message"] = message
             self._emit_update(task_id)
 
+    def _record_event(self, task_id: str, event: dict[str, Any]) -> None:
+        """Met à jour les compteurs d'une tâche depuis un événement de lot ou de bilan"""
+        task = self.tasks.get(task_id)
+        if task is None or event["type"] not in ("batch", "summary"):
+            return
+
+        success_count = event.get("success_count", 0)
+        elapsed = event.get("time", time.time()) - task["start_time"]
+        task["stats"] = {
+            "success_count": success_count,
+            "error_count": event.get("error_count", 0),
+            "batches": event.get("batch", task.get("stats", {}).get("batches", 0)),
+            "dossiers_per_second": success_count / elapsed if elapsed > 0 else 0,
+        }
+        self._emit_update(task_id)
+
     def _add_log(self, task_id: str, message: str) -> None:
         """Ajoute un log à une tâche"""
-        if task_id in self.tasks:
-            self.tasks[task_id]["logs"].append(
-                {"timestamp": time.time(), "message": message}
-            )
+        task = self.tasks.get(task_id)
+        if task is not None:
+            task["logs"].append({"timestamp": time.time(), "message": message})
+            if len(task["logs"]) > SYNC_TASK_LOG_LINES:
+                self._spill_logs(task_id, task)
             self._emit_update(task_id)
 
-    def _emit_update(self, task_id: str) -> None:
-        """Émet une mise à jour via notification callback"""
-        self.notify("task_update", {"task_id": task_id, "task": self.tasks[task_id]})
+    @staticmethod
+    def _spilled_logs_path(task_id: str) -> str:
+        return os.path.join(SYNC_TASK_LOGS_DIR, f"{task_id}.jsonl.gz")
+
+    def _spill_logs(self, task_id: str, task: dict[str, Any]) -> None:
+        """
+        Déplace la plus ancienne moitié des logs en mémoire
+        dans le fichier compressé de la tâche
+        """
+        count = len(task["logs"]) - SYNC_TASK_LOG_LINES // 2
+        spilled = task["logs"][:count]
+        try:
+            os.makedirs(SYNC_TASK_LOGS_DIR, exist_ok=True)
+            with gzip.open(self._spilled_logs_path(task_id), "at") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in spilled)
+        except OSError:
+            # Logs perdus plutôt qu'une mémoire non bornée
+            pass
+        del task["logs"][:count]
+        task["logs_offset"] = task.get("logs_offset", 0) + count
+
+    def _remove_spilled_logs(self, task_id: str) -> None:
+        try:
+            os.remove(self._spilled_logs_path(task_id))
+        except OSError:
+            pass
+
+    def _evict_finished_tasks(self) -> None:
+        """
+        Retire les tâches terminées depuis plus de SYNC_TASK_TTL secondes,
+        puis les plus anciennes au-delà de SYNC_TASKS_MAX_FINISHED
+        """
+        now = time.time()
+        finished = sorted(
+            (task.get("end_time", 0), task_id)
+            for task_id, task in self.tasks.items()
+            if task["status"] != "running"
+        )
+        excess = len(finished) - SYNC_TASKS_MAX_FINISHED
+
+        for index, (end_time, task_id) in enumerate(finished):
+            if index < excess or now - end_time > SYNC_TASK_TTL:
+                del self.tasks[task_id]
+                self._emitted_logs.pop(task_id, None)
+                self._remove_spilled_logs(task_id)
+
+    def get_task_logs(
+        self, task_id: str, offset: int = 0, limit: int | None = None
+    ) -> list[dict[str, Any]] | None:
+        """
+        Logs d'une tâche à partir de la ligne offset,
+        y compris ceux déplacés hors mémoire
+        """
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None
+
+        logs_offset = task.get("logs_offset", 0)
+        logs = []
+        if offset < logs_offset:
+            try:
+                with gzip.open(self._spilled_logs_path(task_id), "rt") as f:
+                    for index, line in enumerate(f):
+                        if index >= offset:
+                            logs.append(json.loads(line))
+                        if limit is not None and len(logs) >= limit:
+                            return logs
+            except (OSError, EOFError, ValueError):
+                pass
+
+        logs.extend(task["logs"][max(0, offset - logs_offset) :])
+        return logs if limit is None else logs[:limit]
+
+    def _emit_update(self, task_id: str, immediate: bool = False) -> None:
+        """
+        Programme l'envoi d'une mise à jour de la tâche.
+        Les mises à jour d'un même intervalle sont regroupées : seul l'état
+        courant est envoyé, les progressions intermédiaires sont abandonnées.
+        """
+        if immediate or self.emit_interval <= 0:
+            with self._pending_lock:
+                self._pending_updates.discard(task_id)
+            self._send_update(task_id)
+            return
+
+        with self._pending_lock:
+            self._pending_updates.add(task_id)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(
+                    self.emit_interval, self._flush_updates
+                )
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _flush_updates(self) -> None:
+        """Envoie les mises à jour en attente"""
+        with self._pending_lock:
+            task_ids = list(self._pending_updates)
+            self._pending_updates.clear()
+            self._flush_timer = None
+
+        for task_id in task_ids:
+            self._send_update(task_id)
+
+    def _send_update(self, task_id: str) -> None:
+        """
+        Émet l'état courant de la tâche via notification callback,
+        avec uniquement les logs non encore envoyés (logs_offset : index du premier)
+        """
+        with self._emit_lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return
+
+            first = task.get("logs_offset", 0)
+            logs = task["logs"]
+            start = max(self._emitted_logs.get(task_id, 0), first)
+            update = {key: value for key, value in task.items() if key != "logs"}
+            update["logs"] = logs[start - first :]
+            update["logs_offset"] = start
+            self._emitted_logs[task_id] = first + len(logs)
+
+            self.notify("task_update", {"task_id": task_id, "task": update})
         time.sleep(0)
 
     def get_task(self, task_id: str) -> dict[str, Any] | None:
         """Récupère les informations d'une tâche"""
         return self.tasks.get(task_id)
+
+    def count_running_tasks(self) -> int:
+        """Nombre de tâches en cours d'exécution"""
+        with self._tasks_lock:
+            return sum(1 for task in self.tasks.values() if task["status"] == "running")
@@ -0,0 +1,257 @@
+"""
+File d'attente des synchronisations planifiées.
+
+Les synchronisations automatiques sont exécutées depuis une file unique, avec :
+- une concurrence globale (nombre de synchronisations simultanées),
+- un budget de démarrages par hôte (token bucket) : un budget partagé pour
+  l'API Démarches Simplifiées, quel que soit le token utilisé, et un budget
+  distinct pour chaque hôte Grist. Ces budgets limitent le nombre de
+  synchronisations lancées par minute, pas le débit de requêtes HTTP d'une
+  synchronisation en cours, qui n'est pas limité,
+- un ordonnancement par coût estimé (durée de la dernière synchronisation),
+  pour que les petites démarches ne patientent pas derrière les plus grosses.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Budget de type token bucket : `capacity` jetons au maximum,
+    rechargés au rythme de `rate` jetons par seconde
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def available(self, tokens: float = 1) -> bool:
+        """Indique si `tokens` jetons sont disponibles, sans les consommer"""
+        with self._lock:
+            self._refill()
+            return self._tokens >= tokens
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Consomme `tokens` jetons si disponibles, sans attendre"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """Délai (en secondes) avant que `tokens` jetons soient disponibles"""
+        with self._lock:
+            self._refill()
+            missing = tokens - self._tokens
+            if missing <= 0:
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return missing / self.rate
+
+
+@dataclass(order=True)
+class QueuedSync:
+    """Synchronisation en attente, ordonnée par coût estimé puis par arrivée"""
+
+    cost: float
+    sequence: int
+    otp_config_id: int = field(compare=False)
+    ds_host: str = field(compare=False)
+    grist_host: str = field(compare=False)
+
+
+class SyncQueue:
+    """
+    File de synchronisations avec concurrence globale
+    et budgets de démarrage par hôte (synchronisations lancées par minute,
+    sans limite sur les requêtes envoyées ensuite).
+
+    `run_sync(otp_config_id)` est exécuté dans un thread dédié
+    pour chaque synchronisation dépilée.
+    """
+
+    def __init__(
+        self,
+        run_sync: Callable[[int], None],
+        max_concurrency: int = 4,
+        ds_starts_per_minute: float = 6,
+        grist_starts_per_minute: float = 4,
+        burst: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.run_sync = run_sync
+        self.max_concurrency = max(1, max_concurrency)
+        self.ds_start_rate = ds_starts_per_minute / 60
+        self.grist_start_rate = grist_starts_per_minute / 60
+        self.burst = burst if burst is not None else self.max_concurrency
+        self._clock = clock
+
+        self._heap: list[QueuedSync] = []
+        self._queued_ids: set[int] = set()
+        self._running_ids: set[int] = set()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._dispatching = False
+
+    def _bucket(self, key: str, rate: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, self.burst, clock=self._clock)
+            self._buckets[key] = bucket
+        return bucket
+
+    def _buckets_for(self, item: QueuedSync) -> tuple[TokenBucket, TokenBucket]:
+        return (
+            self._bucket(f"ds:{item.ds_host}", self.ds_start_rate),
+            self._bucket(f"grist:{item.grist_host}", self.grist_start_rate),
+        )
+
+    def submit(
+        self, otp_config_id: int, cost: float, ds_host: str, grist_host: str
+    ) -> bool:
+        """
+        Ajoute une synchronisation à la file.
+        Retourne False si la configuration est déjà en attente ou en cours.
+        """
+        with self._condition:
+            if otp_config_id in self._queued_ids or otp_config_id in self._running_ids:
+                logger.info(
+                    f"Synchronisation déjà en file ou en cours pour config {otp_config_id}"
+                )
+                return False
+
+            heapq.heappush(
+                self._heap,
+                QueuedSync(
+                    cost=cost,
+                    sequence=next(self._sequence),
+                    otp_config_id=otp_config_id,
+                    ds_host=ds_host,
+                    grist_host=grist_host,
+                ),
+            )
+            self._queued_ids.add(otp_config_id)
+            self._ensure_dispatcher()
+            self._condition.notify_all()
+            return True
+
+    def pending(self) -> list[int]:
+        """Identifiants des configurations en attente, dans l'ordre de passage"""
+        with self._condition:
+            return [item.otp_config_id for item in sorted(self._heap)]
+
+    def running(self) -> list[int]:
+        """Identifiants des configurations en cours de synchronisation"""
+        with self._condition:
+            return sorted(self._running_ids)
+
+    def _ensure_dispatcher(self) -> None:
+        # Appelé sous verrou : le drapeau évite la course avec un dispatcher
+        # en train de se terminer
+        if not self._dispatching:
+            self._dispatching = True
+            threading.Thread(
+                target=self._dispatch_loop, name="sync-queue-dispatcher", daemon=True
+            ).start()
+
+    def _next_ready(self) -> tuple[QueuedSync | None, float]:
+        """
+        Choisit la synchronisation la moins coûteuse dont les budgets DS
+        et Grist autorisent le démarrage. Une démarche bloquée par le budget
+        de son hôte Grist ne bloque pas celles des autres hôtes.
+        Retourne (élément, 0) ou (None, délai d'attente conseillé).
+        """
+        shortest_wait = float("inf")
+
+        for item in sorted(self._heap):
+            ds_bucket, grist_bucket = self._buckets_for(item)
+            if ds_bucket.available() and grist_bucket.available():
+                ds_bucket.try_acquire()
+                grist_bucket.try_acquire()
+                self._heap.remove(item)
+                heapq.heapify(self._heap)
+                return item, 0.0
+            shortest_wait = min(
+                shortest_wait,
+                max(ds_bucket.wait_time(), grist_bucket.wait_time()),
+            )
+
+        return None, shortest_wait
+
+    def _dispatch_loop(self) -> None:
+        with self._condition:
+            while self._heap or self._running_ids:
+                if not self._heap or len(self._running_ids) >= self.max_concurrency:
+                    self._condition.wait(timeout=1)
+                    continue
+
+                item, wait = self._next_ready()
+                if item is None:
+                    self._condition.wait(timeout=min(wait, 5))
+                    continue
+
+                self._queued_ids.discard(item.otp_config_id)
+                self._running_ids.add(item.otp_config_id)
+                logger.info(
+                    f"Démarrage de la synchronisation en file pour config {item.otp_config_id} "
+                    f"(coût estimé {item.cost:.0f}s, {len(self._heap)} en attente)"
+                )
+                threading.Thread(
+                    target=self._run_item,
+                    args=(item,),
+                    name=f"sync-queue-{item.otp_config_id}",
+                    daemon=True,
+                ).start()
+
+            self._dispatching = False
+
+    def _run_item(self, item: QueuedSync) -> None:
+        try:
+            self.run_sync(item.otp_config_id)
+        except Exception as e:
+            logger.error(
+                f"Erreur de la synchronisation en file pour config {item.otp_config_id}: {str(e)}"
+            )
+        finally:
+            with self._condition:
+                self._running_ids.discard(item.otp_config_id)
+                self._condition.notify_all()
+
+    def wait_until_idle(self, timeout: float | None = None) -> bool:
+        """Attend que la file soit vide et qu'aucune synchronisation ne tourne"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._heap or self._running_ids:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(timeout=remaining)
+            return True
+
@@ -53,7 +53,6 @@ def parse_output(output_lines: list[str]) -> dict:
     success_count = 0
     error_count = 0
     total_processed = 0
-    errors_list = []
 
     nb_deleted = 0
     # Parser la sortie pour extraire les statistiques
@@ -102,6 +101,59 @@ def parse_output(output_lines: list[str]) -> dict:
         )
     )
 
+    return _build_result(
+        success_count, error_count, total_processed, nb_deleted, already_up_to_date
+    )
+
+
+def parse_events(events: list[dict]) -> dict | None:
+    """
+    Construit le résultat de synchronisation depuis les événements structurés.
+    Args:
+        events: Événements reçus sur le canal (voir utils/events.py)
+    Returns:
+        dict au format de parse_output, ou None sans événement summary
+    """
+    summary = None
+    nb_deleted = 0
+    errors = []
+    for event in events:
+        if event["type"] == "summary":
+            summary = event
+        elif event["type"] == "deleted":
+            nb_deleted = event.get("count", 0)
+        elif event["type"] == "error":
+            errors.append(event.get("message", ""))
+
+    if summary is None:
+        return None
+
+    success_count = summary.get("success_count", 0)
+    error_count = summary.get("error_count", 0)
+    already_up_to_date = (
+        success_count == 0
+        and error_count == 0
+        and summary.get("already_up_to_date", False)
+    )
+    return _build_result(
+        success_count,
+        error_count,
+        success_count + error_count,
+        nb_deleted,
+        already_up_to_date,
+        errors,
+    )
+
+
+def _build_result(
+    success_count: int,
+    error_count: int,
+    total_processed: int,
+    nb_deleted: int,
+    already_up_to_date: bool,
+    errors: list[str] | None = None,
+) -> dict:
+    """Résultat de synchronisation à partir des statistiques extraites"""
     message = (
         f"Synchronisation terminée: {success_count}/{total_processed} dossiers synchronisés"
         if error_count == 0
@@ -119,6 +171,6 @@ def parse_output(output_lines: list[str]) -> dict:
         "error_count": error_count,
         "total_processed": total_processed,
         "deleted_dossiers_count": nb_deleted,
-        "errors": errors_list,
+        "errors": errors or [],
         "timestamp": datetime.now(timezone.utc).isoformat(),
     }
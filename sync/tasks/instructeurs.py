@@ -6,6 +6,10 @@ Récupère les instructeurs de la démarche via l'API DN (groupeInstructeurs) et
 met la table Grist à jour par upsert sur la clé composite
 `instructeur_id` + `groupe_instructeur_id` : créations, mises à jour, suppressions.
 
+Une empreinte de la liste DN est conservée dans le stockage local après chaque
+synchronisation réussie : tant qu'elle est identique (et récente), la table
+Grist n'est ni relue ni comparée.
+
 Utilisation autonome (depuis la racine du projet) :
     python -m sync.tasks.instructeurs
 
@@ -13,6 +17,8 @@ Variables d'environnement requises :
     GRIST_BASE_URL, GRIST_API_KEY, GRIST_DOC_ID, DEMARCHE_NUMBER
 """
 
+import hashlib
+import json
 import os
 import sys
 import time
@@ -20,6 +26,12 @@ import time
 import requests
 
 from queries_extract import extract_instructeurs_from_demarche
+from utils.state_store import get_state_store
+
+INSTRUCTEURS_DIGEST_NAMESPACE = "instructeurs_digest"
+
+# Durée (secondes) pendant laquelle une empreinte identique évite la comparaison
+INSTRUCTEURS_DIGEST_TTL = int(os.getenv("INSTRUCTEURS_DIGEST_TTL", "86400"))
 
 # Champs comparés pour décider si un enregistrement existant doit être mis à jour
 COMPARED_FIELDS = [
@@ -35,6 +47,21 @@ def _composite_key(instructeur_id, groupe_instructeur_id):
     return f"{instructeur_id}_{groupe_instructeur_id}"
 
 
+def _instructeurs_digest(instructeurs_records):
+    """Empreinte de la liste des instructeurs, indépendante de l'ordre"""
+    payload = json.dumps(
+        sorted(
+            instructeurs_records,
+            key=lambda r: _composite_key(
+                r["instructeur_id"], r["groupe_instructeur_id"]
+            ),
+        ),
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
 def _fetch_existing_records(client, table_id):
     """Récupère les enregistrements actuels de la table instructeurs.
 
@@ -156,6 +183,16 @@ def sync_instructeurs(client, table_id, demarche_number, log=print, log_error=pr
         return result
 
     log(f"  {len(instructeurs_records)} instructeur(s) trouvé(s)")
+    result["total"] = len(instructeurs_records)
+
+    store = get_state_store()
+    digest_key = f"{client.doc_id}:{table_id}"
+    digest = _instructeurs_digest(instructeurs_records)
+    if INSTRUCTEURS_DIGEST_TTL and digest == store.get(
+        INSTRUCTEURS_DIGEST_NAMESPACE, digest_key, max_age=INSTRUCTEURS_DIGEST_TTL
+    ):
+        log("  Instructeurs inchangés depuis la dernière synchronisation")
+        return result
 
     existing_map = _build_existing_map(_fetch_existing_records(client, table_id))
     new_map = {
@@ -174,11 +211,14 @@ def sync_instructeurs(client, table_id, demarche_number, log=print, log_error=pr
     else:
         log(f"  Table instructeurs synchronisée ({operations_count} opération(s))")
 
+    # Empreinte enregistrée seulement si toutes les opérations ont abouti
+    if operations_count == len(to_delete) + len(to_update) + len(to_create):
+        store.set(INSTRUCTEURS_DIGEST_NAMESPACE, digest_key, digest)
+
     log(f"[TIMING] Instructeurs synchronisés en {time.time() - start_time:.1f}s")
 
     result.update(
         {
-            "total": len(instructeurs_records),
             "created": len(to_create),
             "updated": len(to_update),
             "deleted": len(to_delete),
@@ -4,6 +4,12 @@ Rafraîchissement des labels (étiquettes) des dossiers dans Grist.
 Ce script interroge tous les dossiers de la démarche avec une requête minimaliste
 (number + labels) et met à jour les seules lignes dont les labels ont changé.
 
+L'état des labels écrits dans Grist est conservé dans le stockage local sous
+forme d'empreintes {dossier_number: [id Grist, empreinte]} : tant qu'il est
+récent, la table dossiers n'est pas relue. Les dossiers DN absents de Grist
+(écartés par les filtres de la configuration) y sont notés {dossier_number: None},
+pour ne pas provoquer de relecture à chaque exécution.
+
 Utilisation autonome (depuis la racine du projet) :
     python -m sync.tasks.labels
 
@@ -11,6 +17,7 @@ Variables d'environnement requises :
     GRIST_BASE_URL, GRIST_API_KEY, GRIST_DOC_ID, DEMARCHE_NUMBER
 """
 
+import hashlib
 import json
 import os
 import sys
@@ -19,9 +26,18 @@ import time
 import requests
 
 from queries_graphql import get_demarche_dossiers_labels_only
+from utils.state_store import get_state_store
 
 BATCH_SIZE = 500
 
+# Taille maximale (octets JSON) d'une requête PATCH
+MAX_PATCH_BYTES = 1_000_000
+
+LABEL_FINGERPRINTS_NAMESPACE = "label_fingerprints"
+
+# Durée (secondes) pendant laquelle les empreintes évitent de relire Grist
+LABEL_FINGERPRINTS_TTL = int(os.getenv("LABEL_FINGERPRINTS_TTL", "86400"))
+
 
 def _build_label_fields(labels):
     """Construit label_names / labels_json à partir des labels d'un dossier."""
@@ -50,6 +66,47 @@ def _build_label_fields(labels):
     }
 
 
+def _label_fingerprint(fields):
+    """Empreinte compacte de label_names / labels_json"""
+    payload = f"{fields['label_names']}\x1f{fields['labels_json']}"
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def _load_fingerprints(client, table_id, max_age=LABEL_FINGERPRINTS_TTL):
+    """
+    Retourne les empreintes des labels présents dans Grist.
+
+    Returns:
+        tuple: ({str(dossier_number): [grist_id, empreinte]}, lu depuis le cache)
+    """
+    store_key = f"{client.doc_id}:{table_id}"
+    if max_age:
+        cached = get_state_store().get(
+            LABEL_FINGERPRINTS_NAMESPACE, store_key, max_age=max_age
+        )
+        if cached is not None:
+            return cached, True
+
+    existing = _fetch_existing_labels(client, table_id)
+    fingerprints = {
+        num: [current["grist_id"], _label_fingerprint(current)]
+        for num, current in existing.items()
+    }
+    if fingerprints:
+        _save_fingerprints(client, table_id, fingerprints)
+    return fingerprints, False
+
+
+def _save_fingerprints(client, table_id, fingerprints):
+    get_state_store().set(
+        LABEL_FINGERPRINTS_NAMESPACE, f"{client.doc_id}:{table_id}", fingerprints
+    )
+
+
+def _invalidate_fingerprints(client, table_id):
+    get_state_store().delete(LABEL_FINGERPRINTS_NAMESPACE, f"{client.doc_id}:{table_id}")
+
+
 def _fetch_existing_labels(client, table_id):
     """
     Récupère l'état actuel des labels dans Grist.
@@ -81,16 +138,40 @@ def _fetch_existing_labels(client, table_id):
     return existing
 
 
-def _patch_records(client, table_id, records, log, log_error):
-    """PATCH les enregistrements par lots. Retourne le nombre de lignes mises à jour."""
+def _chunk_records(records, max_records=BATCH_SIZE, max_bytes=MAX_PATCH_BYTES):
+    """Découpe en lots bornés en nombre d'enregistrements et en taille JSON"""
+    batch = []
+    batch_bytes = 0
+
+    for record in records:
+        record_bytes = len(json.dumps(record, ensure_ascii=False).encode())
+        if batch and (
+            len(batch) >= max_records or batch_bytes + record_bytes > max_bytes
+        ):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(record)
+        batch_bytes += record_bytes
+
+    if batch:
+        yield batch
+
+
+def _patch_records(client, table_id, records, log, log_error, patched_ids=None):
+    """
+    PATCH les enregistrements par lots. Retourne le nombre de lignes mises à jour.
+    Si patched_ids est fourni, les IDs des lignes mises à jour y sont ajoutés.
+    """
     url = f"{client.base_url}/docs/{client.doc_id}/tables/{table_id}/records"
     updated = 0
 
-    for i in range(0, len(records), BATCH_SIZE):
-        batch = records[i : i + BATCH_SIZE]
+    for batch in _chunk_records(records):
         response = requests.patch(url, headers=client.headers, json={"records": batch})
         if response.status_code in [200, 201]:
             updated += len(batch)
+            if patched_ids is not None:
+                patched_ids.update(record["id"] for record in batch)
         else:
             log_error(
                 f"  Erreur PATCH labels ({len(batch)} lignes): "
@@ -123,38 +204,68 @@ def sync_labels_for_demarche(
     result = {"checked": 0, "updated": 0, "missing_in_grist": 0}
     log("\n--- Rafraîchissement des labels ---")
 
-    existing = _fetch_existing_labels(client, table_id)
-    if not existing:
+    fingerprints, from_cache = _load_fingerprints(client, table_id)
+    if not fingerprints:
         log("  Aucun dossier dans Grist — rien à rafraîchir.")
         log("--- Fin rafraîchissement des labels ---\n")
         return result
+    if from_cache:
+        log(f"  Empreintes des labels lues depuis le cache ({len(fingerprints)})")
 
     dossiers = get_demarche_dossiers_labels_only(demarche_number)
     log(f"  {len(dossiers)} dossier(s) interrogé(s) côté DN")
 
+    # Dossiers inconnus depuis la mise en cache : relire Grist une fois
+    if from_cache and any(str(d.get("number")) not in fingerprints for d in dossiers):
+        fingerprints, from_cache = _load_fingerprints(client, table_id, max_age=0)
+
+    # Après relecture, noter les dossiers absents de Grist (filtres)
+    if not from_cache:
+        absent = {
+            str(d.get("number"))
+            for d in dossiers
+            if str(d.get("number")) not in fingerprints
+        }
+        if absent:
+            fingerprints.update(dict.fromkeys(absent))
+            _save_fingerprints(client, table_id, fingerprints)
+
     to_update = []
+    new_fingerprints = {}
     missing_in_grist = 0
 
     for dossier in dossiers:
         num_str = str(dossier.get("number"))
-        current = existing.get(num_str)
+        current = fingerprints.get(num_str)
         if not current:
             missing_in_grist += 1
             continue
 
+        grist_id, fingerprint = current
         fields = _build_label_fields(dossier.get("labels"))
-        if (
-            fields["label_names"] == current["label_names"]
-            and fields["labels_json"] == current["labels_json"]
-        ):
+        new_fingerprint = _label_fingerprint(fields)
+        if new_fingerprint == fingerprint:
             continue
 
-        to_update.append({"id": current["grist_id"], "fields": fields})
+        to_update.append({"id": grist_id, "fields": fields})
+        new_fingerprints[grist_id] = (num_str, new_fingerprint)
 
     if not to_update:
         log("  Labels déjà à jour (aucun changement)")
 
-    updated = _patch_records(client, table_id, to_update, log, log_error)
+    patched_ids = set()
+    updated = _patch_records(
+        client, table_id, to_update, log, log_error, patched_ids=patched_ids
+    )
+
+    if updated < len(to_update) and from_cache:
+        # Empreintes peut-être périmées (ligne supprimée dans Grist…)
+        _invalidate_fingerprints(client, table_id)
+    elif patched_ids:
+        for grist_id in patched_ids:
+            num_str, new_fingerprint = new_fingerprints[grist_id]
+            fingerprints[num_str] = [grist_id, new_fingerprint]
+        _save_fingerprints(client, table_id, fingerprints)
 
     log(f"[TIMING] Labels rafraîchis en {time.time() - start_time:.1f}s")
     log("--- Fin rafraîchissement des labels ---\n")
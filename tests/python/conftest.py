@@ -1,7 +1,26 @@
 # tests/python/conftest.py
 import os
 
+import pytest
+
 # Configuration de test explicite
 # L'URL est intentionnellement invalide pour indiquer qu'aucune vraie DB n'est utilisée
 os.environ['DATABASE_URL'] = 'postgresql://invalid-url-used-only-for-mocks-tests'
-os.environ['ENCRYPTION_KEY'] = 'test-encryption-key-for-tests-32bytes'
\ No newline at end of file
+os.environ['ENCRYPTION_KEY'] = 'test-encryption-key-for-tests-32bytes'
+
+
+@pytest.fixture(autouse=True)
+def clear_config_cache():
+    """Caches de ConfigManager (configurations, emails Grist) vidés entre les tests"""
+    from configuration.config_manager import ConfigManager
+
+    caches = (
+        ConfigManager._config_cache,
+        ConfigManager._grist_email_cache,
+        ConfigManager._stored_grist_emails,
+    )
+    for cache in caches:
+        cache.clear()
+    yield
+    for cache in caches:
+        cache.clear()
@@ -1048,22 +1048,15 @@ class TestErrorHandling:
         assert data["success"] is False
         assert "non trouvée" in data["message"]
 
-    @patch("sync.scheduled_sync.create_engine")
-    @patch("sync.scheduled_sync.sessionmaker")
+    @patch("sync.scheduled_sync.SessionLocal")
     @patch("sync.scheduled_sync.config_manager.load_config_by_id")
-    def test_scheduled_sync_job_success(
-        self, mock_load_config, mock_sessionmaker, mock_create_engine
-    ):
+    def test_scheduled_sync_job_success(self, mock_load_config, mock_session_local):
         """Test exécution réussie d'une synchronisation planifiée"""
         from sync.scheduled_sync import scheduled_sync_job
         from sync.sync_manager import SyncManager
 
         mock_db = MagicMock()
-        mock_engine = MagicMock()
-        mock_create_engine.return_value = mock_engine
-
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
+        mock_session_local.return_value = mock_db
 
         mock_config = MagicMock()
         mock_config.id = 1
@@ -1105,16 +1098,15 @@ class TestErrorHandling:
                 auto=True,
             )
 
-    @patch("sync.scheduled_sync.sessionmaker")
+    @patch("sync.scheduled_sync.SessionLocal")
     @patch("sync.scheduled_sync.config_manager.load_config_by_id")
-    def test_scheduled_sync_job_error(self, mock_load_config, mock_sessionmaker):
+    def test_scheduled_sync_job_error(self, mock_load_config, mock_session_local):
         """Test exécution échouée d'une synchronisation planifiée"""
         from sync.scheduled_sync import scheduled_sync_job
         from sync.sync_manager import SyncManager
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
+        mock_session_local.return_value = mock_db
 
         mock_config = MagicMock()
         mock_config.id = 1
@@ -1156,56 +1148,133 @@ class TestErrorHandling:
                 auto=True,
             )
 
-    @patch("sync.scheduled_sync.sessionmaker")
-    def test_reload_scheduler_jobs(self, mock_sessionmaker):
-        """Test rechargement des jobs du scheduler"""
+    @patch("sync.scheduled_sync.load_active_schedules")
+    @patch("sync.scheduled_sync.SessionLocal")
+    def test_reload_scheduler_jobs(self, _mock_session_local, mock_load_schedules):
+        """Test rechargement : seuls les jobs ajoutés, modifiés ou supprimés sont touchés"""
+        from apscheduler.triggers.cron import CronTrigger
+
+        from sync import scheduled_sync
         from sync.scheduled_sync import reload_scheduler_jobs, scheduler
         from sync.sync_manager import SyncManager
 
-        mock_db = MagicMock()
-        mock_sessionmaker.return_value = mock_db
-
-        mock_schedule1 = MagicMock()
-        mock_schedule1.otp_config_id = 1
-        mock_schedule1.enabled = True
+        sync_manager = SyncManager(notify_callback=MagicMock())
+        tz = scheduled_sync.ZoneInfo(scheduled_sync.SYNC_TZ)
+        trigger = CronTrigger(
+            hour=scheduled_sync.SYNC_HOUR,
+            minute=scheduled_sync.SYNC_MINUTE,
+            timezone=tz,
+        )
 
-        mock_schedule2 = MagicMock()
-        mock_schedule2.otp_config_id = 2
-        mock_schedule2.enabled = True
+        def job(job_id, args, job_trigger=trigger):
+            return MagicMock(id=job_id, args=args, trigger=job_trigger)
 
-        mock_db.query.return_value.filter_by.return_value.all.return_value = [
-            mock_schedule1,
-            mock_schedule2,
+        mock_load_schedules.return_value = [
+            MagicMock(schedule_id=10, otp_config_id=1),
+            MagicMock(schedule_id=20, otp_config_id=2),
+            MagicMock(schedule_id=30, otp_config_id=3),
+        ]
+        current_jobs = [
+            # Inchangé
+            job("scheduled_sync_1", [1, sync_manager]),
+            # Heure modifiée
+            job(
+                "scheduled_sync_2",
+                [2, sync_manager],
+                CronTrigger(hour=5, minute=0, timezone=tz),
+            ),
+            # Planning désactivé
+            job("scheduled_sync_4", [4, sync_manager]),
+            job("sync_logs_retention", []),
         ]
 
-        mock_config1 = MagicMock()
-        mock_config1.id = 1
-        mock_config1.grist_user_id = "user1"
-        mock_config1.grist_doc_id = "doc1"
-        mock_config1.demarche_number = "123"
+        with (
+            patch.object(scheduled_sync, "SYNC_TZ", "Europe/Paris"),
+            patch.object(scheduler, "get_jobs", return_value=current_jobs),
+            patch.object(scheduler, "get_job", return_value=current_jobs[-1]),
+            patch.object(scheduler, "add_job") as mock_add,
+            patch.object(scheduler, "remove_job") as mock_remove,
+            patch.object(scheduler, "remove_all_jobs") as mock_remove_all,
+        ):
+            reload_scheduler_jobs(sync_manager)
 
-        mock_config2 = MagicMock()
-        mock_config2.id = 2
-        mock_config2.grist_user_id = "user2"
-        mock_config2.grist_doc_id = "doc2"
-        mock_config2.demarche_number = "456"
+        assert sorted(call.kwargs["id"] for call in mock_add.call_args_list) == [
+            "scheduled_sync_2",
+            "scheduled_sync_3",
+        ]
+        mock_remove.assert_called_once_with("scheduled_sync_4")
+        mock_remove_all.assert_not_called()
+        # Jobs simultanés : aucun démarrage tardif abandonné
+        for call in mock_add.call_args_list:
+            assert call.kwargs["misfire_grace_time"] is None
+            assert call.kwargs["coalesce"] is True
+        mock_load_schedules.assert_called_once()
+
+    def test_load_active_schedules_single_joined_query(self):
+        """Test plannings et configurations lus en une requête jointe"""
+        from sqlalchemy.orm import Query, Session
+
+        from sync.scheduled_sync import load_active_schedules
+
+        with patch.object(Query, "all", lambda query: str(query)):
+            sql = load_active_schedules(Session())
+
+        assert sql.count("SELECT") == 1
+        assert "JOIN otp_configurations" in sql
+        assert "user_schedules.enabled IS true" in sql
+
+    @patch("sync.scheduled_sync.load_active_schedules", return_value=[])
+    @patch("sync.scheduled_sync.SessionLocal")
+    def test_reload_scheduler_jobs_adds_retention_job(self, _mock_session, _mock_load):
+        """Test création du job de rétention s'il est absent"""
+        from sync.scheduled_sync import reload_scheduler_jobs, scheduler
 
-        def mock_filter_by(**kwargs):
-            if kwargs.get("id") == 1:
-                return MagicMock(first=MagicMock(return_value=mock_config1))
-            elif kwargs.get("id") == 2:
-                return MagicMock(first=MagicMock(return_value=mock_config2))
-            return MagicMock(first=MagicMock(return_value=None))
+        with (
+            patch.object(scheduler, "get_jobs", return_value=[]),
+            patch.object(scheduler, "get_job", return_value=None),
+            patch.object(scheduler, "add_job") as mock_add,
+        ):
+            reload_scheduler_jobs(MagicMock())
 
-        mock_db.query.return_value.filter_by.side_effect = mock_filter_by
+        mock_add.assert_called_once()
+        assert mock_add.call_args.kwargs["id"] == "sync_logs_retention"
 
-        mock_notifier = MagicMock()
-        sync_manager = SyncManager(notify_callback=mock_notifier)
+    @patch("app.load_active_schedules")
+    @patch("app.reload_scheduler_jobs")
+    @patch("app.SessionLocal")
+    def test_api_reload_scheduler(
+        self, _mock_session, _mock_reload, mock_load_schedules, client
+    ):
+        """Test détails des jobs lus en une requête"""
+        from app import scheduler
+
+        mock_load_schedules.return_value = [
+            MagicMock(
+                schedule_id=10,
+                otp_config_id=1,
+                demarche_number="123",
+                grist_doc_id="doc1",
+            )
+        ]
+        jobs = [
+            MagicMock(id="scheduled_sync_1", args=[1], next_run_time=None),
+            MagicMock(id="sync_logs_retention", args=[]),
+        ]
 
-        with patch.object(scheduler, "remove_all_jobs") as mock_remove:
-            reload_scheduler_jobs(sync_manager)
+        with patch.object(scheduler, "get_jobs", return_value=jobs):
+            response = client.post("/api/reload-scheduler")
 
-            mock_remove.assert_called_once()
+        assert response.status_code == 200
+        assert json.loads(response.data)["jobs"] == [
+            {
+                "schedule_id": 10,
+                "config_id": 1,
+                "demarche": "123",
+                "next_run": None,
+                "document": "doc1",
+            }
+        ]
+        mock_load_schedules.assert_called_once()
 
 
 class SyncLogMock:
@@ -1220,6 +1289,7 @@ class SyncLogMock:
         message,
         otp_config_id=None,
         demarche_number=None,
+        auto=True,
     ):
         class TimestampMock:
             def isoformat(self):
@@ -1232,6 +1302,7 @@ class SyncLogMock:
         self.message = message
         self.otp_config_id = otp_config_id
         self.demarche_number = demarche_number
+        self.auto = auto
 
 
 class OtpConfigMock:
@@ -1243,6 +1314,23 @@ class OtpConfigMock:
         self.grist_doc_id = grist_doc_id
 
 
+def mock_latest_syncs(mock_db, syncs, otp_config=None):
+    """
+    Simule la requête DISTINCT ON (une ligne par mode auto/manuel)
+    et, le cas échéant, la lecture de la configuration
+    """
+
+    def query_side_effect(model):
+        mock_result = MagicMock()
+        if model.__name__ == "OtpConfiguration":
+            mock_result.filter_by.return_value.first.return_value = otp_config
+        else:
+            mock_result.filter_by.return_value.distinct.return_value.order_by.return_value.all.return_value = syncs
+        return mock_result
+
+    mock_db.query.side_effect = query_side_effect
+
+
 class TestApiSyncLogLatestWithOTPConfigId:
     """Tests pour la route /api/sync-log/latest utilisant otp_config_id"""
 
@@ -1257,29 +1345,16 @@ class TestApiSyncLogLatestWithOTPConfigId:
             "2026-04-20T10:00:00+00:00", "success", 10, 0, "Sync auto réussie"
         )
         mock_sync_manual = SyncLogMock(
-            "2026-04-20T14:30:00+00:00", "success", 5, 1, "Sync manuelle réussie"
+            "2026-04-20T14:30:00+00:00",
+            "success",
+            5,
+            1,
+            "Sync manuelle réussie",
+            auto=False,
+        )
+        mock_latest_syncs(
+            mock_db, [mock_sync_manual, mock_sync_auto], otp_config=mock_otp_config
         )
-
-        query_calls = []
-
-        def query_side_effect(model):
-            query_calls.append(model)
-            mock_result = MagicMock()
-            mock_filter = MagicMock()
-            mock_order = MagicMock()
-
-            if model.__name__ == "OtpConfiguration":
-                mock_filter.order_by.return_value.first.return_value = mock_otp_config
-            elif query_calls.count(model) == 1:
-                mock_filter.order_by.return_value.first.return_value = mock_sync_auto
-            else:
-                mock_filter.order_by.return_value.first.return_value = mock_sync_manual
-
-            mock_result.filter_by.return_value = mock_filter
-            mock_order.first.return_value = None
-            return mock_result
-
-        mock_db.query.side_effect = query_side_effect
 
         response = client.get("/api/sync-log/latest?otp_config_id=1")
         assert response.status_code == 200
@@ -1293,6 +1368,21 @@ class TestApiSyncLogLatestWithOTPConfigId:
         assert data["manual"]["status"] == "success"
         assert data["manual"]["success_count"] == 5
 
+    @patch("app.SessionLocal")
+    def test_api_sync_log_latest_single_query(self, mock_session, client):
+        """Test que les deux dernières syncs sont lues en une seule requête"""
+        mock_db = MagicMock()
+        mock_session.return_value = mock_db
+        mock_latest_syncs(
+            mock_db, [], otp_config=OtpConfigMock(1, "user123", "doc456")
+        )
+
+        response = client.get("/api/sync-log/latest?otp_config_id=1")
+        assert response.status_code == 200
+
+        queried = [call.args[0].__name__ for call in mock_db.query.call_args_list]
+        assert queried == ["OtpConfiguration", "SyncLog"]
+
     @patch("app.SessionLocal")
     def test_api_sync_log_latest_auto_only(self, mock_session, client):
         """Test retour avec seulement sync auto"""
@@ -1303,25 +1393,7 @@ class TestApiSyncLogLatestWithOTPConfigId:
         mock_sync_auto = SyncLogMock(
             "2026-04-20T10:00:00+00:00", "success", 10, 0, "Sync auto réussie"
         )
-
-        query_count = [0]
-
-        def query_side_effect(model):
-            query_count[0] += 1
-            mock_result = MagicMock()
-            mock_filter = MagicMock()
-
-            if model.__name__ == "OtpConfiguration":
-                mock_filter.order_by.return_value.first.return_value = mock_otp_config
-            elif query_count[0] == 2:
-                mock_filter.order_by.return_value.first.return_value = mock_sync_auto
-            else:
-                mock_filter.order_by.return_value.first.return_value = None
-
-            mock_result.filter_by.return_value = mock_filter
-            return mock_result
-
-        mock_db.query.side_effect = query_side_effect
+        mock_latest_syncs(mock_db, [mock_sync_auto], otp_config=mock_otp_config)
 
         response = client.get("/api/sync-log/latest?otp_config_id=1")
         assert response.status_code == 200
@@ -1338,23 +1410,7 @@ class TestApiSyncLogLatestWithOTPConfigId:
         mock_session.return_value = mock_db
 
         mock_otp_config = OtpConfigMock(1, "user123", "doc456")
-
-        query_count = [0]
-
-        def query_side_effect(model):
-            query_count[0] += 1
-            mock_result = MagicMock()
-            mock_filter = MagicMock()
-            mock_order = MagicMock()
-            if model.__name__ == "OtpConfiguration":
-                mock_order.first.return_value = mock_otp_config
-            else:
-                mock_order.first.return_value = None
-            mock_filter.order_by.return_value = mock_order
-            mock_result.filter_by.return_value = mock_filter
-            return mock_result
-
-        mock_db.query.side_effect = query_side_effect
+        mock_latest_syncs(mock_db, [], otp_config=mock_otp_config)
 
         response = client.get("/api/sync-log/latest?otp_config_id=1")
         assert response.status_code == 200
@@ -1403,10 +1459,8 @@ class TestApiSyncLogLatestWithGristDocId:
             "2026-04-20T14:30:00+00:00", "success", 5, 1, "Sync manuelle réussie"
         )
 
-        mock_db.query.return_value.filter_by.return_value.order_by.return_value.first.side_effect = [
-            mock_sync_auto,
-            mock_sync_manual,
-        ]
+        mock_sync_manual.auto = False
+        mock_latest_syncs(mock_db, [mock_sync_manual, mock_sync_auto])
 
         response = client.get("/api/sync-log/latest?grist_doc_id=1")
         assert response.status_code == 200
@@ -1430,10 +1484,7 @@ class TestApiSyncLogLatestWithGristDocId:
             "2026-04-20T10:00:00+00:00", "success", 10, 0, "Sync auto réussie"
         )
 
-        mock_db.query.return_value.filter_by.return_value.order_by.return_value.first.side_effect = [
-            mock_sync_auto,
-            None,
-        ]
+        mock_latest_syncs(mock_db, [mock_sync_auto])
 
         response = client.get("/api/sync-log/latest?grist_doc_id=1")
         assert response.status_code == 200
@@ -1449,10 +1500,7 @@ class TestApiSyncLogLatestWithGristDocId:
         mock_db = MagicMock()
         mock_session.return_value = mock_db
 
-        mock_db.query.return_value.filter_by.return_value.order_by.return_value.first.side_effect = [
-            None,
-            None,
-        ]
+        mock_latest_syncs(mock_db, [])
 
         response = client.get("/api/sync-log/latest?grist_doc_id=1")
         assert response.status_code == 200
@@ -1468,10 +1516,7 @@ class TestApiSyncLogLatestWithGristDocId:
         mock_db = MagicMock()
         mock_session.return_value = mock_db
 
-        mock_db.query.return_value.filter_by.return_value.order_by.return_value.first.side_effect = [
-            None,
-            None,
-        ]
+        mock_latest_syncs(mock_db, [])
 
         response = client.get("/api/sync-log/latest?grist_doc_id=999")
         assert response.status_code == 200
@@ -1480,3 +1525,71 @@ class TestApiSyncLogLatestWithGristDocId:
         assert data["success"] is True
         assert data["auto"] is None
         assert data["manual"] is None
+
+
+class TestApiSyncReportDaily:
+    """Tests pour la route /api/sync-report/daily"""
+
+    @patch("app.get_daily_summaries")
+    @patch("app.SessionLocal")
+    def test_api_sync_report_daily_success(self, mock_session, mock_summaries, client):
+        """Test retour des agrégats journaliers d'une configuration"""
+        mock_db = MagicMock()
+        mock_session.return_value = mock_db
+        mock_summaries.return_value = [{"day": "2026-05-08", "runs": 2}]
+
+        response = client.get("/api/sync-report/daily?days=7&otp_config_id=1")
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["success"] is True
+        assert data["days"] == [{"day": "2026-05-08", "runs": 2}]
+        mock_summaries.assert_called_once_with(mock_db, 7, otp_config_id=1)
+        mock_db.close.assert_called_once()
+
+    @patch("app.get_daily_summaries")
+    def test_api_sync_report_daily_invalid_days(self, mock_summaries, client):
+        """Test avec une période invalide - 400"""
+        for query in ("days=0", "days=1000", "days=abc"):
+            response = client.get(f"/api/sync-report/daily?{query}")
+            assert response.status_code == 400
+
+        mock_summaries.assert_not_called()
+
+
+class TestApiTaskLogs:
+    """Tests pour la route /api/task/<task_id>/logs"""
+
+    @patch("app.sync_manager.get_task_logs")
+    def test_api_task_logs_success(self, mock_get_logs, client):
+        """Test retour des logs à partir d'un offset"""
+        mock_get_logs.return_value = [{"timestamp": 1.0, "message": "ligne"}]
+
+        response = client.get("/api/task/task_1/logs?offset=5&limit=10")
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["logs"] == [{"timestamp": 1.0, "message": "ligne"}]
+        mock_get_logs.assert_called_once_with("task_1", offset=5, limit=10)
+
+    @patch("app.sync_manager.get_task_logs", return_value=None)
+    def test_api_task_logs_unknown_task(self, _mock_get_logs, client):
+        """Test avec une tâche inconnue - 404"""
+        response = client.get("/api/task/task_999/logs")
+        assert response.status_code == 404
+
+
+class TestMetrics:
+    """Tests pour la route /metrics"""
+
+    @patch("app.scheduled_sync.sync_queue", None)
+    def test_metrics_prometheus_format(self, client):
+        """Test du format texte Prometheus"""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+
+        text = response.get_data(as_text=True)
+        assert "# TYPE otp_sync_runs_total counter" in text
+        assert "# TYPE otp_http_request_duration_seconds histogram" in text
+        assert "otp_sync_queue_pending 0" in text
@@ -76,7 +76,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
 
         # Mock des données retournées par la DB - liste de tuples (fetchall)
         mock_cursor.fetchall.return_value = [
@@ -136,7 +136,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
 
         # Mock : aucune ligne trouvée (fetchall retourne liste vide)
         mock_cursor.fetchall.return_value = []
@@ -185,7 +185,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
 
         # Mock : config existe avec tokens existants
         mock_cursor.fetchone.return_value = [
@@ -248,7 +248,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
         mock_cursor.fetchone.return_value = (5,)
 
         with (
@@ -319,7 +319,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
 
         # Aucune config existante pour copier la clé (SELECT copie) puis id retourné par INSERT
         mock_cursor.fetchone.side_effect = [None, (9,)]
@@ -378,7 +378,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
 
         # SELECT de copie retourne une config existante (clé chiffrée) puis id retourné par INSERT
         mock_cursor.fetchone.side_effect = [("existing_encrypted_grist_key",), (7,)]
@@ -437,7 +437,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
 
         # Mock : config existe avec tokens existants
         mock_cursor.fetchone.return_value = [
@@ -498,7 +498,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
 
         # Config existante avec token DS (le seul conservé)
         mock_cursor.fetchone.return_value = [
@@ -558,7 +558,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
 
         # Config existante avec clé Grist (la seule conservée)
         mock_cursor.fetchone.return_value = [
@@ -619,7 +619,7 @@ class TestConfigManager:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
 
         # Mock : config n'existe pas (None)
         mock_cursor.fetchone.return_value = None
@@ -660,7 +660,7 @@ class TestConfigNormalization:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
         mock_cursor.fetchone.return_value = (8,)
 
         with (
@@ -734,7 +734,7 @@ class TestFetchAndStoreGristUserEmail:
         mock_conn = MagicMock()
         mock_cursor = MagicMock()
         mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_db_manager.get_connection.return_value = mock_conn
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
         return mock_conn, mock_cursor
 
     @patch("configuration.config_manager.DatabaseManager")
@@ -749,7 +749,7 @@ class TestFetchAndStoreGristUserEmail:
 
         assert result is None
         mock_client_class.assert_not_called()
-        mock_db_manager.get_connection.assert_not_called()
+        mock_db_manager.get_pooled_connection.assert_not_called()
 
     @patch("configuration.config_manager.DatabaseManager")
     def test_guard_without_otp_config_id(self, mock_db_manager):
@@ -812,7 +812,7 @@ class TestFetchAndStoreGristUserEmail:
 
         assert result is None
         mock_cursor.execute.assert_not_called()
-        mock_db_manager.get_connection.assert_not_called()
+        mock_db_manager.get_pooled_connection.assert_not_called()
 
     @patch("configuration.config_manager.DatabaseManager")
     def test_db_exception_returns_none(self, mock_db_manager):
@@ -831,3 +831,179 @@ class TestFetchAndStoreGristUserEmail:
 
         assert result is None
         mock_conn.close.assert_called_once()
+
+    @patch("configuration.config_manager.DatabaseManager")
+    def test_memoized_lookup_and_write(self, mock_db_manager):
+        """Même URL et même clé -> un seul appel SCIM et une seule écriture"""
+        mock_conn, mock_cursor = self._mock_db(mock_db_manager)
+        config_manager = ConfigManager("dummy_url")
+
+        with patch("configuration.config_manager.GristClient") as mock_client_class:
+            mock_client_class.return_value.get_grist_user_email.return_value = (
+                "user@example.com"
+            )
+            for _ in range(3):
+                result = config_manager.fetch_and_store_grist_user_email(
+                    42, "https://grist.example.com", "test_key"
+                )
+            # Une autre configuration avec la même clé : écriture sans appel SCIM
+            config_manager.fetch_and_store_grist_user_email(
+                43, "https://grist.example.com/", "test_key"
+            )
+
+        assert result == "user@example.com"
+        mock_client_class.return_value.get_grist_user_email.assert_called_once()
+        assert mock_cursor.execute.call_count == 2
+        assert "test_key" not in str(ConfigManager._grist_email_cache)
+
+    @patch("configuration.config_manager.DatabaseManager")
+    def test_new_api_key_or_invalidation_refetches(self, mock_db_manager):
+        """Nouvelle clé -> nouvel appel SCIM ; invalidate_config -> nouvelle écriture"""
+        mock_conn, mock_cursor = self._mock_db(mock_db_manager)
+        config_manager = ConfigManager("dummy_url")
+
+        with patch("configuration.config_manager.GristClient") as mock_client_class:
+            mock_client_class.return_value.get_grist_user_email.return_value = (
+                "user@example.com"
+            )
+            config_manager.fetch_and_store_grist_user_email(
+                42, "https://grist.example.com", "key_1"
+            )
+            config_manager.fetch_and_store_grist_user_email(
+                42, "https://grist.example.com", "key_2"
+            )
+            assert mock_client_class.return_value.get_grist_user_email.call_count == 2
+            assert mock_cursor.execute.call_count == 1
+
+            config_manager.invalidate_config(42)
+            config_manager.fetch_and_store_grist_user_email(
+                42, "https://grist.example.com", "key_2"
+            )
+
+        assert mock_cursor.execute.call_count == 2
+
+    @patch("configuration.config_manager.time.monotonic")
+    @patch("configuration.config_manager.DatabaseManager")
+    def test_lookup_expires(self, mock_db_manager, mock_monotonic):
+        """L'email est redemandé à Grist après GRIST_EMAIL_CACHE_TTL secondes"""
+        self._mock_db(mock_db_manager)
+        config_manager = ConfigManager("dummy_url")
+
+        with (
+            patch("configuration.config_manager.GRIST_EMAIL_CACHE_TTL", 3600),
+            patch("configuration.config_manager.GristClient") as mock_client_class,
+        ):
+            mock_client_class.return_value.get_grist_user_email.return_value = (
+                "user@example.com"
+            )
+            mock_monotonic.return_value = 0
+            config_manager.fetch_and_store_grist_user_email(
+                42, "https://grist.example.com", "test_key"
+            )
+            mock_monotonic.return_value = 3601
+            config_manager.fetch_and_store_grist_user_email(
+                42, "https://grist.example.com", "test_key"
+            )
+
+        assert mock_client_class.return_value.get_grist_user_email.call_count == 2
+
+
+def config_row(otp_config_id, demarche_number="12345"):
+    """Ligne otp_configurations telle que retournée par la base"""
+    return (
+        otp_config_id,
+        "encrypted_token",
+        demarche_number,
+        "https://test.grist.com",
+        "encrypted_key",
+        "test_doc",
+        "test_user",
+        "",
+        "",
+        "",
+        "",
+    )
+
+
+class TestConfigCache:
+    """Tests du cache des configurations déchiffrées"""
+
+    def _mock_db(self, mock_db_manager):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_db_manager.get_pooled_connection.return_value = mock_conn
+        return mock_cursor
+
+    @patch("configuration.config_manager.DatabaseManager")
+    def test_load_config_by_id_cached(self, mock_db_manager):
+        """Une seule requête et un seul déchiffrement pour deux chargements"""
+        mock_cursor = self._mock_db(mock_db_manager)
+        mock_cursor.fetchone.return_value = config_row(1)
+
+        with patch.object(
+            ConfigManager, "decrypt_value", side_effect=lambda x: f"decrypted_{x}"
+        ) as mock_decrypt:
+            first = ConfigManager("dummy_url").load_config_by_id(1)
+            # Le cache est partagé entre instances
+            second = ConfigManager("dummy_url").load_config_by_id(1)
+
+        assert first == second
+        assert second["ds_api_token"] == "decrypted_encrypted_token"
+        mock_cursor.execute.assert_called_once()
+        assert mock_decrypt.call_count == 2
+
+        # Les appelants reçoivent une copie
+        first["demarche_number"] = "modifié"
+        assert ConfigManager("dummy_url").load_config_by_id(1)["demarche_number"] == (
+            "12345"
+        )
+
+    @patch("configuration.config_manager.time.monotonic")
+    @patch("configuration.config_manager.DatabaseManager")
+    def test_cache_expires(self, mock_db_manager, mock_monotonic):
+        """La configuration est relue après CONFIG_CACHE_TTL secondes"""
+        mock_cursor = self._mock_db(mock_db_manager)
+        mock_cursor.fetchone.return_value = config_row(1)
+        config_manager = ConfigManager("dummy_url")
+
+        with (
+            patch("configuration.config_manager.CONFIG_CACHE_TTL", 60),
+            patch.object(ConfigManager, "decrypt_value", side_effect=lambda x: x),
+        ):
+            mock_monotonic.return_value = 100
+            config_manager.load_config_by_id(1)
+            mock_monotonic.return_value = 159
+            config_manager.load_config_by_id(1)
+            assert mock_cursor.execute.call_count == 1
+
+            mock_monotonic.return_value = 161
+            config_manager.load_config_by_id(1)
+            assert mock_cursor.execute.call_count == 2
+
+    @patch("configuration.config_manager.DatabaseManager")
+    def test_save_and_invalidate(self, mock_db_manager):
+        """save_config et invalidate_config retirent la configuration du cache"""
+        mock_cursor = self._mock_db(mock_db_manager)
+        mock_cursor.fetchone.return_value = config_row(1)
+        config_manager = ConfigManager("dummy_url")
+
+        with (
+            patch.object(ConfigManager, "decrypt_value", side_effect=lambda x: x),
+            patch.object(ConfigManager, "encrypt_value", side_effect=lambda x: x),
+            patch.object(ConfigManager, "fetch_and_store_grist_user_email"),
+        ):
+            config_manager.load_config_by_id(1)
+            assert config_manager.save_config(
+                {
+                    "otp_config_id": 1,
+                    "demarche_number": "999",
+                    "grist_doc_id": "test_doc",
+                    "grist_user_id": "test_user",
+                }
+            )
+            assert config_manager._get_cached_config(1) is None
+
+            config_manager.load_config_by_id(1)
+            config_manager.invalidate_config(1)
+            assert config_manager._get_cached_config(1) is None
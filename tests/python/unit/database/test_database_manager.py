@@ -105,6 +105,43 @@ class TestDatabaseManager(unittest.TestCase):
             "La migration doit contenir la colonne grist_user_email",
         )
 
+    def test_create_table_creates_sync_logs_indexes(self):
+        """Test que la migration crée les index des routes de suivi"""
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchone.side_effect = [[1], [1]]
+
+        DatabaseManager.create_table_if_not_exists(mock_conn)
+
+        executed_sql = " ".join(
+            str(call.args[0]) for call in mock_cursor.execute.call_args_list
+        )
+        self.assertIn(
+            "ON sync_logs (grist_doc_id, auto, timestamp DESC)", executed_sql
+        )
+        self.assertIn(
+            "ON sync_logs (otp_config_id, auto, timestamp DESC)", executed_sql
+        )
+        self.assertIn("ON sync_logs (timestamp)", executed_sql)
+        self.assertIn("ON user_schedules (otp_config_id)", executed_sql)
+
+    def test_create_table_creates_daily_summaries(self):
+        """Test que la migration crée la table des agrégats journaliers"""
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
+        mock_cursor.fetchone.side_effect = [[1], [1]]
+
+        DatabaseManager.create_table_if_not_exists(mock_conn)
+
+        executed_sql = " ".join(
+            str(call.args[0]) for call in mock_cursor.execute.call_args_list
+        )
+        self.assertIn(
+            "CREATE TABLE IF NOT EXISTS sync_log_daily_summaries", executed_sql
+        )
+
     def test_create_table_if_not_exists_is_idempotent(self):
         """Test que l'exécution répétée de la migration ne provoque pas d'erreur"""
         mock_conn = MagicMock()
@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+from database import engine as engine_module
+from database.database_manager import DatabaseManager
+from database.engine import DB_MAX_OVERFLOW, DB_POOL_SIZE, get_engine
+
+
+class TestGetEngine:
+    def test_same_engine_for_same_url(self):
+        """Un seul moteur par URL dans le processus"""
+        assert get_engine() is get_engine()
+        assert get_engine() is engine_module.engine
+
+    def test_pool_sized_from_configuration(self):
+        """Le pool utilise la taille et le débordement configurés"""
+        pool = get_engine().pool
+
+        assert pool.size() == DB_POOL_SIZE
+        assert pool._max_overflow == DB_MAX_OVERFLOW
+
+
+class TestGetPooledConnection:
+    @patch("database.database_manager.get_engine")
+    def test_borrows_from_pool(self, mock_get_engine):
+        """La connexion est empruntée au moteur partagé"""
+        conn = DatabaseManager.get_pooled_connection("test_url")
+
+        mock_get_engine.assert_called_once_with("test_url")
+        assert conn is mock_get_engine.return_value.raw_connection.return_value
+
+    @patch("database.database_manager.get_engine")
+    def test_failure_returns_none(self, mock_get_engine):
+        """Échec de connexion -> None, comme get_connection"""
+        mock_get_engine.return_value.raw_connection.side_effect = Exception("boom")
+
+        assert DatabaseManager.get_pooled_connection("test_url") is None
@@ -230,6 +230,33 @@ class TestGetSyncMetadata:
         assert result["last_sync_at"] == "2024-01-01"
         assert result["force_full_sync"] is True
 
+    def test_returns_checkpoint_fields(self):
+        """Les champs de checkpoint sont retournés"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "records": [
+                {
+                    "id": 1,
+                    "fields": {
+                        "demarche_number": 123,
+                        "checkpoint_key": "abc",
+                        "checkpoint_page_cursor": "cursor",
+                        "checkpoint_last_dossier": 42,
+                    },
+                },
+            ]
+        }
+        with patch(
+            "grist.client.requests.get",
+            return_value=mock_response,
+        ):
+            result = self.client.get_sync_metadata(123)
+        assert result["checkpoint_key"] == "abc"
+        assert result["checkpoint_page_cursor"] == "cursor"
+        assert result["checkpoint_last_dossier"] == 42
+        assert result["checkpoint_at"] is None
+
     def test_returns_none_if_no_match(self):
         """200 sans démarche correspondante -> None"""
         mock_response = MagicMock()
@@ -557,6 +584,15 @@ class TestCreateTable:
         payload = mock_post.call_args.kwargs["json"]
         assert payload["tables"][0]["id"] == "t"
 
+    def test_success_records_created_columns(self):
+        """table créée -> colonnes mémorisées sous l'ID renvoyé par Grist"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"tables": [{"id": "T"}]}
+        with patch("grist.client.requests.post", return_value=mock_response):
+            self.client.create_table("t", [{"id": "dossier_id", "type": "Text"}])
+        assert self.client.created_columns == {"T": {"dossier_id"}}
+
 
 class TestCreateOrClearGristTables:
     """Tests unitaires pour GristClient.create_or_clear_grist_tables"""
@@ -726,3 +762,168 @@ class TestUpsertMultipleDossiersInGrist:
         client = GristClient("https://grist.example.com", "test_key")
         with pytest.raises(ValueError):
             client.upsert_multiple_dossiers_in_grist("dossiers", [])
+
+
+class TestUpsertAvisInGrist:
+    """Tests unitaires pour GristClient.upsert_avis_in_grist"""
+
+    def setup_method(self):
+        self.client = GristClient(
+            "https://grist.example.com", "test_key", doc_id="doc123"
+        )
+
+    def test_uses_cache_and_updates_it_in_place(self):
+        """cache fourni -> aucune lecture de la table, IDs créés ajoutés au cache"""
+        column_cache = MagicMock()
+        column_cache.get_columns.return_value = {"avis_id", "question"}
+        update_response = MagicMock()
+        update_response.status_code = 200
+        create_response = MagicMock()
+        create_response.status_code = 200
+        create_response.json.return_value = {"records": [{"id": 11}]}
+        cache = {"A1": 10}
+
+        with (
+            patch("grist.client.requests.get") as mock_get,
+            patch(
+                "grist.client.requests.patch", return_value=update_response
+            ) as mock_patch,
+            patch(
+                "grist.client.requests.post", return_value=create_response
+            ) as mock_post,
+        ):
+            result = self.client.upsert_avis_in_grist(
+                "avis",
+                [
+                    {"avis_id": "A1", "question": "q1"},
+                    {"avis_id": "A2", "question": "q2", "inconnue": "x"},
+                ],
+                existing_records=cache,
+                column_cache=column_cache,
+            )
+
+        assert result == (2, 0)
+        mock_get.assert_not_called()
+        assert mock_patch.call_args.kwargs["json"]["records"] == [
+            {"id": 10, "fields": {"avis_id": "A1", "question": "q1"}}
+        ]
+        assert mock_post.call_args.kwargs["json"]["records"] == [
+            {"fields": {"avis_id": "A2", "question": "q2"}}
+        ]
+        assert cache == {"A1": 10, "A2": 11}
+
+    def test_failed_creation_counted(self):
+        """échec de création -> compté en erreur, cache inchangé"""
+        column_cache = MagicMock()
+        column_cache.get_columns.return_value = {"avis_id"}
+        create_response = MagicMock()
+        create_response.status_code = 500
+        create_response.text = "err"
+        empty = MagicMock()
+        empty.status_code = 200
+        empty.json.return_value = {"records": []}
+        cache = {}
+
+        with (
+            patch("grist.client.requests.get", return_value=empty),
+            patch("grist.client.requests.post", return_value=create_response),
+        ):
+            result = self.client.upsert_avis_in_grist(
+                "avis", [{"avis_id": "A1"}], existing_records=cache, column_cache=column_cache
+            )
+
+        assert result == (0, 1)
+        assert cache == {}
+
+
+class TestUpsertRecordsByKey:
+    """Tests unitaires pour GristClient.upsert_records_by_key"""
+
+    def test_writes_in_chunks(self):
+        """les créations sont envoyées par lots de chunk_size"""
+        client = GristClient("https://grist.example.com", "test_key", doc_id="doc123")
+        column_cache = MagicMock()
+        column_cache.get_columns.return_value = {"avis_id"}
+
+        def create(url, headers, json):
+            response = MagicMock()
+            response.status_code = 200
+            response.json.return_value = {
+                "records": [{"id": i} for i in range(len(json["records"]))]
+            }
+            return response
+
+        empty = MagicMock()
+        empty.status_code = 200
+        empty.json.return_value = {"records": []}
+
+        with (
+            patch("grist.client.requests.get", return_value=empty),
+            patch("grist.client.requests.post", side_effect=create) as mock_post,
+        ):
+            result = client.upsert_records_by_key(
+                "avis",
+                [{"avis_id": f"A{i}"} for i in range(5)],
+                key_fields=("avis_id",),
+                existing_records={},
+                column_cache=column_cache,
+                chunk_size=2,
+            )
+
+        assert result == (5, 0)
+        assert [len(c.kwargs["json"]["records"]) for c in mock_post.call_args_list] == [2, 2, 1]
+
+    def test_empty_cache_after_failed_fetch_is_reloaded(self):
+        """un cache vidé par une lecture en échec est relu : pas de doublons"""
+        client = GristClient("https://grist.example.com", "test_key", doc_id="doc123")
+        column_cache = MagicMock()
+        column_cache.get_columns.return_value = {"dossier_number"}
+
+        failed = MagicMock()
+        failed.status_code = 500
+        failed.text = "Internal Server Error"
+        loaded = MagicMock()
+        loaded.status_code = 200
+        loaded.json.return_value = {
+            "records": [{"id": 7, "fields": {"dossier_number": 123}}]
+        }
+        patched = MagicMock()
+        patched.status_code = 200
+
+        with (
+            patch("grist.client.requests.get", side_effect=[failed, loaded]),
+            patch("grist.client.requests.post") as mock_post,
+            patch("grist.client.requests.patch", return_value=patched) as mock_patch,
+        ):
+            cache = client.get_existing_dossier_numbers("dossiers")
+            result = client.upsert_records_by_key(
+                "dossiers",
+                [{"dossier_number": 123}],
+                key_fields=("dossier_number", "number"),
+                existing_records=cache,
+                column_cache=column_cache,
+            )
+
+        assert cache == {"123": 7}
+        assert result == (1, 0)
+        mock_post.assert_not_called()
+        assert mock_patch.call_args.kwargs["json"]["records"][0]["id"] == 7
+
+
+class TestGetExistingRecordsByKey:
+    """Tests unitaires pour GristClient.get_existing_records_by_key"""
+
+    def test_maps_key_to_row_id(self):
+        """construit {clé: id} en ignorant les lignes sans clé"""
+        client = GristClient("https://grist.example.com", "test_key", doc_id="doc123")
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {
+            "records": [
+                {"id": 1, "fields": {"avis_id": "A1"}},
+                {"id": 2, "fields": {"avis_id": None}},
+            ]
+        }
+
+        with patch("grist.client.requests.get", return_value=response):
+            assert client.get_existing_records_by_key("avis", ("avis_id",)) == {"A1": 1}
@@ -7,6 +7,7 @@ Ces tests couvrent :
 - Le calcul des créations, mises à jour et suppressions
 - La lecture de la table Grist et son comportement en erreur
 - L'orchestration complète de sync_instructeurs
+- Le saut de la comparaison lorsque l'empreinte DN est inchangée
 """
 
 from unittest.mock import MagicMock, patch
@@ -21,6 +22,15 @@ from sync.tasks.instructeurs import (
     _fetch_existing_records,
     sync_instructeurs,
 )
+from utils.state_store import StateStore
+
+
+@pytest.fixture(autouse=True)
+def state_store(tmp_path):
+    """Stockage local isolé pour chaque test"""
+    store = StateStore(str(tmp_path / "state.sqlite3"))
+    with patch("sync.tasks.instructeurs.get_state_store", return_value=store):
+        yield store
 
 
 def create_mock_client():
@@ -309,3 +319,39 @@ class TestSyncInstructeurs:
             sync_instructeurs(
                 create_mock_client(), "Table_1", 12345, MagicMock(), MagicMock()
             )
+
+    @patch("sync.tasks.instructeurs.requests.post")
+    @patch("sync.tasks.instructeurs.requests.get")
+    @patch("sync.tasks.instructeurs.extract_instructeurs_from_demarche")
+    def test_sync_instructeurs_unchanged_digest_skips_grist(
+        self, mock_extract, mock_get, mock_post
+    ):
+        """Test qu'une liste DN inchangée ne relit pas la table Grist"""
+        mock_extract.return_value = [make_instructeur()]
+        mock_get.return_value = create_mock_response(json_data={"records": []})
+        mock_post.return_value = create_mock_response()
+        client = create_mock_client()
+
+        sync_instructeurs(client, "Table_1", 12345, MagicMock(), MagicMock())
+        result = sync_instructeurs(client, "Table_1", 12345, MagicMock(), MagicMock())
+
+        assert mock_get.call_count == 1
+        assert mock_post.call_count == 1
+        assert result == {"total": 1, "created": 0, "updated": 0, "deleted": 0}
+
+    @patch("sync.tasks.instructeurs.requests.post")
+    @patch("sync.tasks.instructeurs.requests.get")
+    @patch("sync.tasks.instructeurs.extract_instructeurs_from_demarche")
+    def test_sync_instructeurs_failed_write_keeps_diff(
+        self, mock_extract, mock_get, mock_post
+    ):
+        """Test qu'une écriture en échec n'enregistre pas l'empreinte"""
+        mock_extract.return_value = [make_instructeur()]
+        mock_get.return_value = create_mock_response(json_data={"records": []})
+        mock_post.return_value = create_mock_response(status_code=500, text="error")
+        client = create_mock_client()
+
+        sync_instructeurs(client, "Table_1", 12345, MagicMock(), MagicMock())
+        sync_instructeurs(client, "Table_1", 12345, MagicMock(), MagicMock())
+
+        assert mock_get.call_count == 2
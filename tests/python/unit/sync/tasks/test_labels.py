@@ -6,6 +6,7 @@ Ces tests couvrent :
 - La lecture de l'état actuel dans Grist et son comportement en erreur
 - L'envoi des mises à jour par lots
 - L'orchestration complète de sync_labels_for_demarche
+- La réutilisation des empreintes de labels d'une exécution à l'autre
 """
 
 import json
@@ -16,10 +17,20 @@ import pytest
 from sync.tasks.labels import (
     BATCH_SIZE,
     _build_label_fields,
+    _chunk_records,
     _fetch_existing_labels,
     _patch_records,
     sync_labels_for_demarche,
 )
+from utils.state_store import StateStore
+
+
+@pytest.fixture(autouse=True)
+def state_store(tmp_path):
+    """Stockage local isolé pour chaque test"""
+    store = StateStore(str(tmp_path / "state.sqlite3"))
+    with patch("sync.tasks.labels.get_state_store", return_value=store):
+        yield store
 
 
 def create_mock_client():
@@ -207,6 +218,26 @@ class TestPatchRecords:
         log_error.assert_called_once()
 
 
+class TestChunkRecords:
+    """Tests unitaires pour la fonction _chunk_records"""
+
+    def test_chunk_records_bounded_by_bytes(self):
+        """Test qu'un lot est fermé avant de dépasser la taille maximale"""
+        records = [{"id": i, "fields": {"labels_json": "x" * 100}} for i in range(5)]
+
+        batches = list(_chunk_records(records, max_records=10, max_bytes=300))
+
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+
+    def test_chunk_records_oversized_record_alone(self):
+        """Test qu'un enregistrement trop gros est envoyé seul"""
+        records = [{"id": 1, "fields": {"labels_json": "x" * 500}}, {"id": 2}]
+
+        batches = list(_chunk_records(records, max_records=10, max_bytes=100))
+
+        assert [len(batch) for batch in batches] == [1, 1]
+
+
 class TestSyncLabelsForDemarche:
     """Tests unitaires pour la fonction sync_labels_for_demarche"""
 
@@ -318,3 +349,153 @@ class TestSyncLabelsForDemarche:
             )
 
         mock_dn.assert_not_called()
+
+    @patch("sync.tasks.labels.get_demarche_dossiers_labels_only")
+    @patch("sync.tasks.labels.requests.patch")
+    @patch("sync.tasks.labels.requests.get")
+    def test_sync_labels_second_run_uses_fingerprints(
+        self, mock_get, mock_patch, mock_dn
+    ):
+        """Test qu'une seconde exécution ne relit pas Grist et ne repatche rien"""
+        mock_get.return_value = create_mock_response(
+            json_data={
+                "records": [
+                    {
+                        "id": 10,
+                        "fields": {
+                            "dossier_number": 111,
+                            "label_names": "",
+                            "labels_json": "",
+                        },
+                    }
+                ]
+            }
+        )
+        mock_patch.return_value = create_mock_response()
+        mock_dn.return_value = [
+            {"number": 111, "labels": [{"id": "l1", "name": "X", "color": "red"}]}
+        ]
+        client = create_mock_client()
+
+        first = sync_labels_for_demarche(
+            client, "Table_1", 12345, MagicMock(), MagicMock()
+        )
+        second = sync_labels_for_demarche(
+            client, "Table_1", 12345, MagicMock(), MagicMock()
+        )
+
+        assert first["updated"] == 1
+        assert second["updated"] == 0
+        assert second["checked"] == 1
+        assert mock_get.call_count == 1
+        assert mock_patch.call_count == 1
+
+    @patch("sync.tasks.labels.get_demarche_dossiers_labels_only")
+    @patch("sync.tasks.labels.requests.patch")
+    @patch("sync.tasks.labels.requests.get")
+    def test_sync_labels_reloads_for_unknown_dossier(
+        self, mock_get, mock_patch, mock_dn, state_store
+    ):
+        """Test qu'un dossier absent des empreintes provoque une relecture de Grist"""
+        state_store.set(
+            "label_fingerprints", "doc123:Table_1", {"111": [10, "empreinte"]}
+        )
+        mock_get.return_value = create_mock_response(
+            json_data={
+                "records": [
+                    {
+                        "id": 10,
+                        "fields": {
+                            "dossier_number": 111,
+                            "label_names": "",
+                            "labels_json": "",
+                        },
+                    },
+                    {
+                        "id": 11,
+                        "fields": {
+                            "dossier_number": 222,
+                            "label_names": "",
+                            "labels_json": "",
+                        },
+                    },
+                ]
+            }
+        )
+        mock_dn.return_value = [
+            {"number": 111, "labels": []},
+            {"number": 222, "labels": []},
+        ]
+
+        result = sync_labels_for_demarche(
+            create_mock_client(), "Table_1", 12345, MagicMock(), MagicMock()
+        )
+
+        assert mock_get.call_count == 1
+        assert result["missing_in_grist"] == 0
+        assert result["updated"] == 0
+        mock_patch.assert_not_called()
+
+    @patch("sync.tasks.labels.get_demarche_dossiers_labels_only")
+    @patch("sync.tasks.labels.requests.patch")
+    @patch("sync.tasks.labels.requests.get")
+    def test_sync_labels_filtered_dossiers_do_not_force_reload(
+        self, mock_get, mock_patch, mock_dn
+    ):
+        """Test que les dossiers écartés par les filtres ne forcent pas de relecture"""
+        mock_get.return_value = create_mock_response(
+            json_data={
+                "records": [
+                    {
+                        "id": 10,
+                        "fields": {
+                            "dossier_number": 111,
+                            "label_names": "",
+                            "labels_json": "",
+                        },
+                    }
+                ]
+            }
+        )
+        # 222 n'est pas synchronisé dans Grist (filtre de statut, par exemple)
+        mock_dn.return_value = [
+            {"number": 111, "labels": []},
+            {"number": 222, "labels": []},
+        ]
+        client = create_mock_client()
+
+        first = sync_labels_for_demarche(
+            client, "Table_1", 12345, MagicMock(), MagicMock()
+        )
+        second = sync_labels_for_demarche(
+            client, "Table_1", 12345, MagicMock(), MagicMock()
+        )
+
+        assert first["missing_in_grist"] == second["missing_in_grist"] == 1
+        assert mock_get.call_count == 1
+        mock_patch.assert_not_called()
+
+        # Un nouveau dossier, lui, provoque une relecture
+        mock_dn.return_value.append({"number": 333, "labels": []})
+        sync_labels_for_demarche(client, "Table_1", 12345, MagicMock(), MagicMock())
+        assert mock_get.call_count == 2
+
+    @patch("sync.tasks.labels.get_demarche_dossiers_labels_only")
+    @patch("sync.tasks.labels.requests.patch")
+    @patch("sync.tasks.labels.requests.get")
+    def test_sync_labels_patch_error_invalidates_cache(
+        self, mock_get, mock_patch, mock_dn, state_store
+    ):
+        """Test qu'un échec de PATCH sur des empreintes en cache les invalide"""
+        state_store.set(
+            "label_fingerprints", "doc123:Table_1", {"111": [10, "empreinte"]}
+        )
+        mock_patch.return_value = create_mock_response(status_code=400, text="error")
+        mock_dn.return_value = [{"number": 111, "labels": []}]
+
+        sync_labels_for_demarche(
+            create_mock_client(), "Table_1", 12345, MagicMock(), MagicMock()
+        )
+
+        mock_get.assert_not_called()
+        assert state_store.get("label_fingerprints", "doc123:Table_1") is None
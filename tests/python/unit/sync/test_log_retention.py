@@ -0,0 +1,173 @@
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+
+from sync import log_retention
+from sync.log_retention import (
+    get_daily_summaries,
+    prune_sync_logs,
+    rollup_sync_logs,
+    run_sync_logs_retention,
+)
+
+TODAY = date(2026, 5, 10)
+
+
+def make_db(last_summary_day=None, first_log_day=None, rowcount=0, rows=None):
+    """
+    Session simulée : répond aux requêtes du module selon leur texte.
+    rows associe un fragment de requête aux lignes retournées par .all()
+    """
+    db = MagicMock()
+    rows = rows or {}
+
+    def execute(statement, params=None):
+        sql = str(statement)
+        result = MagicMock()
+        if "MAX(day)" in sql:
+            result.scalar.return_value = last_summary_day
+        elif "MIN(CAST(timestamp AS DATE))" in sql:
+            result.scalar.return_value = first_log_day
+        else:
+            result.rowcount = rowcount
+            result.all.return_value = next(
+                (value for fragment, value in rows.items() if fragment in sql), []
+            )
+        return result
+
+    db.execute.side_effect = execute
+    return db
+
+
+def executed(db):
+    """(requête, paramètres) des appels à execute"""
+    return [
+        (str(call.args[0]), call.args[1] if len(call.args) > 1 else None)
+        for call in db.execute.call_args_list
+    ]
+
+
+class TestRollupSyncLogs:
+    def test_starts_after_last_summary(self):
+        """L'agrégation reprend au lendemain du dernier jour agrégé"""
+        db = make_db(last_summary_day=date(2026, 5, 7), rowcount=3)
+
+        assert rollup_sync_logs(db, until=TODAY) == 3
+
+        sql, params = executed(db)[-1]
+        assert sql.startswith("INSERT INTO sync_log_daily_summaries")
+        assert params == {
+            "start": datetime(2026, 5, 8),
+            "end": datetime(2026, 5, 10),
+        }
+
+    def test_first_rollup_starts_at_oldest_log(self):
+        """Sans agrégat, l'agrégation part du plus ancien log"""
+        db = make_db(first_log_day=date(2025, 1, 1), rowcount=1)
+
+        rollup_sync_logs(db, until=TODAY)
+
+        assert executed(db)[-1][1]["start"] == datetime(2025, 1, 1)
+
+    def test_nothing_to_rollup(self):
+        """Aucune insertion si tout est déjà agrégé ou sans logs"""
+        assert rollup_sync_logs(make_db(), until=TODAY) == 0
+
+        db = make_db(last_summary_day=date(2026, 5, 9))
+        assert rollup_sync_logs(db, until=TODAY) == 0
+        assert not any("INSERT" in sql for sql, _ in executed(db))
+
+
+class TestPruneSyncLogs:
+    def test_never_prunes_unsummarized_days(self):
+        """La purge s'arrête au premier jour non agrégé"""
+        db = make_db(last_summary_day=date(2026, 1, 4), rowcount=12)
+
+        assert prune_sync_logs(db, before=date(2026, 2, 1)) == 12
+        assert executed(db)[-1][1] == {"cutoff": datetime(2026, 1, 5)}
+
+    def test_prunes_up_to_retention_window(self):
+        """Les lignes dans la fenêtre de rétention sont conservées"""
+        db = make_db(last_summary_day=date(2026, 5, 9))
+
+        prune_sync_logs(db, before=date(2026, 2, 9))
+
+        assert executed(db)[-1][1] == {"cutoff": datetime(2026, 2, 9)}
+
+    def test_no_summary_no_prune(self):
+        """Sans agrégat, aucune ligne brute n'est supprimée"""
+        db = make_db()
+
+        assert prune_sync_logs(db, before=TODAY) == 0
+        assert not any("DELETE" in sql for sql, _ in executed(db))
+
+
+class TestRunSyncLogsRetention:
+    @patch("sync.log_retention._today", return_value=TODAY)
+    @patch("sync.log_retention.SessionLocal")
+    def test_rollup_and_prune_in_one_transaction(self, mock_session, _):
+        """Agrégation et purge sont validées ensemble"""
+        db = make_db(last_summary_day=date(2026, 5, 8))
+        mock_session.return_value = db
+
+        with patch.object(log_retention, "SYNC_LOGS_RETENTION_DAYS", 30):
+            run_sync_logs_retention()
+
+        statements = [sql for sql, _ in executed(db)]
+        assert any(sql.startswith("INSERT") for sql in statements)
+        assert executed(db)[-1][1] == {"cutoff": datetime(2026, 4, 10)}
+        db.commit.assert_called_once()
+        db.close.assert_called_once()
+
+    @patch("sync.log_retention._today", return_value=TODAY)
+    @patch("sync.log_retention.SessionLocal")
+    def test_error_rolls_back(self, mock_session, _):
+        """Une erreur annule la transaction sans lever d'exception"""
+        db = MagicMock()
+        db.execute.side_effect = Exception("boom")
+        mock_session.return_value = db
+
+        run_sync_logs_retention()
+
+        db.rollback.assert_called_once()
+        db.commit.assert_not_called()
+        db.close.assert_called_once()
+
+
+class TestGetDailySummaries:
+    @patch("sync.log_retention._today", return_value=TODAY)
+    def test_reads_rollup_then_raw_logs(self, _):
+        """Les journées agrégées viennent de la table d'agrégats, les suivantes des logs"""
+        summary = (date(2026, 5, 8), 1, "doc", "user", "123", 2, 2, 0, 10.0, 12.0, 5, 0)
+        live = (date(2026, 5, 10), 1, "doc", "user", "123", 1, 0, 1, 3.0, 3.0, 0, 4)
+        db = make_db(
+            last_summary_day=date(2026, 5, 9),
+            rows={"FROM sync_log_daily_summaries": [summary], "FROM sync_logs": [live]},
+        )
+
+        summaries = get_daily_summaries(db, days=7, otp_config_id=1)
+
+        assert [s["day"] for s in summaries] == ["2026-05-08", "2026-05-10"]
+        assert summaries[0]["runs"] == 2
+        assert summaries[1]["errors"] == 1
+
+        (rollup_sql, rollup_params), (raw_sql, raw_params) = executed(db)[1:]
+        assert "FROM sync_log_daily_summaries" in rollup_sql
+        assert rollup_params == {
+            "otp_config_id": 1,
+            "start": date(2026, 5, 4),
+            "end": date(2026, 5, 10),
+        }
+        assert "FROM sync_logs" in raw_sql
+        assert raw_params["start"] == datetime(2026, 5, 10)
+
+    @patch("sync.log_retention._today", return_value=TODAY)
+    def test_recent_range_skips_rollup(self, _):
+        """Une période entièrement postérieure aux agrégats ne lit que les logs"""
+        db = make_db(last_summary_day=date(2026, 5, 1))
+
+        get_daily_summaries(db, days=3)
+
+        statements = [sql for sql, _ in executed(db)]
+        assert len(statements) == 2
+        assert "FROM sync_logs" in statements[1]
+        assert "otp_config_id = :otp_config_id" not in statements[1]
@@ -0,0 +1,79 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from sync import metrics
+from sync.metrics import record_sync, render_metrics
+
+CONFIG = {"otp_config_id": 7, "demarche_number": "123"}
+LABELS = {"otp_config_id": 7, "demarche": "123"}
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    """Registre vide pour chaque test"""
+    for metric in metrics.registry._metrics:
+        metric.clear()
+
+
+class TestRecordSync:
+    def test_sync_result(self):
+        """Durée, débit et résultat de la synchronisation"""
+        record_sync(
+            CONFIG, {"success": True, "success_count": 18, "error_count": 2}, 4.0
+        )
+
+        assert metrics.sync_last_duration.value(**LABELS) == 4.0
+        assert metrics.sync_dossiers_per_second.value(**LABELS) == 5.0
+        assert metrics.sync_runs.value(status="success", auto="false", **LABELS) == 1
+        assert metrics.sync_dossiers.value(result="error", **LABELS) == 2
+
+    def test_events(self):
+        """Requêtes HTTP et lignes Grist viennent des événements du script"""
+        events = [
+            {
+                "type": "http_stats",
+                "services": {
+                    "ds": {
+                        "count": 3,
+                        "sum": 1.5,
+                        "retries": 1,
+                        "buckets": [0, 0, 0, 3, 0, 0, 0, 0, 0, 0, 0],
+                    }
+                },
+            },
+            {"type": "rows", "table": "Dossiers", "created": 2, "updated": 5},
+            {"type": "rows", "table": "Dossiers", "created": 1, "skipped": 1},
+        ]
+
+        record_sync(CONFIG, {"success": False}, 2.0, events, auto=True)
+
+        assert metrics.http_requests.value(service="ds", **LABELS) == 3
+        assert metrics.http_retries.value(service="ds", **LABELS) == 1
+        assert metrics.grist_rows.value(
+            table="Dossiers", operation="created", **LABELS
+        ) == 3
+        assert metrics.grist_rows.value(
+            table="Dossiers", operation="skipped", **LABELS
+        ) == 1
+        assert metrics.sync_runs.value(status="error", auto="true", **LABELS) == 1
+        assert (
+            'otp_http_request_duration_seconds_count{otp_config_id="7",'
+            'demarche="123",service="ds"} 3' in render_metrics()
+        )
+
+
+class TestRenderMetrics:
+    def test_queue_and_tasks(self):
+        """État de la file et des tâches lu au moment du rendu"""
+        queue = MagicMock(max_concurrency=4)
+        queue.pending.return_value = [1, 2, 3]
+        queue.running.return_value = [4]
+        manager = MagicMock()
+        manager.count_running_tasks.return_value = 2
+
+        text = render_metrics(queue, manager)
+
+        assert "otp_sync_queue_pending 3\n" in text
+        assert "otp_sync_queue_utilisation_ratio 0.25\n" in text
+        assert "otp_sync_tasks_running 2\n" in text
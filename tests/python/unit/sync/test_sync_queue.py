@@ -0,0 +1,201 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from sync.sync_queue import SyncQueue, TokenBucket
+
+
+class FakeClock:
+    """Horloge manuelle pour tester les budgets sans attendre"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    def test_capacity_then_refill(self):
+        """Les jetons s'épuisent puis se rechargent au rythme configuré"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+
+        assert bucket.try_acquire()
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        assert bucket.wait_time() == 1
+
+        clock.now = 1
+        assert bucket.try_acquire()
+
+    def test_refill_capped_at_capacity(self):
+        """Le rechargement ne dépasse jamais la capacité"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=1, clock=clock)
+        clock.now = 100
+
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+    def test_zero_rate_never_refills(self):
+        """Un budget à zéro retourne une attente infinie"""
+        bucket = TokenBucket(rate=0, capacity=0, clock=FakeClock())
+
+        assert not bucket.available()
+        assert bucket.wait_time() == float("inf")
+
+
+class TestSyncQueue:
+    def _run_all(self, queue, items):
+        """Soumet tous les éléments avant de laisser le dispatcher démarrer"""
+        with queue._condition:
+            for otp_config_id, cost, grist_host in items:
+                queue.submit(otp_config_id, cost, "ds.example", grist_host)
+        assert queue.wait_until_idle(timeout=5)
+
+    def test_orders_by_estimated_cost(self):
+        """Les synchronisations les moins coûteuses passent en premier"""
+        order = []
+        queue = SyncQueue(
+            run_sync=order.append,
+            max_concurrency=1,
+            ds_starts_per_minute=6000,
+            grist_starts_per_minute=6000,
+            burst=10,
+        )
+
+        self._run_all(
+            queue,
+            [(1, 3600, "grist.a"), (2, 30, "grist.a"), (3, 600, "grist.a")],
+        )
+
+        assert order == [2, 3, 1]
+
+    def test_exhausted_grist_host_does_not_block_others(self):
+        """Un hôte Grist sans budget ne bloque pas les autres hôtes"""
+        order = []
+        queue = SyncQueue(
+            run_sync=order.append,
+            max_concurrency=1,
+            ds_starts_per_minute=6000,
+            grist_starts_per_minute=0,
+            burst=1,
+        )
+
+        with queue._condition:
+            queue.submit(1, 10, "ds.example", "grist.a")
+            queue.submit(2, 20, "ds.example", "grist.a")
+            queue.submit(3, 30, "ds.example", "grist.b")
+
+        assert not queue.wait_until_idle(timeout=0.5)
+        assert order == [1, 3]
+        assert queue.pending() == [2]
+
+    def test_respects_max_concurrency(self):
+        """Jamais plus de max_concurrency synchronisations simultanées"""
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+        release = threading.Event()
+        saturated = threading.Event()
+
+        def run_sync(otp_config_id):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+                if state["running"] == 2:
+                    saturated.set()
+            release.wait(timeout=2)
+            with lock:
+                state["running"] -= 1
+
+        queue = SyncQueue(
+            run_sync=run_sync,
+            max_concurrency=2,
+            ds_starts_per_minute=6000,
+            grist_starts_per_minute=6000,
+            burst=10,
+        )
+
+        for otp_config_id in range(5):
+            queue.submit(otp_config_id, 0, "ds.example", f"grist.{otp_config_id}")
+
+        assert saturated.wait(timeout=5)
+        release.set()
+        assert queue.wait_until_idle(timeout=5)
+        assert state["peak"] == 2
+
+    def test_submit_ignores_duplicates(self):
+        """Une configuration déjà en file n'est pas ajoutée deux fois"""
+        queue = SyncQueue(run_sync=MagicMock(), max_concurrency=1)
+
+        with queue._condition:
+            assert queue.submit(1, 0, "ds.example", "grist.a")
+            assert not queue.submit(1, 0, "ds.example", "grist.a")
+            assert queue.pending() == [1]
+
+        assert queue.wait_until_idle(timeout=5)
+
+    def test_error_in_sync_releases_slot(self):
+        """Une exception dans une synchronisation libère sa place"""
+        order = []
+
+        def run_sync(otp_config_id):
+            order.append(otp_config_id)
+            if otp_config_id == 1:
+                raise RuntimeError("boom")
+
+        queue = SyncQueue(
+            run_sync=run_sync,
+            max_concurrency=1,
+            ds_starts_per_minute=6000,
+            grist_starts_per_minute=6000,
+            burst=10,
+        )
+
+        self._run_all(queue, [(1, 0, "grist.a"), (2, 1, "grist.a")])
+
+        assert order == [1, 2]
+
+
+class TestEnqueueScheduledSync:
+    @patch("sync.scheduled_sync.get_sync_queue")
+    @patch("sync.scheduled_sync.SessionLocal")
+    def test_submits_with_last_duration(
+        self, mock_session_local, mock_get_queue
+    ):
+        """Le coût estimé est la durée de la dernière synchronisation"""
+        from sync.scheduled_sync import enqueue_scheduled_sync
+
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        otp_config = MagicMock(grist_base_url="https://Grist.Example.fr/api")
+        mock_db.query.return_value.filter_by.return_value.first.return_value = (
+            otp_config
+        )
+        mock_db.query.return_value.filter.return_value.filter.return_value.order_by.return_value.limit.return_value.scalar.return_value = 42.0
+
+        enqueue_scheduled_sync(7, MagicMock())
+
+        mock_get_queue.return_value.submit.assert_called_once_with(
+            7,
+            cost=42.0,
+            ds_host="www.demarches-simplifiees.fr",
+            grist_host="grist.example.fr",
+        )
+        mock_db.close.assert_called_once()
+
+    @patch("sync.scheduled_sync.get_sync_queue")
+    @patch("sync.scheduled_sync.SessionLocal")
+    def test_missing_config_not_submitted(
+        self, mock_session_local, mock_get_queue
+    ):
+        """Configuration absente -> rien n'est mis en file"""
+        from sync.scheduled_sync import enqueue_scheduled_sync
+
+        mock_db = MagicMock()
+        mock_session_local.return_value = mock_db
+        mock_db.query.return_value.filter_by.return_value.first.return_value = None
+
+        enqueue_scheduled_sync(7, MagicMock())
+
+        mock_get_queue.return_value.submit.assert_not_called()
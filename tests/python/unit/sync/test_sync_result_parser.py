@@ -1,6 +1,7 @@
 from sync.sync_result_parser import (
     _parse_success_count,
     _parse_error_count,
+    parse_events,
     parse_output,
 )
 
@@ -84,3 +85,35 @@ class TestParseOutput:
         assert result["success_count"] == 0
         assert result["error_count"] == 0
         assert result["total_processed"] == 0
+
+
+class TestParseEvents:
+    def test_builds_result_from_summary(self):
+        """Le bilan est construit depuis les événements summary et deleted"""
+        result = parse_events(
+            [
+                {"type": "batch", "success_count": 4, "error_count": 1},
+                {"type": "error", "message": "Dossier 12 en échec"},
+                {"type": "deleted", "count": 2},
+                {"type": "summary", "success_count": 9, "error_count": 1},
+            ]
+        )
+
+        assert result["success"] is False
+        assert result["success_count"] == 9
+        assert result["error_count"] == 1
+        assert result["total_processed"] == 10
+        assert result["deleted_dossiers_count"] == 2
+        assert result["errors"] == ["Dossier 12 en échec"]
+
+    def test_already_up_to_date(self):
+        """already_up_to_date n'est retenu que sans dossier traité"""
+        result = parse_events(
+            [{"type": "summary", "success_count": 0, "error_count": 0, "already_up_to_date": True}]
+        )
+
+        assert result["sync_reason"] == "already_up_to_date"
+
+    def test_without_summary_returns_none(self):
+        """Sans bilan (script interrompu), None pour revenir aux logs texte"""
+        assert parse_events([{"type": "progress", "progress": 10}]) is None
@@ -0,0 +1,170 @@
+"""
+Tests unitaires pour la détection des dossiers supprimés
+
+Ces tests couvrent :
+- La réutilisation de l'index des lignes et des colonnes déjà chargés
+- L'absence de PATCH pour les lignes déjà marquées à la même date
+"""
+
+from unittest.mock import MagicMock, patch
+
+from deleted_dossiers_checker import (
+    COLUMN_ID,
+    DATE_COLUMN_ID,
+    REASON_COLUMN_ID,
+    _mark_deleted_in_grist,
+    check_deleted_dossiers,
+)
+
+ALL_COLUMNS = {"dossier_number", COLUMN_ID, DATE_COLUMN_ID, REASON_COLUMN_ID}
+
+
+def create_mock_client():
+    """Crée un mock de GristClient avec les attributs utilisés par le module"""
+    client = MagicMock()
+    client.base_url = "https://grist.test/api"
+    client.doc_id = "doc123"
+    client.headers = {"Authorization": "Bearer test"}
+    return client
+
+
+def create_mock_response(status_code=200, json_data=None, text=""):
+    """Crée un mock de réponse HTTP"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = json_data if json_data is not None else {}
+    response.text = text
+    return response
+
+
+class TestMarkDeletedInGrist:
+    """Tests unitaires pour la fonction _mark_deleted_in_grist"""
+
+    @patch("deleted_dossiers_checker.requests.patch")
+    def test_skips_rows_flagged_with_same_date(self, mock_patch):
+        """Test qu'une ligne déjà marquée à la même date n'est pas réécrite"""
+        mock_patch.return_value = create_mock_response()
+        deleted = [
+            {"number": 1, "dateSupression": "2024-01-01T00:00:00Z"},
+            {"number": 2, "dateSupression": "2024-01-02T00:00:00+01:00"},
+        ]
+        flagged_rows = {10: 1704067200.0, 11: 1704067200.0}
+
+        count = _mark_deleted_in_grist(
+            create_mock_client(),
+            "Table_1",
+            {"1": 10, "2": 11},
+            deleted,
+            MagicMock(),
+            MagicMock(),
+            flagged_rows=flagged_rows,
+        )
+
+        assert count == 1
+        sent = mock_patch.call_args.kwargs["json"]["records"]
+        assert [r["id"] for r in sent] == [11]
+
+    @patch("deleted_dossiers_checker.requests.patch")
+    def test_all_flagged_sends_nothing(self, mock_patch):
+        """Test qu'aucun PATCH n'est envoyé si tout est déjà marqué"""
+        count = _mark_deleted_in_grist(
+            create_mock_client(),
+            "Table_1",
+            {"1": 10},
+            [{"number": 1, "dateSupression": None}],
+            MagicMock(),
+            MagicMock(),
+            flagged_rows={10: None},
+        )
+
+        assert count == 0
+        mock_patch.assert_not_called()
+
+
+class TestCheckDeletedDossiers:
+    """Tests unitaires pour la fonction check_deleted_dossiers"""
+
+    @patch("deleted_dossiers_checker.requests.patch")
+    @patch("deleted_dossiers_checker.requests.post")
+    @patch("deleted_dossiers_checker.requests.get")
+    @patch("deleted_dossiers_checker.get_deleted_dossiers")
+    def test_reuses_row_index_and_columns(
+        self, mock_deleted, mock_get, mock_post, mock_patch
+    ):
+        """Test que l'index et les colonnes fournis évitent toute relecture"""
+        mock_deleted.return_value = [
+            {"number": 1, "dateSupression": "2024-01-01T00:00:00Z", "reason": "x"}
+        ]
+        mock_get.return_value = create_mock_response(json_data={"records": []})
+        mock_patch.return_value = create_mock_response()
+        client = create_mock_client()
+
+        result = check_deleted_dossiers(
+            client,
+            "Table_1",
+            123,
+            MagicMock(),
+            MagicMock(),
+            grist_dict={"1": 10},
+            existing_columns=ALL_COLUMNS,
+        )
+
+        assert result["newly_marked"] == 1
+        client.get_existing_dossier_numbers.assert_not_called()
+        mock_post.assert_not_called()
+        # Seule la lecture SQL des lignes déjà marquées est effectuée
+        assert mock_get.call_count == 1
+        assert mock_get.call_args.args[0].endswith("/sql")
+
+    @patch("deleted_dossiers_checker.requests.patch")
+    @patch("deleted_dossiers_checker.requests.get")
+    @patch("deleted_dossiers_checker.get_deleted_dossiers")
+    def test_repeated_run_writes_nothing(self, mock_deleted, mock_get, mock_patch):
+        """Test qu'une seconde exécution sans nouvelle suppression n'écrit rien"""
+        mock_deleted.return_value = [
+            {"number": 1, "dateSupression": "2024-01-01T00:00:00Z", "reason": "x"}
+        ]
+        mock_get.return_value = create_mock_response(
+            json_data={
+                "records": [{"fields": {"id": 10, DATE_COLUMN_ID: 1704067200}}]
+            }
+        )
+
+        result = check_deleted_dossiers(
+            create_mock_client(),
+            "Table_1",
+            123,
+            MagicMock(),
+            MagicMock(),
+            grist_dict={"1": 10},
+            existing_columns=ALL_COLUMNS,
+        )
+
+        assert result["newly_marked"] == 0
+        mock_patch.assert_not_called()
+
+    @patch("deleted_dossiers_checker.requests.patch")
+    @patch("deleted_dossiers_checker.requests.post")
+    @patch("deleted_dossiers_checker.requests.get")
+    @patch("deleted_dossiers_checker.get_deleted_dossiers")
+    def test_new_columns_skip_flagged_lookup(
+        self, mock_deleted, mock_get, mock_post, mock_patch
+    ):
+        """Test que des colonnes tout juste créées ne déclenchent pas de lecture SQL"""
+        mock_deleted.return_value = [{"number": 1, "dateSupression": None}]
+        mock_post.return_value = create_mock_response()
+        mock_patch.return_value = create_mock_response()
+
+        result = check_deleted_dossiers(
+            create_mock_client(),
+            "Table_1",
+            123,
+            MagicMock(),
+            MagicMock(),
+            grist_dict={"1": 10},
+            existing_columns={"dossier_number"},
+        )
+
+        assert result["newly_marked"] == 1
+        mock_get.assert_not_called()
+        mock_post.assert_called_once()
@@ -1,6 +1,12 @@
+import os
+from unittest.mock import patch
+
 from grist_processor_working_all import (
+    batch_dossier_pages,
+    build_checkpoint_key,
     normalize_column_name,
     format_value_for_grist,
+    skip_until_checkpoint,
 )
 
 
@@ -141,3 +147,97 @@ class TestFormatValueForGrist:
         """Test avec type inconnu"""
         assert format_value_for_grist("value", "Unknown") == "value"
         assert format_value_for_grist(123, "Unknown") == 123
+
+
+class TestBuildCheckpointKey:
+    """Tests unitaires pour la fonction build_checkpoint_key"""
+
+    def test_same_scope_same_key(self):
+        """Même curseur et mêmes filtres -> même clé"""
+        filters = {"statuts": ["accepte"]}
+        assert build_checkpoint_key("2024-01-01T00:00:00Z", filters) == (
+            build_checkpoint_key("2024-01-01T00:00:00Z", dict(filters))
+        )
+
+    def test_cursor_changes_key(self):
+        """Un autre curseur updatedSince invalide le checkpoint"""
+        assert build_checkpoint_key("2024-01-01T00:00:00Z", {}) != (
+            build_checkpoint_key("2024-02-01T00:00:00Z", {})
+        )
+
+    def test_env_filters_change_key(self):
+        """Un changement de filtre d'environnement invalide le checkpoint"""
+        with patch.dict(os.environ, {"STATUTS_DOSSIERS": ""}):
+            before = build_checkpoint_key(None, None)
+        with patch.dict(os.environ, {"STATUTS_DOSSIERS": "accepte"}):
+            after = build_checkpoint_key(None, None)
+        assert before != after
+
+
+class TestSkipUntilCheckpoint:
+    """Tests unitaires pour la fonction skip_until_checkpoint"""
+
+    def test_skips_processed_dossiers_of_first_page(self):
+        """Les dossiers jusqu'au dernier traité (inclus) sont écartés"""
+        pages = [
+            ("c1", [{"number": n} for n in (1, 2, 3)]),
+            ("c2", [{"number": 4}]),
+        ]
+
+        result = list(skip_until_checkpoint(iter(pages), 2))
+
+        assert [(c, [d["number"] for d in ds]) for c, ds in result] == [
+            ("c1", [3]),
+            ("c2", [4]),
+        ]
+
+    def test_last_dossier_absent_keeps_page(self):
+        """Dossier absent de la première page -> rien n'est écarté"""
+        pages = [("c1", [{"number": 3}, {"number": 4}])]
+
+        result = list(skip_until_checkpoint(iter(pages), 2))
+
+        assert [d["number"] for d in result[0][1]] == [3, 4]
+
+    def test_does_not_search_beyond_first_page(self):
+        """Le dossier n'est cherché que dans la première page reprise"""
+        pages = [("c1", [{"number": 3}]), ("c2", [{"number": 4}, {"number": 2}])]
+
+        result = list(skip_until_checkpoint(iter(pages), 2))
+
+        assert [d["number"] for d in result[1][1]] == [4, 2]
+
+
+class TestBatchDossierPages:
+    """Tests unitaires pour la fonction batch_dossier_pages"""
+
+    def test_batches_across_pages(self):
+        """Les lots chevauchent les pages et portent le curseur du dernier dossier"""
+        pages = [
+            (None, [{"number": 1}, {"number": 2}, {"number": 3}]),
+            ("c1", [{"number": 4}, {"number": 5}]),
+        ]
+        stats = {"kept": 0}
+
+        result = list(batch_dossier_pages(iter(pages), 2, stats))
+
+        assert result == [([1, 2], None), ([3, 4], "c1"), ([5], "c1")]
+        assert stats["kept"] == 5
+
+    def test_empty_pages(self):
+        """Pages vides -> aucun lot"""
+        assert list(batch_dossier_pages(iter([(None, []), ("c1", [])]), 2)) == []
+
+    def test_lazy_consumption(self):
+        """Le premier lot est produit sans consommer les pages suivantes"""
+        consumed = []
+
+        def pages():
+            for cursor in (None, "c1", "c2"):
+                consumed.append(cursor)
+                yield cursor, [{"number": len(consumed)}]
+
+        batches = batch_dossier_pages(pages(), 1)
+
+        assert next(batches) == ([1], None)
+        assert consumed == [None]
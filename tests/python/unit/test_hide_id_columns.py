@@ -0,0 +1,84 @@
+"""
+Tests unitaires pour le masquage des colonnes _id
+
+Ces tests couvrent :
+- Le retrait de tous les champs en un seul appel /apply
+- La lecture des métadonnées filtrée sur les tables concernées
+- L'absence d'appel lorsqu'aucune colonne _id n'est à traiter
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+from hide_id_columns import IdColumnHider
+
+METADATA = {
+    "_grist_Tables": [{"id": 1, "fields": {"tableId": "Dossiers"}}],
+    "_grist_Tables_column": [
+        {"id": 11, "fields": {"colId": "dossier_id", "parentId": 1}},
+        {"id": 12, "fields": {"colId": "champ_id", "parentId": 1}},
+        {"id": 13, "fields": {"colId": "label", "parentId": 1}},
+    ],
+    "_grist_Views_section": [
+        {"id": 21, "fields": {"tableRef": 1}},
+        {"id": 22, "fields": {"tableRef": 1}},
+    ],
+    "_grist_Views_section_field": [
+        {"id": 31, "fields": {"parentId": 21, "colRef": 11}},
+        {"id": 32, "fields": {"parentId": 21, "colRef": 12}},
+        {"id": 33, "fields": {"parentId": 21, "colRef": 13}},
+    ],
+}
+
+
+def fake_get(url, headers, params=None):
+    """Répond avec les métadonnées de la table demandée"""
+    table = url.split("/tables/")[1].split("/")[0]
+    response = MagicMock()
+    response.json.return_value = {"records": METADATA[table]}
+    return response
+
+
+class TestHideIdColumns:
+    """Tests unitaires pour IdColumnHider.hide_id_columns"""
+
+    @patch("hide_id_columns.requests.post")
+    @patch("hide_id_columns.requests.get", side_effect=fake_get)
+    def test_single_apply_for_all_fields(self, mock_get, mock_post):
+        """Test que tous les champs sont retirés en un seul /apply"""
+        hider = IdColumnHider("https://grist.test/api", "key", "doc123")
+
+        nb_ok, nb_skip = hider.hide_id_columns(table_ids={"Dossiers"})
+
+        assert (nb_ok, nb_skip) == (2, 0)
+        mock_post.assert_called_once()
+        assert mock_post.call_args.args[0].endswith("/apply")
+        assert mock_post.call_args.kwargs["json"] == [
+            ["RemoveRecord", "_grist_Views_section_field", 31],
+            ["RemoveRecord", "_grist_Views_section_field", 32],
+        ]
+
+    @patch("hide_id_columns.requests.post")
+    @patch("hide_id_columns.requests.get", side_effect=fake_get)
+    def test_columns_restricts_to_created(self, mock_get, mock_post):
+        """Test que seules les colonnes indiquées sont cachées, avec lectures filtrées"""
+        hider = IdColumnHider("https://grist.test/api", "key", "doc123")
+
+        nb_ok, _ = hider.hide_id_columns(columns={"Dossiers": {"champ_id", "label"}})
+
+        assert nb_ok == 1
+        assert mock_post.call_args.kwargs["json"] == [
+            ["RemoveRecord", "_grist_Views_section_field", 32]
+        ]
+        first_params = mock_get.call_args_list[0].kwargs["params"]
+        assert json.loads(first_params["filter"]) == {"tableId": ["Dossiers"]}
+
+    @patch("hide_id_columns.requests.post")
+    @patch("hide_id_columns.requests.get")
+    def test_no_id_column_no_request(self, mock_get, mock_post):
+        """Test qu'aucune colonne _id créée n'entraîne aucun appel"""
+        hider = IdColumnHider("https://grist.test/api", "key", "doc123")
+
+        assert hider.hide_id_columns(columns={"Dossiers": {"label"}}) == (0, 0)
+        mock_get.assert_not_called()
+        mock_post.assert_not_called()
@@ -0,0 +1,303 @@
+import re
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import queries_graphql
+from queries_graphql import (
+    get_deleted_dossiers,
+    get_demarche_dossiers_filtered,
+    get_demarche_groupes_instructeurs,
+    iter_connection_pages,
+    iter_demarche_dossiers_filtered,
+)
+
+
+def create_page_response(nodes, has_next_page=False, end_cursor=None):
+    """Crée une réponse GraphQL simulée pour une page de dossiers"""
+    response = MagicMock()
+    response.json.return_value = {
+        "data": {
+            "demarche": {
+                "dossiers": {
+                    "pageInfo": {
+                        "hasNextPage": has_next_page,
+                        "endCursor": end_cursor,
+                    },
+                    "nodes": nodes,
+                }
+            }
+        }
+    }
+    return response
+
+
+def create_dossier(number, state="accepte"):
+    """Crée un nœud dossier minimal"""
+    return {
+        "number": number,
+        "state": state,
+        "dateDepot": "2024-01-01T00:00:00Z",
+        "groupeInstructeur": {"id": "g", "number": 1, "label": "G"},
+    }
+
+
+@pytest.fixture
+def mock_session():
+    with (
+        patch.object(queries_graphql, "API_TOKEN", "token"),
+        patch("queries_graphql.get_session_with_retries") as mock_get_session,
+    ):
+        session = MagicMock()
+        mock_get_session.return_value = session
+        yield session
+
+
+class TestIterDemarcheDossiersFiltered:
+    """Tests unitaires pour iter_demarche_dossiers_filtered"""
+
+    def test_yields_pages_with_their_cursor(self, mock_session):
+        """Chaque page est produite avec le curseur `after` utilisé pour la demander"""
+        mock_session.post.side_effect = [
+            create_page_response([create_dossier(1)], True, "c1"),
+            create_page_response([create_dossier(2)], False, "c2"),
+        ]
+
+        pages = list(iter_demarche_dossiers_filtered(123))
+
+        assert [(c, [d["number"] for d in ds]) for c, ds in pages] == [
+            (None, [1]),
+            ("c1", [2]),
+        ]
+        second_call = mock_session.post.call_args_list[1]
+        assert second_call.kwargs["json"]["variables"]["afterCursor"] == "c1"
+
+    def test_prefetches_only_next_page(self, mock_session):
+        """Seule la page suivante est anticipée pendant la consommation de la courante"""
+        mock_session.post.side_effect = [
+            create_page_response([create_dossier(1)], True, "c1"),
+            create_page_response([create_dossier(2)], True, "c2"),
+            create_page_response([create_dossier(3)], False, "c3"),
+        ]
+
+        pages = iter_demarche_dossiers_filtered(123)
+        next(pages)
+        time.sleep(0.1)
+
+        assert mock_session.post.call_count == 2
+        pages.close()
+
+    def test_client_filters_applied_per_page(self, mock_session):
+        """Les filtres côté client sont appliqués page par page"""
+        mock_session.post.side_effect = [
+            create_page_response(
+                [create_dossier(1), create_dossier(2, state="refuse")], False
+            ),
+        ]
+
+        pages = list(iter_demarche_dossiers_filtered(123, statuts=["accepte"]))
+
+        assert [d["number"] for d in pages[0][1]] == [1]
+
+    def test_resumes_after_cursor(self, mock_session):
+        """after_cursor est transmis à la première requête"""
+        mock_session.post.side_effect = [create_page_response([], False)]
+
+        list(iter_demarche_dossiers_filtered(123, after_cursor="c9"))
+
+        variables = mock_session.post.call_args.kwargs["json"]["variables"]
+        assert variables["afterCursor"] == "c9"
+
+    def test_first_page_errors_raise(self, mock_session):
+        """Erreur GraphQL sur la première page -> exception"""
+        response = MagicMock()
+        response.json.return_value = {"errors": [{"message": "boom"}]}
+        mock_session.post.return_value = response
+
+        with pytest.raises(Exception, match="boom"):
+            list(iter_demarche_dossiers_filtered(123))
+
+
+class TestGetDemarcheDossiersFiltered:
+    """Tests unitaires pour get_demarche_dossiers_filtered"""
+
+    def test_collects_all_pages_and_cursors(self, mock_session):
+        """Tous les dossiers sont retournés et page_cursors est complété"""
+        mock_session.post.side_effect = [
+            create_page_response([create_dossier(1)], True, "c1"),
+            create_page_response([create_dossier(2)], False, "c2"),
+        ]
+        page_cursors = {}
+
+        dossiers = get_demarche_dossiers_filtered(123, page_cursors=page_cursors)
+
+        assert [d["number"] for d in dossiers] == [1, 2]
+        assert page_cursors == {1: None, 2: "c1"}
+
+
+class TestIterConnectionPages:
+    """Tests unitaires pour iter_connection_pages"""
+
+    def test_walks_all_pages(self):
+        """Toutes les pages sont parcourues, dans l'ordre, avec leur curseur"""
+        connections = {
+            None: {"pageInfo": {"hasNextPage": True, "endCursor": "c1"}, "nodes": [1]},
+            "c1": {"pageInfo": {"hasNextPage": False, "endCursor": "c2"}, "nodes": [2]},
+        }
+
+        pages = list(iter_connection_pages(connections.__getitem__))
+
+        assert [(c, conn["nodes"]) for c, conn in pages] == [(None, [1]), ("c1", [2])]
+
+    def test_next_page_requested_while_current_is_consumed(self):
+        """La page suivante est demandée avant que l'appelant ait fini la courante"""
+        second_requested = threading.Event()
+
+        def fetch_page(cursor):
+            if cursor is None:
+                return {"pageInfo": {"hasNextPage": True, "endCursor": "c1"}, "nodes": []}
+            second_requested.set()
+            return {"pageInfo": {"hasNextPage": False}, "nodes": []}
+
+        pages = iter_connection_pages(fetch_page)
+        next(pages)
+
+        assert second_requested.wait(timeout=2)
+        assert len(list(pages)) == 1
+
+    def test_none_stops_walk(self):
+        """fetch_page retournant None arrête le parcours"""
+        pages = list(iter_connection_pages(lambda cursor: None))
+
+        assert pages == []
+
+    def test_fetch_error_propagates(self):
+        """Une erreur de requête remonte à l'appelant"""
+
+        def fetch_page(cursor):
+            raise RuntimeError("réseau")
+
+        with pytest.raises(RuntimeError, match="réseau"):
+            list(iter_connection_pages(fetch_page))
+
+    def test_starts_after_cursor(self):
+        """after_cursor est utilisé pour la première page"""
+        cursors = []
+
+        def fetch_page(cursor):
+            cursors.append(cursor)
+            return {"pageInfo": {"hasNextPage": False}, "nodes": []}
+
+        list(iter_connection_pages(fetch_page, after_cursor="c5"))
+
+        assert cursors == ["c5"]
+
+
+def create_deleted_response(connection_name, nodes):
+    """Crée une réponse GraphQL simulée pour deletedDossiers / pendingDeletedDossiers"""
+    response = MagicMock()
+    response.json.return_value = {
+        "data": {
+            "demarche": {
+                connection_name: {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": nodes,
+                }
+            }
+        }
+    }
+    return response
+
+
+class TestGetDeletedDossiers:
+    """Tests unitaires pour get_deleted_dossiers"""
+
+    def _route(self, deleted_nodes, pending_nodes):
+        """Répond selon la connexion demandée (appels concurrents)"""
+
+        def post(url, json, headers):
+            if "pendingDeletedDossiers" in json["query"]:
+                return create_deleted_response("pendingDeletedDossiers", pending_nodes)
+            return create_deleted_response("deletedDossiers", deleted_nodes)
+
+        return post
+
+    @patch("queries_graphql.get_state_store")
+    def test_merges_by_number_confirmed_first(self, mock_get_store, mock_session):
+        """Fusion par numéro, l'entrée confirmée prime"""
+        mock_get_store.return_value.get.return_value = None
+        mock_session.post.side_effect = self._route(
+            [{"number": 1, "state": "confirmé"}],
+            [{"number": 1, "state": "en attente"}, {"number": 2, "state": "en attente"}],
+        )
+
+        result = get_deleted_dossiers(123)
+
+        by_number = {d["number"]: d for d in result}
+        assert set(by_number) == {1, 2}
+        assert by_number[1]["state"] == "confirmé"
+        mock_get_store.return_value.set.assert_called_once_with(
+            "pending_deleted_dossiers",
+            "123",
+            [{"number": 1, "state": "en attente"}, {"number": 2, "state": "en attente"}],
+        )
+
+    @patch("queries_graphql.get_state_store")
+    def test_pending_cache_hit_skips_request(self, mock_get_store, mock_session):
+        """Liste en attente en cache -> pendingDeletedDossiers n'est pas interrogé"""
+        mock_get_store.return_value.get.return_value = [{"number": 5}]
+        mock_session.post.side_effect = self._route([{"number": 1}], [])
+
+        result = get_deleted_dossiers(123, deleted_since="2024-01-01T00:00:00Z")
+
+        assert sorted(d["number"] for d in result) == [1, 5]
+        assert mock_session.post.call_count == 1
+        query = mock_session.post.call_args.kwargs["json"]["query"]
+        assert "pendingDeletedDossiers" not in query
+        mock_get_store.return_value.set.assert_not_called()
+
+
+class TestGetDemarcheGroupesInstructeurs:
+    """Tests unitaires pour get_demarche_groupes_instructeurs"""
+
+    def _post(self, groupes):
+        """Répond à la liste des groupes puis aux requêtes aliasées"""
+
+        def post(url, json, headers, timeout):
+            if "getGroupesInstructeurs" in json["query"]:
+                data = {"demarche": {"groupeInstructeurs": groupes}}
+            else:
+                numbers = re.findall(
+                    r"groupeInstructeur\(number: (\d+)\)", json["query"]
+                )
+                data = {
+                    f"g{i}": {"instructeurs": [{"id": f"i{n}", "email": f"{n}@x.fr"}]}
+                    for i, n in enumerate(numbers)
+                }
+            response = MagicMock()
+            response.json.return_value = {"data": data}
+            return response
+
+        return post
+
+    def test_instructeurs_fetched_by_chunks(self, mock_session):
+        """Les instructeurs sont demandés par paquets de groupes"""
+        groupes = [{"id": f"g{n}", "number": n, "label": f"G{n}"} for n in range(5)]
+        mock_session.post.side_effect = self._post(groupes)
+
+        with patch.object(queries_graphql, "INSTRUCTEURS_GROUPS_PER_REQUEST", 2):
+            result = get_demarche_groupes_instructeurs(123)
+
+        assert mock_session.post.call_count == 4
+        assert [g["instructeurs"][0]["id"] for g in result] == [
+            f"i{n}" for n in range(5)
+        ]
+
+    def test_no_group_single_request(self, mock_session):
+        """Démarche sans groupe -> une seule requête"""
+        mock_session.post.side_effect = self._post([])
+
+        assert get_demarche_groupes_instructeurs(123) == []
+        assert mock_session.post.call_count == 1
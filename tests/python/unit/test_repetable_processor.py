@@ -0,0 +1,502 @@
+from unittest.mock import MagicMock, patch
+
+from grist.client import GristClient
+from repetable_processor import (
+    RepetableRowIndex,
+    get_existing_repetable_rows_index,
+    process_repetables_batch,
+    replace_repetable_rows,
+)
+
+
+def create_response(status_code, payload):
+    """Crée une réponse HTTP simulée"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload
+    response.text = str(payload)
+    return response
+
+
+class TestRepetableRowIndex:
+    """Tests unitaires pour RepetableRowIndex"""
+
+    def test_find_by_canonical_key(self):
+        """Une ligne est retrouvée par (dossier_number, block_row_id)"""
+        index = RepetableRowIndex()
+        index.add(10, {"dossier_number": 42, "block_row_id": "row_a"})
+
+        assert index.find("42", "row_a") == 10
+        assert index.find(42, "row_b") is None
+        assert index.find(43, "row_a") is None
+
+    def test_legacy_row_found_by_position(self):
+        """Une ligne sans block_row_id est retrouvée par sa position"""
+        index = RepetableRowIndex()
+        index.add(11, {"dossier_number": 42, "block_row_index": 2})
+
+        assert index.find(42, "row_b", block_row_index=2) == 11
+        assert index.find(42, "row_b") is None
+
+    def test_geometry_found_by_geo_id(self):
+        """Une géométrie déplacée est retrouvée par (field_name, geo_id)"""
+        index = RepetableRowIndex()
+        index.add(
+            12,
+            {
+                "dossier_number": 42,
+                "block_row_id": "row_a_geo1",
+                "field_name": "carte",
+                "geo_id": "g1",
+            },
+        )
+
+        assert index.find(42, "row_a_geo2", field_name="carte", geo_id="g1") == 12
+
+    def test_remove_dossier(self):
+        """Les lignes d'un dossier sont retirées de tous les index"""
+        index = RepetableRowIndex()
+        index.add(1, {"dossier_number": 42, "block_row_id": "a"})
+        index.add(
+            2,
+            {"dossier_number": 42, "block_row_id": "b", "field_name": "c", "geo_id": "g"},
+        )
+        index.add(3, {"dossier_number": 43, "block_row_id": "a"})
+
+        assert sorted(index.remove_dossier(42)) == [1, 2]
+        assert index.find(42, "a") is None
+        assert index.find(42, "x", field_name="c", geo_id="g") is None
+        assert index.find(43, "a") == 3
+
+    def test_rows_without_identifier_ignored(self):
+        """Les lignes sans dossier ni identifiant ne sont pas indexées"""
+        index = RepetableRowIndex()
+        index.add(1, {"block_row_id": "row_a"})
+        index.add(2, {"dossier_number": 42})
+
+        assert len(index) == 0
+
+
+class TestGetExistingRepetableRowsIndex:
+    """Tests unitaires pour get_existing_repetable_rows_index"""
+
+    def setup_method(self):
+        self.client = GristClient("https://grist.example.com", "key", "doc")
+
+    @patch("repetable_processor.requests.get")
+    def test_selects_only_index_columns(self, mock_get):
+        """Seules les colonnes d'identification existantes sont demandées"""
+        mock_get.side_effect = [
+            create_response(
+                200,
+                {
+                    "columns": [
+                        {"id": "dossier_number"},
+                        {"id": "block_row_id"},
+                        {"id": "commentaire"},
+                    ]
+                },
+            ),
+            create_response(
+                200,
+                {
+                    "records": [
+                        {"fields": {"id": 5, "dossier_number": 1, "block_row_id": "r1"}},
+                        {"fields": {"id": 6, "dossier_number": 2, "block_row_id": "r2"}},
+                    ]
+                },
+            ),
+        ]
+
+        index = get_existing_repetable_rows_index(self.client, "Bloc", None)
+
+        assert index.find(1, "r1") == 5
+        assert index.find(2, "r2") == 6
+        sql_call = mock_get.call_args_list[1]
+        assert sql_call.args[0] == "https://grist.example.com/docs/doc/sql"
+        assert (
+            sql_call.kwargs["params"]["q"]
+            == 'SELECT "id", "dossier_number", "block_row_id" FROM "Bloc"'
+        )
+
+    @patch("repetable_processor.requests.get")
+    def test_falls_back_to_records(self, mock_get):
+        """Endpoint SQL en erreur -> repli sur /records, filtré par dossier"""
+        mock_get.side_effect = [
+            create_response(200, {"columns": [{"id": "dossier_number"}]}),
+            create_response(403, {}),
+            create_response(
+                200,
+                {
+                    "records": [
+                        {"id": 5, "fields": {"dossier_number": 1, "block_row_id": "r1"}},
+                        {"id": 6, "fields": {"dossier_number": 2, "block_row_id": "r2"}},
+                    ]
+                },
+            ),
+        ]
+
+        index = get_existing_repetable_rows_index(self.client, "Bloc", 1)
+
+        assert len(index) == 1
+        assert index.find(1, "r1") == 5
+        assert mock_get.call_args_list[2].args[0].endswith("/tables/Bloc/records")
+
+
+class TestProcessRepetablesBatch:
+    """Tests unitaires pour process_repetables_batch"""
+
+    @patch("repetable_processor.requests.post")
+    @patch("repetable_processor.requests.patch")
+    @patch("repetable_processor.get_existing_repetable_rows_index")
+    def test_updates_existing_and_creates_new_rows(
+        self, mock_index, mock_patch, mock_post
+    ):
+        """Lignes connues mises à jour, nouvelles lignes créées"""
+        client = GristClient("https://grist.example.com", "key", "doc")
+        index = RepetableRowIndex()
+        index.add(7, {"dossier_number": 42, "block_row_id": "row_a"})
+        mock_index.return_value = index
+        mock_patch.return_value = create_response(200, {})
+        mock_post.return_value = create_response(200, {"records": [{"id": 8}]})
+
+        dossier = {
+            "number": 42,
+            "champs": [
+                {
+                    "__typename": "RepetitionChamp",
+                    "id": "bloc",
+                    "label": "Bloc",
+                    "rows": [
+                        {"id": "row_a", "champs": []},
+                        {"id": "row_b", "champs": []},
+                    ],
+                }
+            ],
+        }
+
+        success, errors = process_repetables_batch(
+            client,
+            [dossier],
+            {"bloc": "Demarche_1_bloc"},
+            {"bloc": {"columns": []}},
+        )
+
+        assert (success, errors) == (2, 0)
+        updated = mock_patch.call_args.kwargs["json"]["records"]
+        assert [record["id"] for record in updated] == [7]
+        created = mock_post.call_args.kwargs["json"]["records"]
+        assert [record["fields"]["block_row_id"] for record in created] == ["row_b"]
+
+    @patch("repetable_processor.requests.post")
+    @patch("repetable_processor.requests.patch")
+    @patch("repetable_processor.get_existing_repetable_rows_index")
+    def test_cache_loaded_once_and_updated_with_created_rows(
+        self, mock_index, mock_patch, mock_post
+    ):
+        """Table chargée une seule fois ; les lignes créées sont mises à jour ensuite"""
+        client = GristClient("https://grist.example.com", "key", "doc")
+        mock_index.return_value = RepetableRowIndex()
+        mock_patch.return_value = create_response(200, {})
+        mock_post.return_value = create_response(200, {"records": [{"id": 8}]})
+        cache = {}
+
+        dossier = {
+            "number": 42,
+            "champs": [
+                {
+                    "__typename": "RepetitionChamp",
+                    "id": "bloc",
+                    "label": "Bloc",
+                    "rows": [{"id": "row_a", "champs": []}],
+                }
+            ],
+        }
+
+        for _ in range(2):
+            process_repetables_batch(
+                client,
+                [dossier],
+                {"bloc": "Demarche_1_bloc"},
+                {"bloc": {"columns": []}},
+                existing_rows_cache=cache,
+            )
+
+        mock_index.assert_called_once()
+        assert cache["Demarche_1_bloc"].find(42, "row_a") == 8
+        assert mock_post.call_count == 1
+        assert mock_patch.call_args.kwargs["json"]["records"][0]["id"] == 8
+
+
+    @patch("repetable_processor.get_state_store")
+    @patch("repetable_processor.requests.post")
+    @patch("repetable_processor.requests.patch")
+    @patch("repetable_processor.get_existing_repetable_rows_index")
+    def test_unchanged_geometry_not_rewritten(
+        self, mock_index, mock_patch, mock_post, mock_get_store, tmp_path
+    ):
+        """Géométrie déjà écrite à l'identique -> absente de la mise à jour"""
+        from utils.geometry import geometry_hash
+        from utils.state_store import StateStore
+
+        store = StateStore(str(tmp_path / "state.sqlite3"))
+        mock_get_store.return_value = store
+        client = GristClient("https://grist.example.com", "key", "doc")
+        index = RepetableRowIndex()
+        index.add(7, {"dossier_number": 42, "block_row_id": "row_a_geo1"})
+        mock_index.return_value = index
+        mock_patch.return_value = create_response(200, {})
+
+        geometry = {"type": "Point", "coordinates": [1.0, 2.0]}
+        dossier = {
+            "number": 42,
+            "champs": [
+                {
+                    "__typename": "RepetitionChamp",
+                    "id": "bloc",
+                    "label": "Bloc",
+                    "rows": [
+                        {
+                            "id": "row_a",
+                            "champs": [
+                                {
+                                    "__typename": "CarteChamp",
+                                    "id": "carte",
+                                    "label": "Carte",
+                                    "geoAreas": [{"id": "g1", "geometry": geometry}],
+                                }
+                            ],
+                        }
+                    ],
+                }
+            ],
+        }
+
+        with patch("utils.geometry.get_state_store", return_value=store):
+            for _ in range(2):
+                process_repetables_batch(
+                    client,
+                    [dossier],
+                    {"bloc": "Demarche_1_bloc"},
+                    {"bloc": {"columns": []}},
+                )
+
+            # Même démarche vers un autre document : la géométrie y est écrite
+            other_client = GristClient("https://grist.example.com", "key", "doc2")
+            process_repetables_batch(
+                other_client,
+                [dossier],
+                {"bloc": "Demarche_1_bloc"},
+                {"bloc": {"columns": []}},
+            )
+
+        first, second, other = (
+            c.kwargs["json"]["records"][0] for c in mock_patch.call_args_list
+        )
+        assert first["fields"]["geo_wkt"] == "POINT(1.0 2.0)"
+        assert "geo_wkt" not in second["fields"]
+        assert "geo_coordinates" not in second["fields"]
+        assert other["fields"]["geo_wkt"] == "POINT(1.0 2.0)"
+        assert store.get(
+            "geometry_written", "https://grist.example.com/doc:Demarche_1_bloc:7"
+        ) == geometry_hash(geometry)
+        mock_post.assert_not_called()
+
+
+class TestReplaceRepetableRows:
+    """Tests unitaires pour replace_repetable_rows"""
+
+    def setup_method(self):
+        self.client = GristClient("https://grist.example.com", "key", "doc")
+
+    @patch("repetable_processor.requests.post")
+    def test_single_apply_remove_then_add(self, mock_post):
+        """Suppression et insertion envoyées dans une seule requête /apply"""
+        index = RepetableRowIndex()
+        index.add(1, {"dossier_number": 42, "block_row_id": "old"})
+        index.add(2, {"dossier_number": 43, "block_row_id": "other"})
+        mock_post.return_value = create_response(
+            200, {"actionNum": 1, "retValues": [None, [10]]}
+        )
+
+        result = replace_repetable_rows(
+            self.client,
+            "Bloc",
+            index,
+            {"42"},
+            [{"dossier_number": 42, "block_row_id": "new"}],
+        )
+
+        assert result == (1, 0)
+        mock_post.assert_called_once()
+        assert mock_post.call_args.args[0] == "https://grist.example.com/docs/doc/apply"
+        assert mock_post.call_args.kwargs["json"] == [
+            ["BulkRemoveRecord", "Bloc", [1]],
+            [
+                "BulkAddRecord",
+                "Bloc",
+                [None],
+                {"block_row_id": ["new"], "dossier_number": [42]},
+            ],
+        ]
+        assert index.find(42, "old") is None
+        assert index.find(42, "new") == 10
+        assert index.find(43, "other") == 2
+
+    @patch("repetable_processor.requests.post")
+    def test_nothing_to_do(self, mock_post):
+        """Aucune ligne existante ni nouvelle -> aucune requête"""
+        result = replace_repetable_rows(
+            self.client, "Bloc", RepetableRowIndex(), {"42"}, []
+        )
+
+        assert result == (0, 0)
+        mock_post.assert_not_called()
+
+    @patch("repetable_processor.requests.post")
+    def test_failure_keeps_index(self, mock_post):
+        """Échec de /apply -> lignes en erreur, index inchangé"""
+        index = RepetableRowIndex()
+        index.add(1, {"dossier_number": 42, "block_row_id": "old"})
+        mock_post.return_value = create_response(500, {})
+
+        result = replace_repetable_rows(
+            self.client,
+            "Bloc",
+            index,
+            {"42"},
+            [{"dossier_number": 42, "block_row_id": "new"}],
+        )
+
+        assert result == (0, 1)
+        assert index.find(42, "old") == 1
+
+    @patch("repetable_processor.get_state_store")
+    @patch("repetable_processor.replace_repetable_rows")
+    @patch("repetable_processor.get_existing_repetable_rows_index")
+    def test_batch_replace_covers_emptied_blocks(
+        self, mock_index, mock_replace, mock_get_store, tmp_path
+    ):
+        """Mode replace : chaque table est traitée, même si le bloc est vide"""
+        from utils.state_store import StateStore
+
+        mock_get_store.return_value = StateStore(str(tmp_path / "state.sqlite3"))
+        mock_index.return_value = RepetableRowIndex()
+        mock_replace.return_value = (0, 0)
+        dossier = {
+            "number": 42,
+            "champs": [
+                {
+                    "__typename": "RepetitionChamp",
+                    "id": "bloc",
+                    "label": "Bloc",
+                    "rows": [{"id": "row_a", "champs": []}],
+                }
+            ],
+        }
+
+        with patch.object(RepetableRowIndex, "find") as mock_find:
+            process_repetables_batch(
+                self.client,
+                [dossier],
+                {"bloc": "Demarche_1_bloc", "vide": "Demarche_1_vide"},
+                {"bloc": {"columns": []}, "vide": {"columns": []}},
+                write_mode="replace",
+            )
+
+        # Remplacement : pas de rapprochement ligne à ligne
+        mock_find.assert_not_called()
+        calls = {c.args[1]: c.args for c in mock_replace.call_args_list}
+        assert set(calls) == {"Demarche_1_bloc", "Demarche_1_vide"}
+        assert calls["Demarche_1_bloc"][3] == {"42"}
+        assert [r["block_row_id"] for r in calls["Demarche_1_bloc"][4]] == ["row_a"]
+        assert calls["Demarche_1_vide"][4] == []
+
+    @patch("repetable_processor.get_state_store")
+    @patch("repetable_processor.requests.post")
+    @patch("repetable_processor.get_existing_repetable_rows_index")
+    def test_batch_replace_skips_unchanged_dossiers(
+        self, mock_index, mock_post, mock_get_store, tmp_path
+    ):
+        """Lignes identiques au dernier remplacement -> aucune requête, IDs stables"""
+        from utils.state_store import StateStore
+
+        mock_get_store.return_value = StateStore(str(tmp_path / "state.sqlite3"))
+        mock_index.return_value = RepetableRowIndex()
+        mock_post.return_value = create_response(
+            200, {"actionNum": 1, "retValues": [[10]]}
+        )
+        dossier = {
+            "number": 42,
+            "champs": [
+                {
+                    "__typename": "RepetitionChamp",
+                    "id": "bloc",
+                    "label": "Bloc",
+                    "rows": [{"id": "row_a", "champs": []}],
+                }
+            ],
+        }
+        cache = {}
+
+        def run():
+            return process_repetables_batch(
+                self.client,
+                [dossier],
+                {"bloc": "Demarche_1_bloc"},
+                {"bloc": {"columns": []}},
+                existing_rows_cache=cache,
+                write_mode="replace",
+            )
+
+        assert run() == (1, 0)
+        assert run() == (0, 0)
+        mock_post.assert_called_once()
+        assert cache["Demarche_1_bloc"].find(42, "row_a") == 10
+
+        # Ligne modifiée dans DS -> le dossier est de nouveau remplacé
+        dossier["champs"][0]["rows"].append({"id": "row_b", "champs": []})
+        mock_post.return_value = create_response(
+            200, {"actionNum": 2, "retValues": [None, [11, 12]]}
+        )
+        assert run() == (2, 0)
+        assert mock_post.call_count == 2
+
+    @patch("repetable_processor.get_state_store")
+    @patch("repetable_processor.requests.post")
+    @patch("repetable_processor.get_existing_repetable_rows_index")
+    def test_batch_replace_rewrites_rows_missing_from_grist(
+        self, mock_index, mock_post, mock_get_store, tmp_path
+    ):
+        """Empreinte inchangée mais lignes absentes de la table -> remplacement"""
+        from utils.state_store import StateStore
+
+        mock_get_store.return_value = StateStore(str(tmp_path / "state.sqlite3"))
+        mock_post.return_value = create_response(
+            200, {"actionNum": 1, "retValues": [[10]]}
+        )
+        dossier = {
+            "number": 42,
+            "champs": [
+                {
+                    "__typename": "RepetitionChamp",
+                    "id": "bloc",
+                    "label": "Bloc",
+                    "rows": [{"id": "row_a", "champs": []}],
+                }
+            ],
+        }
+
+        for _ in range(2):
+            # Table relue vide à chaque synchronisation (vidée dans Grist)
+            mock_index.return_value = RepetableRowIndex()
+            result = process_repetables_batch(
+                self.client,
+                [dossier],
+                {"bloc": "Demarche_1_bloc"},
+                {"bloc": {"columns": []}},
+                write_mode="replace",
+            )
+            assert result == (1, 0)
+
+        assert mock_post.call_count == 2
@@ -9,10 +9,17 @@ Ces tests couvrent l'ensemble des fonctionnalités de la classe :
 - Gestion des erreurs
 """
 
+import json
 import os
+import subprocess
+import sys
+import threading
 import time
 from io import StringIO
 from unittest.mock import patch, MagicMock
+
+import pytest
+
 from sync.sync_manager import SyncManager
 
 
@@ -40,7 +47,8 @@ class TestSyncManager:
     def setup_method(self):
         """Initialisation avant chaque test"""
         self.mock_callback = MagicMock()
-        self.manager = SyncManager(notify_callback=self.mock_callback)
+        # Envoi immédiat des mises à jour (sans regroupement)
+        self.manager = SyncManager(notify_callback=self.mock_callback, emit_interval=0)
 
     def test_initialization_without_callback(self):
         """Test l'initialisation sans callback de notification"""
@@ -220,8 +228,7 @@ class TestSyncManager:
                 self.manager.run_synchronization_task, server_config, auto=False
             )
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch.dict(
         os.environ,
         {
@@ -235,7 +242,7 @@ class TestSyncManager:
     )
     @patch("subprocess.Popen")
     def test_run_synchronization_task_success(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test run_synchronization_task avec succès"""
         mock_subprocess.return_value = create_mock_process("""Récupération de la démarche 12345
@@ -291,11 +298,10 @@ class TestSyncManager:
         assert len(progress_calls) > 0
         assert progress_calls[-1][0] == 100  # Dernière progression à 100%
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_with_filters(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test run_synchronization_task avec des filtres"""
         mock_subprocess.return_value = create_mock_process(
@@ -303,9 +309,7 @@ class TestSyncManager:
         )
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -337,11 +341,10 @@ class TestSyncManager:
         assert env.get("STATUTS_DOSSIERS") == "en_construction,en_instruction"
         assert env.get("GROUPES_INSTRUCTEURS") == "1,2,3"
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_subprocess_error(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test run_synchronization_task avec erreur subprocess"""
         mock_subprocess.return_value = create_mock_process(
@@ -349,9 +352,7 @@ class TestSyncManager:
         )
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -375,11 +376,10 @@ class TestSyncManager:
         assert "Script error occurred" in result["message"]
         assert "traceback" in result
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_error_code_api_error(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test error_code=2 retourné pour erreur API externe"""
         mock_subprocess.return_value = create_mock_process(
@@ -387,9 +387,7 @@ class TestSyncManager:
         )
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -402,11 +400,10 @@ class TestSyncManager:
 
         assert result["error_code"] == 2
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_error_code_general_error(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test error_code=1 retourné pour erreur générale"""
         mock_subprocess.return_value = create_mock_process(
@@ -414,9 +411,7 @@ class TestSyncManager:
         )
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -444,13 +439,10 @@ class TestSyncManager:
             log_calls.append(message)
 
         with (
-            patch("sync.sync_manager.create_engine") as mock_create_engine,
-            patch("sync.sync_manager.sessionmaker") as mock_sessionmaker,
+            patch("sync.sync_manager.SessionLocal") as mock_session_local,
         ):
             mock_db = MagicMock()
-            mock_session_class = MagicMock(return_value=mock_db)
-            mock_sessionmaker.return_value = mock_session_class
-            mock_create_engine.return_value = MagicMock()
+            mock_session_local.return_value = mock_db
 
             with patch("subprocess.Popen", side_effect=Exception("Unexpected error")):
                 result = self.manager.run_synchronization_task(
@@ -461,11 +453,10 @@ class TestSyncManager:
                 assert "Erreur lors de la synchronisation" in result["message"]
                 assert "traceback" in result
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_progress_parsing(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test le parsing de la progression depuis les logs"""
         mock_subprocess.return_value = create_mock_process("""Configuration Grist
@@ -474,9 +465,7 @@ class TestSyncManager:
         100 dossiers traités avec succès""")
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -501,19 +490,16 @@ class TestSyncManager:
         assert matching_34, f"Progression attendue ~34, recue: {progress_values}"
         assert matching_39, f"Progression attendue ~40, recue: {progress_values}"
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_environment_variables_setup(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test la configuration des variables d'environnement"""
         mock_subprocess.return_value = create_mock_process("Test output")
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "new_token",
@@ -532,11 +518,41 @@ class TestSyncManager:
         assert env.get("DEMARCHE_NUMBER") == "99999"
         assert env.get("GRIST_BASE_URL") == "https://new.grist.com"
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
+    @patch("subprocess.Popen")
+    def test_environment_of_web_process_untouched(
+        self, mock_subprocess, mock_session_local
+    ):
+        """Les variables d'une synchronisation ne fuient pas vers les suivantes"""
+        mock_subprocess.return_value = create_mock_process("Test output")
+        mock_session_local.return_value = MagicMock()
+
+        config = {
+            "ds_api_token": "tenant_a_token",
+            "demarche_number": "99999",
+            "grist_api_key": "tenant_a_key",
+            "grist_doc_id": "test_doc",
+            "grist_base_url": "https://a.grist.com",
+            "filter_statuses": "accepte",
+        }
+
+        with patch.dict(os.environ, {}, clear=False):
+            for key in ("DEMARCHES_API_TOKEN", "GRIST_API_KEY", "STATUTS_DOSSIERS"):
+                os.environ.pop(key, None)
+            self.manager.run_synchronization_task(config)
+
+            assert "DEMARCHES_API_TOKEN" not in os.environ
+            assert "GRIST_API_KEY" not in os.environ
+            assert "STATUTS_DOSSIERS" not in os.environ
+
+        env = mock_subprocess.call_args.kwargs["env"]
+        assert env["DEMARCHES_API_TOKEN"] == "tenant_a_token"
+        assert env["STATUTS_DOSSIERS"] == "accepte"
+
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_statistics_parsing(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test le parsing des statistiques depuis la sortie"""
         mock_subprocess.return_value = create_mock_process("""Dossiers traités avec succès: 85
@@ -545,9 +561,7 @@ class TestSyncManager:
         """)
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -564,11 +578,10 @@ class TestSyncManager:
         assert result["dossier_count"] == 100
         assert result["success"] is False  # Parce qu'il y a des erreurs
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_creates_sync_log_on_success(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test que run_synchronization_task crée un SyncLog après succès"""
         mock_subprocess.return_value = create_mock_process("""Dossiers traités avec succès: 10
@@ -577,9 +590,7 @@ class TestSyncManager:
         """)
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -607,19 +618,16 @@ class TestSyncManager:
         assert sync_log.success_count == 10
         assert sync_log.error_count == 0
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_creates_sync_log_on_failure(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test que run_synchronization_task crée un SyncLog après échec"""
         mock_subprocess.return_value = create_mock_process("", returncode=1)
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -672,11 +680,10 @@ class TestSyncManager:
         assert task["status"] == "error"
         assert "Erreur test" in task["message"]
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_with_auto_parameter(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test que le paramètre auto est correctement passé au SyncLog"""
         mock_subprocess.return_value = create_mock_process("""Dossiers traités avec succès: 5
@@ -685,9 +692,7 @@ class TestSyncManager:
         """)
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -712,11 +717,10 @@ class TestSyncManager:
         sync_log = mock_db.add.call_args[0][0]
         assert sync_log.auto is False
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_success_manual_sync(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test que run_synchronization_task crée un SyncLog avec auto=False après succès"""
         mock_subprocess.return_value = create_mock_process("""Dossiers traités avec succès: 20
@@ -725,9 +729,7 @@ class TestSyncManager:
         """)
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -752,19 +754,16 @@ class TestSyncManager:
         assert sync_log.success_count == 20
         assert sync_log.error_count == 0
 
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_failure_auto_sync(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine
+        self, mock_subprocess, mock_session_local
     ):
         """Test que run_synchronization_task crée un SyncLog avec auto=True après échec"""
         mock_subprocess.return_value = create_mock_process("", returncode=1)
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -785,11 +784,10 @@ class TestSyncManager:
         assert sync_log.auto is True
 
     @patch("sync.sync_manager.ConfigManager")
-    @patch("sync.sync_manager.create_engine")
-    @patch("sync.sync_manager.sessionmaker")
+    @patch("sync.sync_manager.SessionLocal")
     @patch("subprocess.Popen")
     def test_run_synchronization_task_records_grist_user_email(
-        self, mock_subprocess, mock_sessionmaker, mock_create_engine, mock_cm_class
+        self, mock_subprocess, mock_session_local, mock_cm_class
     ):
         """Test que la synchro enregistre l'email Grist via fetch_and_store_grist_user_email"""
         mock_subprocess.return_value = create_mock_process("""Dossiers traités avec succès: 3
@@ -798,9 +796,7 @@ class TestSyncManager:
         """)
 
         mock_db = MagicMock()
-        mock_session_class = MagicMock(return_value=mock_db)
-        mock_sessionmaker.return_value = mock_session_class
-        mock_create_engine.return_value = MagicMock()
+        mock_session_local.return_value = mock_db
 
         config = {
             "ds_api_token": "test_token",
@@ -812,8 +808,298 @@ class TestSyncManager:
             "otp_config_id": 5,
         }
 
-        self.manager.run_synchronization_task(config, auto=True)
+        mock_fetch = mock_cm_class.return_value.fetch_and_store_grist_user_email
+        # L'enregistrement reste bloqué tant que le test ne le libère pas
+        release, done = threading.Event(), threading.Event()
+
+        def fetch(*_args):
+            release.wait(timeout=2)
+            done.set()
+
+        mock_fetch.side_effect = fetch
+
+        result = self.manager.run_synchronization_task(config, auto=True)
+
+        # La synchronisation est terminée sans attendre l'email
+        assert result["success_count"] == 3
+        assert not done.is_set()
+
+        release.set()
+        assert done.wait(timeout=2)
+        mock_fetch.assert_called_once_with(5, "https://test.grist.com", "test_key")
+
+
+class TestSyncManagerEvents:
+    """Tests du canal d'événements structurés entre le script et SyncManager"""
+
+    @patch("sync.sync_manager.ConfigManager")
+    @patch("sync.sync_manager.SessionLocal")
+    @patch("subprocess.Popen")
+    def test_result_and_progress_from_events(
+        self, mock_subprocess, mock_session_local, _mock_cm
+    ):
+        """Test que progression et bilan viennent des événements, pas du texte"""
+        lines = [
+            {"type": "progress", "progress": 42, "phase": "Lecture DS"},
+            {"type": "batch", "batch": 1, "success_count": 7, "error_count": 0},
+            {"type": "summary", "success_count": 7, "error_count": 0},
+        ]
+
+        def fake_popen(*_args, env, pass_fds, **_kwargs):
+            fd = int(env["SYNC_EVENTS_FD"])
+            assert pass_fds == (fd,)
+            os.write(fd, "".join(json.dumps(line) + "\n" for line in lines).encode())
+            # Aucun texte de bilan : le résultat doit venir des événements
+            return create_mock_process("Traitement terminé!")
+
+        mock_subprocess.side_effect = fake_popen
+        progress_calls = []
+        received = []
+
+        config = {
+            "ds_api_token": "test_token",
+            "demarche_number": "12345",
+            "grist_base_url": "https://test.grist.com",
+            "grist_api_key": "test_key",
+            "grist_doc_id": "test_doc",
+            "grist_user_id": "test_user",
+        }
+
+        result = SyncManager().run_synchronization_task(
+            config,
+            progress_callback=lambda value, phase: progress_calls.append((value, phase)),
+            event_callback=received.append,
+        )
+
+        assert result["success"] is True
+        assert result["success_count"] == 7
+        assert (42, "Lecture DS") in progress_calls
+        assert [event["type"] for event in received] == ["progress", "batch", "summary"]
+
+    def test_large_stdout_under_gevent(self, tmp_path):
+        """
+        Test sous gevent (monkey.patch_all, comme gunicorn --worker-class gevent) :
+        un stdout de plusieurs tampons de pipe entre deux événements
+        ne bloque pas la lecture du canal d'événements
+        """
+        pytest.importorskip("gevent")
+        config = {
+            "ds_api_token": "test_token",
+            "demarche_number": "12345",
+            "grist_base_url": "https://test.grist.com",
+            "grist_api_key": "test_key",
+            "grist_doc_id": "test_doc",
+            "grist_user_id": "test_user",
+        }
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
+
+        script = tmp_path / "script.py"
+        script.write_text(
+            "import json, os, sys\n"
+            "fd = int(os.environ['SYNC_EVENTS_FD'])\n"
+            "def event(**fields):\n"
+            "    os.write(fd, (json.dumps(fields) + '\\n').encode())\n"
+            "event(type='progress', progress=30, phase='Lecture')\n"
+            "for i in range(5000):\n"
+            "    print('x' * 100)\n"
+            "sys.stdout.flush()\n"
+            "event(type='summary', success_count=5000, error_count=0)\n"
+        )
+        runner = tmp_path / "runner.py"
+        runner.write_text(
+            "from gevent import monkey\n"
+            "monkey.patch_all()\n"
+            "import json, sys\n"
+            "from unittest.mock import MagicMock, patch\n"
+            "from sync import sync_manager\n"
+            f"sync_manager.SYNC_SCRIPT_PATH = {str(script)!r}\n"
+            "with patch.object(sync_manager, 'SessionLocal', MagicMock()), "
+            "patch.object(sync_manager, 'ConfigManager', MagicMock()):\n"
+            "    result = sync_manager.SyncManager().run_synchronization_task(\n"
+            f"        {config!r}\n"
+            "    )\n"
+            "print(result['success_count'])\n"
+        )
 
-        mock_cm_class.return_value.fetch_and_store_grist_user_email.assert_called_once_with(
-            5, "https://test.grist.com", "test_key"
+        completed = subprocess.run(
+            [sys.executable, str(runner)],
+            cwd=root,
+            env={
+                **os.environ,
+                "PYTHONPATH": root,
+                "DATABASE_URL": "postgresql://invalid-url-used-only-for-mocks-tests",
+            },
+            capture_output=True,
+            text=True,
+            timeout=20,
         )
+
+        assert completed.returncode == 0, completed.stderr
+        assert completed.stdout.strip().splitlines()[-1] == "5000"
+
+    def test_record_event_updates_stats(self):
+        """Test que les événements de lot alimentent les compteurs de la tâche"""
+        manager = SyncManager(emit_interval=0)
+        manager.tasks["task_1"] = {
+            "status": "running",
+            "start_time": 100.0,
+            "logs": [],
+            "logs_offset": 0,
+        }
+
+        manager._record_event(
+            "task_1",
+            {"type": "batch", "batch": 2, "success_count": 20, "error_count": 1, "time": 110.0},
+        )
+
+        assert manager.tasks["task_1"]["stats"] == {
+            "success_count": 20,
+            "error_count": 1,
+            "batches": 2,
+            "dossiers_per_second": 2.0,
+        }
+
+
+class TestSyncManagerTaskStore:
+    """Tests du registre borné des tâches et des logs"""
+
+    def setup_method(self):
+        self.manager = SyncManager(emit_interval=0)
+
+    @patch("threading.Thread")
+    def test_logs_spilled_beyond_cap(self, _mock_thread, tmp_path):
+        """Test que les logs au-delà de la limite sont déplacés hors mémoire"""
+        with (
+            patch("sync.sync_manager.SYNC_TASK_LOG_LINES", 4),
+            patch("sync.sync_manager.SYNC_TASK_LOGS_DIR", str(tmp_path)),
+        ):
+            task_id = self.manager.start_task(MagicMock())
+            for i in range(10):
+                self.manager._add_log(task_id, f"ligne {i}")
+
+            task = self.manager.get_task(task_id)
+            assert len(task["logs"]) <= 4
+            assert task["logs_offset"] + len(task["logs"]) == 10
+            assert task["logs"][-1]["message"] == "ligne 9"
+
+            logs = self.manager.get_task_logs(task_id)
+            assert [log["message"] for log in logs] == [
+                f"ligne {i}" for i in range(10)
+            ]
+            partial = self.manager.get_task_logs(task_id, offset=3, limit=4)
+            assert [log["message"] for log in partial] == [
+                "ligne 3",
+                "ligne 4",
+                "ligne 5",
+                "ligne 6",
+            ]
+
+    def test_get_task_logs_unknown_task(self):
+        """Test get_task_logs avec une tâche inexistante"""
+        assert self.manager.get_task_logs("nonexistent_task") is None
+
+    @patch("threading.Thread")
+    def test_finished_tasks_evicted_by_count(self, _mock_thread, tmp_path):
+        """Test que seules les tâches terminées les plus récentes sont gardées"""
+        with (
+            patch("sync.sync_manager.SYNC_TASKS_MAX_FINISHED", 2),
+            patch("sync.sync_manager.SYNC_TASK_LOGS_DIR", str(tmp_path)),
+        ):
+            now = time.time()
+            self.manager.tasks = {
+                "task_a": {"status": "completed", "end_time": now - 30},
+                "task_b": {"status": "error", "end_time": now - 20},
+                "task_c": {"status": "completed", "end_time": now - 10},
+                "task_d": {"status": "running"},
+            }
+
+            task_id = self.manager.start_task(MagicMock())
+
+            assert set(self.manager.tasks) == {"task_b", "task_c", "task_d", task_id}
+
+    @patch("threading.Thread")
+    def test_finished_tasks_evicted_after_ttl(self, _mock_thread, tmp_path):
+        """Test que les tâches terminées depuis trop longtemps sont retirées"""
+        spilled = tmp_path / "task_old.jsonl.gz"
+        spilled.write_bytes(b"")
+        with (
+            patch("sync.sync_manager.SYNC_TASK_TTL", 60),
+            patch("sync.sync_manager.SYNC_TASK_LOGS_DIR", str(tmp_path)),
+        ):
+            self.manager.tasks = {
+                "task_old": {"status": "completed", "end_time": time.time() - 120},
+                "task_recent": {"status": "completed", "end_time": time.time()},
+            }
+
+            self.manager.start_task(MagicMock())
+
+            assert "task_old" not in self.manager.tasks
+            assert "task_recent" in self.manager.tasks
+            assert not spilled.exists()
+
+
+class TestSyncManagerCoalescedUpdates:
+    """Tests du regroupement des mises à jour envoyées au navigateur"""
+
+    def setup_method(self):
+        self.mock_callback = MagicMock()
+        self.manager = SyncManager(notify_callback=self.mock_callback, emit_interval=60)
+        self.manager.tasks["task_1"] = {
+            "status": "running",
+            "progress": 0,
+            "message": "Initialisation...",
+            "start_time": time.time(),
+            "logs": [],
+            "logs_offset": 0,
+        }
+
+    def teardown_method(self):
+        if self.manager._flush_timer is not None:
+            self.manager._flush_timer.cancel()
+
+    def test_updates_coalesced_until_flush(self):
+        """Test qu'un seul envoi regroupe logs et dernière progression"""
+        self.manager._add_log("task_1", "ligne 1")
+        self.manager._update_progress("task_1", 30, "Étape 1")
+        self.manager._add_log("task_1", "ligne 2")
+        self.manager._update_progress("task_1", 40, "Étape 2")
+
+        self.mock_callback.assert_not_called()
+
+        timer = self.manager._flush_timer
+        self.manager._flush_updates()
+        timer.cancel()
+
+        self.mock_callback.assert_called_once()
+        update = self.mock_callback.call_args.args[1]["task"]
+        assert update["progress"] == 40
+        assert update["message"] == "Étape 2"
+        assert [log["message"] for log in update["logs"]] == ["ligne 1", "ligne 2"]
+        assert update["logs_offset"] == 0
+
+    def test_only_new_logs_sent(self):
+        """Test que chaque envoi ne contient que les nouveaux logs"""
+        self.manager.emit_interval = 0
+
+        self.manager._add_log("task_1", "ligne 1")
+        self.manager._add_log("task_1", "ligne 2")
+
+        update = self.mock_callback.call_args.args[1]["task"]
+        assert [log["message"] for log in update["logs"]] == ["ligne 2"]
+        assert update["logs_offset"] == 1
+        # L'état complet de la tâche n'est pas modifié
+        assert len(self.manager.tasks["task_1"]["logs"]) == 2
+
+    def test_final_update_sent_immediately(self):
+        """Test que la fin de tâche est envoyée sans attendre, avec les logs en attente"""
+
+        def task_function(log_callback=None, **_kwargs):
+            log_callback("dernière ligne")
+            return {"success": True}
+
+        self.manager._run_task("task_1", task_function)
+
+        self.mock_callback.assert_called_once()
+        update = self.mock_callback.call_args.args[1]["task"]
+        assert update["status"] == "completed"
+        assert [log["message"] for log in update["logs"]] == ["dernière ligne"]
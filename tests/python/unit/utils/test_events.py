@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from utils import events
+from utils.events import (
+    EVENTS_FD_ENV,
+    emit_event,
+    events_enabled,
+    read_events,
+    read_fd_lines,
+)
+
+
+@pytest.fixture
+def events_pipe(monkeypatch):
+    """Canal d'événements ouvert sur un pipe, relu par le test"""
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setenv(EVENTS_FD_ENV, str(write_fd))
+    monkeypatch.setattr(events, "_stream", None)
+
+    def read_all():
+        events._stream.close()
+        with os.fdopen(read_fd, encoding="utf-8") as stream:
+            return list(read_events(stream))
+
+    yield read_all
+
+
+class TestEmitEvent:
+    def test_writes_json_lines(self, events_pipe):
+        """Chaque événement est une ligne JSON typée et horodatée"""
+        emit_event("progress", progress=12.5, phase="Lecture")
+        emit_event("summary", success_count=3, error_count=0)
+
+        received = events_pipe()
+
+        assert [event["type"] for event in received] == ["progress", "summary"]
+        assert received[0]["progress"] == 12.5
+        assert received[0]["phase"] == "Lecture"
+        assert "time" in received[1]
+
+    def test_disabled_without_fd(self, monkeypatch):
+        """Sans SYNC_EVENTS_FD, les événements sont ignorés"""
+        monkeypatch.delenv(EVENTS_FD_ENV, raising=False)
+        monkeypatch.setattr(events, "_stream", None)
+
+        assert not events_enabled()
+        emit_event("progress", progress=1, phase="x")
+        assert events._stream is None
+
+
+class TestReadEvents:
+    def test_skips_invalid_lines(self):
+        """Les lignes non JSON ou sans type sont ignorées"""
+        lines = ['{"type": "batch", "batch": 1}', "texte", '{"batch": 2}', "[1]"]
+
+        assert list(read_events(lines)) == [{"type": "batch", "batch": 1}]
+
+
+class TestReadFdLines:
+    def test_lines_across_reads(self):
+        """Lignes reconstituées sur plusieurs lectures, descripteur fermé à la fin"""
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, b'{"type": "a"}\n{"type"')
+        os.write(write_fd, b': "b"}\nfin')
+        os.close(write_fd)
+
+        assert list(read_fd_lines(read_fd)) == ['{"type": "a"}', '{"type": "b"}', "fin"]
+        with pytest.raises(OSError):
+            os.fstat(read_fd)
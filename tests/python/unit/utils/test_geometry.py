@@ -0,0 +1,151 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from utils.geometry import (
+    encode_geometry,
+    encode_geometry_cached,
+    geometry_hash,
+    simplify_line,
+)
+from utils.state_store import StateStore
+
+
+class TestEncodeGeometry:
+    """Tests unitaires pour encode_geometry"""
+
+    def test_point(self):
+        """Point : JSON identique à json.dumps, WKT POINT"""
+        encoded = encode_geometry("Point", [2.35, 48.85])
+
+        assert encoded["geo_coordinates"] == json.dumps([2.35, 48.85])
+        assert encoded["geo_wkt"] == "POINT(2.35 48.85)"
+
+    def test_polygon_ring_closed_in_wkt_only(self):
+        """Anneau non fermé : fermé dans le WKT, JSON inchangé"""
+        coordinates = [[[0, 0], [1.5, 0], [1.5, 1], [0, 1]]]
+
+        encoded = encode_geometry("Polygon", coordinates)
+
+        assert encoded["geo_coordinates"] == json.dumps(coordinates)
+        assert encoded["geo_wkt"] == "POLYGON((0 0, 1.5 0, 1.5 1, 0 1, 0 0))"
+
+    def test_multi_geometries(self):
+        """Types multiples : même rendu que l'encodage JSON standard"""
+        cases = {
+            "LineString": ([[0, 0], [1, 1]], "LINESTRING(0 0, 1 1)"),
+            "MultiPoint": ([[0, 0], [1, 1]], "MULTIPOINT((0 0), (1 1))"),
+            "MultiLineString": (
+                [[[0, 0], [1, 1]], [[2, 2], [3, 3]]],
+                "MULTILINESTRING((0 0, 1 1), (2 2, 3 3))",
+            ),
+            "MultiPolygon": (
+                [[[[0, 0], [1, 0], [1, 1], [0, 0]]]],
+                "MULTIPOLYGON(((0 0, 1 0, 1 1, 0 0)))",
+            ),
+        }
+
+        for geo_type, (coordinates, wkt) in cases.items():
+            encoded = encode_geometry(geo_type, coordinates)
+            assert encoded["geo_coordinates"] == json.dumps(coordinates)
+            assert encoded["geo_wkt"] == wkt
+
+    def test_unsupported_type(self):
+        """Type non pris en charge : JSON seul, pas de WKT"""
+        encoded = encode_geometry("GeometryCollection", [{"type": "Point"}])
+
+        assert encoded["geo_coordinates"] == json.dumps([{"type": "Point"}])
+        assert encoded["geo_wkt"] is None
+
+    def test_size_cap_stores_pointer(self):
+        """Au-delà de la taille maximale, un pointeur remplace le texte"""
+        coordinates = [[i, i] for i in range(100)]
+
+        encoded = encode_geometry(
+            "LineString", coordinates, max_length=50, reference="geo-1"
+        )
+
+        assert "geo-1" in encoded["geo_coordinates"]
+        assert "géométrie trop volumineuse" in encoded["geo_wkt"]
+
+    def test_simplification_tolerance(self):
+        """La simplification retire les points quasi alignés"""
+        coordinates = [[0, 0], [1, 0.001], [2, 0], [3, 5]]
+
+        encoded = encode_geometry("LineString", coordinates, tolerance=0.01)
+
+        assert encoded["geo_wkt"] == "LINESTRING(0 0, 2 0, 3 5)"
+
+
+class TestSimplifyLine:
+    """Tests unitaires pour simplify_line"""
+
+    def test_disabled_without_tolerance(self):
+        """Tolérance nulle : ligne inchangée"""
+        points = [[0, 0], [1, 0], [2, 0]]
+
+        assert simplify_line(points, 0) is points
+
+    def test_closed_ring_keeps_minimum(self):
+        """Un anneau trop simplifié est conservé tel quel"""
+        ring = [[0, 0], [1, 0.0001], [0.0001, 0.0001], [0, 0]]
+
+        assert simplify_line(ring, 1, closed=True) == ring
+
+    def test_numpy_and_python_agree(self):
+        """Même résultat avec et sans NumPy sur un grand anneau"""
+        pytest.importorskip("numpy")
+        ring = [[i, (i % 7) * 0.01] for i in range(600)] + [[0, 0]]
+
+        with_default = simplify_line(ring, 0.02, closed=True)
+        with patch("utils.geometry.np", None):
+            without_numpy = simplify_line(ring, 0.02, closed=True)
+
+        assert with_default == without_numpy
+        assert len(with_default) < len(ring)
+
+
+class TestEncodeGeometryCached:
+    """Tests unitaires pour encode_geometry_cached"""
+
+    def test_second_call_served_from_cache(self, tmp_path):
+        """Même zone, même géométrie -> encodage repris du cache"""
+        store = StateStore(str(tmp_path / "state.sqlite3"))
+        geometry = {"type": "Point", "coordinates": [1.0, 2.0]}
+        key = f"geo-1:{geometry_hash(geometry)}"
+
+        with patch("utils.geometry.get_state_store", return_value=store):
+            first = encode_geometry_cached("Point", [1.0, 2.0], key)
+            with patch("utils.geometry.encode_geometry") as mock_encode:
+                second = encode_geometry_cached("Point", [1.0, 2.0], key)
+
+        mock_encode.assert_not_called()
+        assert second == first == {"geo_coordinates": "[1.0, 2.0]", "geo_wkt": "POINT(1.0 2.0)"}
+
+    def test_old_entries_purged_once_per_process(self, tmp_path):
+        """Les encodages trop anciens sont purgés au premier appel seulement"""
+        store = StateStore(str(tmp_path / "state.sqlite3"))
+        with patch("utils.state_store.time.time", return_value=time.time() - 100):
+            store.set("geometry_encodings", "ancien", {"geo_wkt": "POINT(0 0)"})
+            store.set("geometry_written", "doc:table:1", "hash")
+
+        with (
+            patch("utils.geometry.get_state_store", return_value=store),
+            patch("utils.geometry.GEOMETRY_CACHE_MAX_AGE", 10),
+            patch("utils.geometry._cache_purged", False),
+            patch.object(store, "purge", wraps=store.purge) as mock_purge,
+        ):
+            encode_geometry_cached("Point", [1.0, 2.0], "geo-1")
+            encode_geometry_cached("Point", [1.0, 2.0], "geo-2")
+
+        assert mock_purge.call_count == 2
+        assert store.get("geometry_encodings", "ancien") is None
+        assert store.get("geometry_written", "doc:table:1") is None
+
+    def test_hash_changes_with_geometry(self):
+        """Une géométrie modifiée change d'empreinte"""
+        assert geometry_hash({"type": "Point", "coordinates": [1, 2]}) != geometry_hash(
+            {"type": "Point", "coordinates": [1, 3]}
+        )
@@ -0,0 +1,48 @@
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from utils.http_metrics import HttpStats, install_http_instrumentation
+
+
+class TestHttpStats:
+    def test_service_for_url(self):
+        """Le service est déduit de l'hôte de l'URL"""
+        stats = HttpStats({"ds.example.fr": "ds", "grist.example.fr": "grist", "": "x"})
+
+        assert stats.service_for("https://ds.example.fr/api/v2/graphql") == "ds"
+        assert stats.service_for("https://GRIST.example.fr/api/docs") == "grist"
+        assert stats.service_for("https://autre.fr") == "other"
+
+    def test_observe_snapshot(self):
+        """Nombre, somme, nouvelles tentatives et répartition par intervalle"""
+        stats = HttpStats({}, buckets=(0.1, 1))
+        stats.observe("ds", 0.05)
+        stats.observe("ds", 2.0, retries=2)
+
+        assert stats.snapshot() == {
+            "ds": {"count": 2, "sum": 2.05, "retries": 2, "buckets": [1, 0, 1]}
+        }
+
+
+class TestInstallHttpInstrumentation:
+    def test_counts_requests(self):
+        """Chaque requête envoyée par requests est mesurée, même en erreur"""
+        response = MagicMock()
+        response.raw.retries.history = ("retry",)
+        send = MagicMock(side_effect=[response, requests.ConnectionError()])
+
+        with patch.object(requests.Session, "send", send):
+            stats = install_http_instrumentation({"grist.example.fr": "grist"})
+            session = requests.Session()
+            session.get("https://grist.example.fr/api/docs")
+            try:
+                session.get("https://ds.example.fr/api")
+            except requests.ConnectionError:
+                pass
+
+        snapshot = stats.snapshot()
+        assert snapshot["grist"]["count"] == 1
+        assert snapshot["grist"]["retries"] == 1
+        assert snapshot["other"]["count"] == 1
+        assert snapshot["other"]["retries"] == 0
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from utils.log import LogProgress, PROGRESS_START
 
 
@@ -61,3 +63,20 @@ class TestLogProgressReset:
         lp.log("a")
         lp.reset()
         assert lp._value == 2
+
+
+class TestLogProgressEvents:
+    """Tests de l'envoi sur le canal d'événements"""
+
+    def test_emits_event_instead_of_printing(self, capsys):
+        """Avec un canal ouvert, la progression est un événement structuré"""
+        lp = LogProgress(ceiling=5, increment=1, start=2)
+
+        with (
+            patch("utils.log.events_enabled", return_value=True),
+            patch("utils.log.emit_event") as mock_emit,
+        ):
+            lp.log("Traitement")
+
+        mock_emit.assert_called_once_with("progress", progress=3, phase="Traitement")
+        assert capsys.readouterr().out == ""
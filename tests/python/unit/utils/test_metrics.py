@@ -0,0 +1,67 @@
+from utils.metrics import Counter, Gauge, Histogram, Registry
+
+
+class TestCounterAndGauge:
+    def test_counter_by_labels(self):
+        """Les compteurs sont cumulés par combinaison d'étiquettes"""
+        counter = Counter("runs_total", "Exécutions", ("status",))
+        counter.inc(status="success")
+        counter.inc(2, status="success")
+        counter.inc(status="error")
+
+        assert counter.value(status="success") == 3
+        assert counter.value(status="error") == 1
+        assert counter.value(status="inconnu") == 0
+
+    def test_render_format(self):
+        """Rendu HELP, TYPE puis un échantillon par étiquettes"""
+        gauge = Gauge("duration_seconds", "Durée", ("demarche",))
+        gauge.set(1.5, demarche='12"3')
+
+        assert gauge.render().splitlines() == [
+            "# HELP duration_seconds Durée",
+            "# TYPE duration_seconds gauge",
+            'duration_seconds{demarche="12\\"3"} 1.5',
+        ]
+
+
+class TestHistogram:
+    def test_cumulative_buckets(self):
+        """Les intervalles sont rendus cumulés, avec +Inf, somme et nombre"""
+        histogram = Histogram("latency_seconds", "Latence", buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(3)
+
+        assert histogram.render().splitlines()[2:] == [
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 3',
+            "latency_seconds_sum 3.55",
+            "latency_seconds_count 3",
+        ]
+
+    def test_merge_pre_bucketed_counts(self):
+        """Des comptes déjà répartis s'ajoutent aux observations"""
+        histogram = Histogram("latency_seconds", "Latence", ("service",), (0.1, 1))
+        histogram.observe(0.05, service="ds")
+        histogram.merge([1, 2, 0], 1.2, service="ds")
+        # Nombre d'intervalles incompatible : ignoré
+        histogram.merge([1, 2], 1.0, service="ds")
+
+        lines = histogram.render().splitlines()
+        assert 'latency_seconds_bucket{service="ds",le="1"} 4' in lines
+        assert 'latency_seconds_count{service="ds"} 4' in lines
+
+
+class TestRegistry:
+    def test_render_all_metrics(self):
+        """Le registre rend chaque métrique enregistrée"""
+        registry = Registry()
+        registry.register(Counter("a_total", "A")).inc()
+        registry.register(Gauge("b", "B")).set(2)
+
+        text = registry.render()
+
+        assert "a_total 1\n" in text
+        assert text.endswith("b 2\n")
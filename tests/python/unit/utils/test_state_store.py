@@ -0,0 +1,88 @@
+import time
+from unittest.mock import patch
+
+from utils.state_store import StateStore
+
+
+class TestStateStore:
+    """Tests unitaires pour StateStore"""
+
+    def _store(self, tmp_path):
+        return StateStore(str(tmp_path / "state.sqlite3"))
+
+    def test_set_then_get(self, tmp_path):
+        """Une valeur enregistrée est relue à l'identique"""
+        store = self._store(tmp_path)
+        store.set("ns", "k", {"a": [1, 2]})
+
+        assert store.get("ns", "k") == {"a": [1, 2]}
+
+    def test_missing_key_returns_none(self, tmp_path):
+        """Clé absente -> None"""
+        assert self._store(tmp_path).get("ns", "absente") is None
+
+    def test_namespaces_are_isolated(self, tmp_path):
+        """Une même clé dans deux espaces de noms reste distincte"""
+        store = self._store(tmp_path)
+        store.set("a", "k", 1)
+        store.set("b", "k", 2)
+
+        assert store.get("a", "k") == 1
+        assert store.get("b", "k") == 2
+
+    def test_max_age_expires_value(self, tmp_path):
+        """Une valeur plus ancienne que max_age est ignorée"""
+        store = self._store(tmp_path)
+        with patch("utils.state_store.time.time", return_value=time.time() - 100):
+            store.set("ns", "k", "ancienne")
+
+        assert store.get("ns", "k", max_age=10) is None
+        assert store.get("ns", "k", max_age=1000) == "ancienne"
+
+    def test_purge_old_values(self, tmp_path):
+        """purge supprime les valeurs trop anciennes de l'espace de noms"""
+        store = self._store(tmp_path)
+        with patch("utils.state_store.time.time", return_value=time.time() - 100):
+            store.set_many("ns", {"ancienne": 1})
+            store.set("autre", "ancienne", 1)
+        store.set("ns", "recente", 2)
+
+        assert store.purge("ns", max_age=10) == 1
+        assert store.get("ns", "ancienne") is None
+        assert store.get("ns", "recente") == 2
+        assert store.get("autre", "ancienne") == 1
+
+    def test_set_many_get_many(self, tmp_path):
+        """Lecture et écriture groupées"""
+        store = self._store(tmp_path)
+        store.set_many("ns", {str(i): i for i in range(1200)})
+
+        values = store.get_many("ns", [str(i) for i in range(0, 1200, 100)] + ["x"])
+
+        assert values == {str(i): i for i in range(0, 1200, 100)}
+
+    def test_overwrite_and_delete(self, tmp_path):
+        """Réécriture puis suppression d'une valeur"""
+        store = self._store(tmp_path)
+        store.set("ns", "k", 1)
+        store.set("ns", "k", 2)
+        assert store.get("ns", "k") == 2
+
+        store.delete("ns", "k")
+        assert store.get("ns", "k") is None
+
+    def test_persists_across_instances(self, tmp_path):
+        """Les valeurs survivent à une nouvelle instance (nouveau processus)"""
+        self._store(tmp_path).set("ns", "k", "v")
+
+        assert self._store(tmp_path).get("ns", "k") == "v"
+
+    def test_unusable_path_degrades_to_miss(self, tmp_path):
+        """Fichier inutilisable -> lecture vide, écriture ignorée, sans exception"""
+        blocker = tmp_path / "fichier"
+        blocker.write_text("")
+        store = StateStore(str(blocker / "state.sqlite3"))
+
+        store.set("ns", "k", "v")
+
+        assert store.get("ns", "k") is None
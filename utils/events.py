@@ -0,0 +1,103 @@
+"""
+Canal d'événements structurés du script de synchronisation vers SyncManager.
+
+SyncManager ouvre un pipe et transmet au sous-processus le descripteur
+d'écriture via SYNC_EVENTS_FD : chaque événement y est écrit sur une ligne
+JSON ({"type": ..., "time": ..., ...}). En exécution autonome, la variable
+est absente et les événements sont ignorés (seuls les logs texte restent).
+
+Types d'événements :
+- progress : début d'une phase (progress, phase)
+- batch : lot traité (batch, dossiers, success_count, error_count, duration)
+- error : erreur journalisée (message)
+- deleted : dossiers marqués supprimés (count)
+- summary : bilan final (success_count, error_count, duration, already_up_to_date)
+- rows : lignes écrites dans une table Grist (table, created, updated, failed, skipped)
+- http_stats : requêtes HTTP par service, en fin de script (services)
+"""
+
+import json
+import os
+import selectors
+import threading
+import time
+from typing import Any, Iterable, Iterator, TextIO
+
+EVENTS_FD_ENV = "SYNC_EVENTS_FD"
+
+_stream: TextIO | None = None
+_stream_lock = threading.Lock()
+
+
+def _events_stream() -> TextIO | None:
+    """Flux d'écriture des événements, ouvert au premier appel"""
+    global _stream
+
+    if _stream is None:
+        fd = os.getenv(EVENTS_FD_ENV)
+        if not fd:
+            return None
+        try:
+            _stream = os.fdopen(int(fd), "w", buffering=1, encoding="utf-8")
+        except (OSError, ValueError):
+            return None
+
+    return _stream
+
+
+def events_enabled() -> bool:
+    """Indique si un canal d'événements est ouvert vers SyncManager"""
+    return bool(os.getenv(EVENTS_FD_ENV))
+
+
+def emit_event(event_type: str, **fields: Any) -> None:
+    """Écrit un événement sur le canal, s'il existe"""
+    with _stream_lock:
+        stream = _events_stream()
+        if stream is None:
+            return
+        try:
+            stream.write(
+                json.dumps({"type": event_type, "time": time.time(), **fields}) + "\n"
+            )
+        except (OSError, TypeError, ValueError):
+            pass
+
+
+def read_events(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """Événements lus sur le canal ; les lignes invalides sont ignorées"""
+    for line in lines:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(event, dict) and "type" in event:
+            yield event
+
+
+def read_fd_lines(fd: int) -> Iterator[str]:
+    """
+    Lignes lues sur un descripteur jusqu'à sa fermeture (le descripteur est
+    fermé ensuite). L'attente passe par selectors, que gevent rend coopératif
+    (monkey.patch_all) : une lecture bloquante figerait tout le worker
+    gunicorn --worker-class gevent, y compris la lecture du stdout du script.
+    """
+    selector = selectors.DefaultSelector()
+    selector.register(fd, selectors.EVENT_READ)
+    buffer = b""
+
+    try:
+        while True:
+            selector.select()
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8", errors="replace")
+
+        if buffer:
+            yield buffer.decode("utf-8", errors="replace")
+    finally:
+        selector.close()
+        os.close(fd)
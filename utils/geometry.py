@@ -0,0 +1,280 @@
+"""
+Encodage des géométries GeoJSON des champs Carte pour Grist.
+
+Les représentations JSON (geo_coordinates) et WKT (geo_wkt) sont produites
+en un seul parcours des coordonnées. Une simplification (Douglas-Peucker)
+peut être appliquée aux lignes et anneaux ; NumPy, s'il est installé,
+accélère les calculs de distance sur les grands anneaux.
+"""
+
+import hashlib
+import json
+import math
+import os
+
+from utils.state_store import get_state_store
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Taille maximale (en caractères) d'un champ géométrique écrit dans Grist.
+# Au-delà, le champ contient un pointeur vers la zone DS au lieu du texte.
+GEO_MAX_FIELD_LENGTH = int(os.getenv("GEO_MAX_FIELD_LENGTH", "100000"))
+
+# Tolérance de simplification, dans l'unité des coordonnées (0 = désactivée)
+GEO_SIMPLIFY_TOLERANCE = float(os.getenv("GEO_SIMPLIFY_TOLERANCE", "0"))
+
+# Nombre de points à partir duquel NumPy est utilisé pour la simplification
+NUMPY_MIN_POINTS = 500
+
+# Espaces de noms du stockage local
+GEOMETRY_CACHE_NAMESPACE = "geometry_encodings"
+GEOMETRY_WRITTEN_NAMESPACE = "geometry_written"
+
+# Âge maximal (secondes) des encodages et empreintes écrites gardés dans le
+# stockage local ; les plus anciens sont purgés une fois par synchronisation
+GEOMETRY_CACHE_MAX_AGE = float(os.getenv("GEOMETRY_CACHE_MAX_AGE", "2592000"))
+
+_cache_purged = False
+
+# Champs Grist issus de l'encodage
+GEOMETRY_FIELDS = ("geo_coordinates", "geo_wkt")
+
+
+def _format_number(value):
+    """Même rendu que json.dumps pour un nombre"""
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _encode_position(position):
+    """Retourne (JSON, WKT) d'une position [x, y, ...]"""
+    numbers = [_format_number(value) for value in position]
+    return f"[{', '.join(numbers)}]", f"{numbers[0]} {numbers[1]}"
+
+
+def _encode_line(points, close=False):
+    """
+    Retourne (JSON, WKT) d'une suite de positions.
+    Le WKT est entre parenthèses ; close ferme l'anneau côté WKT uniquement.
+    """
+    json_parts = []
+    wkt_parts = []
+    for position in points:
+        position_json, position_wkt = _encode_position(position)
+        json_parts.append(position_json)
+        wkt_parts.append(position_wkt)
+
+    if close and points and points[0] != points[-1]:
+        wkt_parts.append(wkt_parts[0])
+
+    return f"[{', '.join(json_parts)}]", f"({', '.join(wkt_parts)})"
+
+
+def _encode_polygon(rings, tolerance):
+    """Retourne (JSON, WKT) d'un polygone (anneau extérieur puis trous)"""
+    json_parts = []
+    wkt_parts = []
+    for ring in rings:
+        ring_json, ring_wkt = _encode_line(
+            simplify_line(ring, tolerance, closed=True), close=True
+        )
+        json_parts.append(ring_json)
+        wkt_parts.append(ring_wkt)
+
+    return f"[{', '.join(json_parts)}]", f"({', '.join(wkt_parts)})"
+
+
+def _farthest_point(points, coords, start, end):
+    """Index et distance du point le plus éloigné du segment [start, end]"""
+    ax, ay = points[start][0], points[start][1]
+    dx = points[end][0] - ax
+    dy = points[end][1] - ay
+    segment_length = math.hypot(dx, dy)
+
+    if coords is not None:
+        inner = coords[start + 1 : end]
+        if segment_length == 0:
+            distances = np.hypot(inner[:, 0] - ax, inner[:, 1] - ay)
+        else:
+            distances = (
+                np.abs(dy * (inner[:, 0] - ax) - dx * (inner[:, 1] - ay))
+                / segment_length
+            )
+        offset = int(np.argmax(distances))
+        return start + 1 + offset, float(distances[offset])
+
+    best_index, best_distance = start, -1.0
+    for index in range(start + 1, end):
+        px, py = points[index][0], points[index][1]
+        if segment_length == 0:
+            distance = math.hypot(px - ax, py - ay)
+        else:
+            distance = abs(dy * (px - ax) - dx * (py - ay)) / segment_length
+        if distance > best_distance:
+            best_index, best_distance = index, distance
+
+    return best_index, best_distance
+
+
+def simplify_line(points, tolerance, closed=False):
+    """
+    Simplifie une ligne ou un anneau (Douglas-Peucker).
+
+    Les extrémités sont conservées ; un anneau garde au moins 4 positions,
+    sinon la ligne d'origine est retournée.
+    """
+    min_points = 4 if closed else 2
+    if not tolerance or tolerance <= 0 or len(points) <= min_points:
+        return points
+
+    coords = None
+    if np is not None and len(points) >= NUMPY_MIN_POINTS:
+        coords = np.asarray([position[:2] for position in points], dtype=float)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        if end <= start + 1:
+            continue
+        index, distance = _farthest_point(points, coords, start, end)
+        if distance > tolerance:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    simplified = [position for position, kept in zip(points, keep) if kept]
+    return simplified if len(simplified) >= min_points else points
+
+
+def geometry_pointer(reference, length):
+    """Valeur stockée à la place d'une géométrie trop volumineuse"""
+    return (
+        f"[géométrie trop volumineuse ({length} caractères), "
+        f"voir la zone {reference} dans Démarches Simplifiées]"
+    )
+
+
+def encode_geometry(
+    geo_type,
+    coordinates,
+    tolerance=GEO_SIMPLIFY_TOLERANCE,
+    max_length=GEO_MAX_FIELD_LENGTH,
+    reference=None,
+):
+    """
+    Encode des coordonnées GeoJSON en JSON et en WKT.
+
+    Args:
+        geo_type: Type GeoJSON (Point, Polygon, MultiPolygon...)
+        coordinates: Coordonnées GeoJSON
+        tolerance: Tolérance de simplification (0 = aucune)
+        max_length: Taille maximale de chaque champ (0 = illimitée)
+        reference: Identifiant de la zone, utilisé dans le pointeur
+
+    Returns:
+        dict: {"geo_coordinates": str, "geo_wkt": str | None}
+            geo_wkt vaut None pour les types non pris en charge
+    """
+    coordinates_json = None
+    wkt = None
+
+    if geo_type == "Point":
+        coordinates_json, position_wkt = _encode_position(coordinates)
+        wkt = f"POINT({position_wkt})"
+
+    elif geo_type == "LineString":
+        coordinates_json, line_wkt = _encode_line(
+            simplify_line(coordinates, tolerance)
+        )
+        wkt = f"LINESTRING{line_wkt}"
+
+    elif geo_type == "Polygon":
+        coordinates_json, polygon_wkt = _encode_polygon(coordinates, tolerance)
+        wkt = f"POLYGON{polygon_wkt}"
+
+    elif geo_type == "MultiPoint":
+        json_parts = []
+        wkt_parts = []
+        for position in coordinates:
+            position_json, position_wkt = _encode_position(position)
+            json_parts.append(position_json)
+            wkt_parts.append(f"({position_wkt})")
+        coordinates_json = f"[{', '.join(json_parts)}]"
+        wkt = f"MULTIPOINT({', '.join(wkt_parts)})"
+
+    elif geo_type == "MultiLineString":
+        json_parts = []
+        wkt_parts = []
+        for line in coordinates:
+            line_json, line_wkt = _encode_line(simplify_line(line, tolerance))
+            json_parts.append(line_json)
+            wkt_parts.append(line_wkt)
+        coordinates_json = f"[{', '.join(json_parts)}]"
+        wkt = f"MULTILINESTRING({', '.join(wkt_parts)})"
+
+    elif geo_type == "MultiPolygon":
+        json_parts = []
+        wkt_parts = []
+        for polygon in coordinates:
+            polygon_json, polygon_wkt = _encode_polygon(polygon, tolerance)
+            json_parts.append(polygon_json)
+            wkt_parts.append(polygon_wkt)
+        coordinates_json = f"[{', '.join(json_parts)}]"
+        wkt = f"MULTIPOLYGON({', '.join(wkt_parts)})"
+
+    else:
+        # GeometryCollection et types inconnus : JSON brut, pas de WKT
+        coordinates_json = json.dumps(coordinates)
+
+    encoded = {"geo_coordinates": coordinates_json, "geo_wkt": wkt}
+
+    if max_length:
+        for key, value in encoded.items():
+            if value is not None and len(value) > max_length:
+                encoded[key] = geometry_pointer(reference, len(value))
+
+    return encoded
+
+
+def geometry_hash(geometry):
+    """Empreinte du contenu d'une géométrie GeoJSON"""
+    payload = json.dumps(geometry, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def purge_geometry_cache():
+    """Purge des entrées de plus de GEOMETRY_CACHE_MAX_AGE secondes"""
+    store = get_state_store()
+    for namespace in (GEOMETRY_CACHE_NAMESPACE, GEOMETRY_WRITTEN_NAMESPACE):
+        store.purge(namespace, GEOMETRY_CACHE_MAX_AGE)
+
+
+def encode_geometry_cached(geo_type, coordinates, cache_key, reference=None):
+    """
+    encode_geometry avec cache dans le stockage local, d'une sync à l'autre.
+
+    cache_key identifie le contenu (ID de la zone + empreinte de la géométrie) ;
+    les paramètres d'encodage en font aussi partie.
+    """
+    global _cache_purged
+
+    # Sans purge, chaque version de chaque géométrie resterait stockée
+    if not _cache_purged:
+        _cache_purged = True
+        purge_geometry_cache()
+
+    key = f"{cache_key}:{GEO_SIMPLIFY_TOLERANCE}:{GEO_MAX_FIELD_LENGTH}"
+    store = get_state_store()
+
+    cached = store.get(GEOMETRY_CACHE_NAMESPACE, key)
+    if cached is not None:
+        return cached
+
+    encoded = encode_geometry(geo_type, coordinates, reference=reference)
+    store.set(GEOMETRY_CACHE_NAMESPACE, key, encoded)
+    return encoded
@@ -0,0 +1,82 @@
+"""
+Mesure des requêtes HTTP du script de synchronisation.
+
+install_http_instrumentation() enveloppe requests.Session.send (utilisé aussi
+par requests.get/post...) : chaque requête est comptée par service (ds, grist,
+other) avec sa durée et ses nouvelles tentatives (Retry urllib3). Le bilan
+est transmis à SyncManager en fin de script (événement http_stats).
+"""
+
+import bisect
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from utils.metrics import DEFAULT_BUCKETS
+
+
+class HttpStats:
+    """Compteurs et répartition des durées de requêtes, par service"""
+
+    def __init__(self, services: dict[str, str], buckets=DEFAULT_BUCKETS):
+        # {hôte: service}
+        self.services = {host.lower(): name for host, name in services.items() if host}
+        self.buckets = tuple(buckets)
+        self._stats: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def service_for(self, url: str) -> str:
+        return self.services.get(urlparse(url or "").netloc.lower(), "other")
+
+    def observe(self, service: str, duration: float, retries: int = 0) -> None:
+        with self._lock:
+            stats = self._stats.get(service)
+            if stats is None:
+                stats = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "retries": 0,
+                    "buckets": [0] * (len(self.buckets) + 1),
+                }
+                self._stats[service] = stats
+            stats["count"] += 1
+            stats["sum"] += duration
+            stats["retries"] += retries
+            stats["buckets"][bisect.bisect_left(self.buckets, duration)] += 1
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                service: {**stats, "buckets": list(stats["buckets"])}
+                for service, stats in self._stats.items()
+            }
+
+
+def _retries(response) -> int:
+    """Nombre de nouvelles tentatives effectuées par urllib3 pour une réponse"""
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    return len(getattr(retries, "history", None) or ())
+
+
+def install_http_instrumentation(services: dict[str, str]) -> HttpStats:
+    """Mesure toutes les requêtes envoyées par requests dans ce processus"""
+    stats = HttpStats(services)
+    original_send = requests.Session.send
+
+    def send(session, request, **kwargs):
+        start = time.perf_counter()
+        response = None
+        try:
+            response = original_send(session, request, **kwargs)
+            return response
+        finally:
+            stats.observe(
+                stats.service_for(request.url),
+                time.perf_counter() - start,
+                _retries(response),
+            )
+
+    requests.Session.send = send
+    return stats
@@ -1,5 +1,7 @@
 import os
 
+from utils.events import emit_event, events_enabled
+
 PROGRESS_START = 2
 
 # Configuration du niveau de log
@@ -27,7 +29,10 @@ class LogProgress:
         if reset:
             self._value = self.start
         self._value = min(self._value + self.increment, self.ceiling)
-        print(f"Progression: {self._value} - {phase_name}...", flush=True)
+        if events_enabled():
+            emit_event("progress", progress=self._value, phase=phase_name)
+        else:
+            print(f"Progression: {self._value} - {phase_name}...", flush=True)
 
     def reset(self):
         self._value = self.start
@@ -47,6 +52,7 @@ def log_verbose(message):
 def log_error(message):
     """Log d'erreur (toujours affiché)"""
     print(f"ERREUR: {message}")
+    emit_event("error", message=str(message))
 
 
 log_progress = LogProgress(ceiling=98)
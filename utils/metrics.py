@@ -0,0 +1,153 @@
+"""
+Métriques au format texte Prometheus, sans dépendance externe.
+
+Compteurs, jauges et histogrammes à étiquettes, regroupés dans un registre
+dont render() produit le texte exposé par /metrics.
+"""
+
+import bisect
+import threading
+from typing import Iterable
+
+# Bornes (secondes) des histogrammes de latence des requêtes HTTP
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())
+            ]
+
+    def render(self) -> str:
+        return "\n".join(
+            [
+                f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.type_name}",
+                *self._samples(),
+            ]
+        )
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float | None:
+        return self._values.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, label_names=(), buckets=DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+
+    def _state(self, key: tuple) -> dict:
+        # Appelé sous verrou
+        state = self._values.get(key)
+        if state is None:
+            state = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            self._values[key] = state
+        return state
+
+    def observe(self, value: float, **labels) -> None:
+        with self._lock:
+            state = self._state(self._key(labels))
+            state["buckets"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def merge(self, bucket_counts: list[int], total: float, **labels) -> None:
+        """
+        Ajoute des observations déjà réparties par intervalle
+        (un compte par borne, puis +Inf, non cumulés)
+        """
+        if len(bucket_counts) != len(self.buckets) + 1:
+            return
+        with self._lock:
+            state = self._state(self._key(labels))
+            for index, count in enumerate(bucket_counts):
+                state["buckets"][index] += count
+            state["sum"] += total
+            state["count"] += sum(bucket_counts)
+
+    def _samples(self) -> list[str]:
+        samples = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                bounds = [*map(_format_value, self.buckets), "+Inf"]
+                for bound, count in zip(bounds, state["buckets"]):
+                    cumulative += count
+                    labels = _format_labels(
+                        (*self.label_names, "le"), (*key, bound)
+                    )
+                    samples.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                samples.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+                samples.append(f"{self.name}_count{labels} {state['count']}")
+        return samples
+
+
+class Registry:
+    """Ensemble de métriques rendues ensemble"""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
@@ -0,0 +1,164 @@
+"""
+Stockage local persistant entre deux synchronisations.
+
+Chaque synchronisation s'exécute dans un sous-processus : ce stockage clé/valeur
+(SQLite, valeurs JSON) permet de conserver des caches d'une exécution à l'autre.
+Il n'est qu'une optimisation : toute erreur de lecture ou d'écriture est
+journalisée et traitée comme une absence de donnée, sans faire échouer la sync.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+STATE_STORE_PATH: str = os.getenv(
+    "SYNC_STATE_PATH",
+    os.path.join(tempfile.gettempdir(), "otp_ds_to_grist_state.sqlite3"),
+)
+
+
+class StateStore:
+    """Stockage clé/valeur par espace de noms, avec date de mise à jour"""
+
+    def __init__(self, path: str = STATE_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Plusieurs syncs concurrentes peuvent écrire dans le même fichier
+            self._conn = sqlite3.connect(
+                self.path, timeout=10, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Cache reconstructible : pas besoin d'un fsync à chaque écriture
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS state (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, namespace: str, key: str, max_age: float | None = None) -> Any:
+        """
+        Retourne la valeur stockée, ou None si absente
+        ou plus ancienne que max_age secondes
+        """
+        return self.get_many(namespace, [key], max_age=max_age).get(key)
+
+    def get_many(
+        self, namespace: str, keys: Iterable[str], max_age: float | None = None
+    ) -> dict[str, Any]:
+        """Retourne {clé: valeur} pour les clés présentes (et assez récentes)"""
+        keys = [str(k) for k in keys]
+        if not keys:
+            return {}
+
+        min_updated_at = time.time() - max_age if max_age is not None else None
+        values = {}
+        try:
+            with self._lock:
+                conn = self._connection()
+                # Par paquets, pour rester sous la limite de paramètres SQLite
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i : i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, value, updated_at FROM state "
+                        f"WHERE namespace = ? AND key IN ({placeholders})",
+                        [namespace, *chunk],
+                    ).fetchall()
+                    for key, value, updated_at in rows:
+                        if min_updated_at is None or updated_at >= min_updated_at:
+                            values[key] = json.loads(value)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logger.warning(f"Lecture du stockage local impossible ({namespace}): {e}")
+            return {}
+        return values
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """Enregistre une valeur (sérialisable en JSON)"""
+        self.set_many(namespace, {key: value})
+
+    def set_many(self, namespace: str, values: dict[str, Any]) -> None:
+        """Enregistre plusieurs valeurs en une transaction"""
+        if not values:
+            return
+
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.executemany(
+                    "INSERT INTO state (namespace, key, value, updated_at) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (namespace, key) DO UPDATE "
+                    "SET value = excluded.value, updated_at = excluded.updated_at",
+                    [
+                        (namespace, str(key), json.dumps(value), now)
+                        for key, value in values.items()
+                    ],
+                )
+                conn.commit()
+        except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+            logger.warning(f"Écriture du stockage local impossible ({namespace}): {e}")
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Supprime une valeur"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "DELETE FROM state WHERE namespace = ? AND key = ?",
+                    (namespace, str(key)),
+                )
+                conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(
+                f"Suppression dans le stockage local impossible ({namespace}): {e}"
+            )
+
+    def purge(self, namespace: str, max_age: float) -> int:
+        """Supprime les valeurs plus anciennes que max_age secondes"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                cursor = conn.execute(
+                    "DELETE FROM state WHERE namespace = ? AND updated_at < ?",
+                    (namespace, time.time() - max_age),
+                )
+                conn.commit()
+                return cursor.rowcount
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Purge du stockage local impossible ({namespace}): {e}")
+            return 0
+
+
+_state_store: StateStore | None = None
+
+
+def get_state_store() -> StateStore:
+    """Retourne le stockage local du processus (singleton)"""
+    global _state_store
+
+    if _state_store is None:
+        _state_store = StateStore()
+
+    return _state_store